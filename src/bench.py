@@ -0,0 +1,328 @@
+#!/usr/bin/python3
+
+# standard libraries
+import argparse
+import contextlib
+import inspect
+import json
+import os
+import platform
+import subprocess  # nosec
+import sys
+import tempfile
+import time
+import warnings
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+
+# custom modules
+from bundle import FundamentalsBundle, LINE_ITEMS
+from cache import FundamentalsCache
+import intrinsic_value
+from journal import ResultsJournal, write_csv
+from metrics import Metrics
+from panel import Panel
+import profiler
+from ranking import Ranking, magic_formula
+import scoring
+
+SIZES = (100, 1000, 10000)
+
+# line items real statements carry, which no metric reads
+FILLER_ITEMS = (
+    "Other Items", "Deferred Long Term Liab", "Intangible Assets",
+    "Other Current Liab", "Common Stock", "Retained Earnings",
+    "Treasury Stock", "Good Will", "Other Assets", "Accounts Payable",
+    "Short Long Term Debt", "Other Stockholder Equity",
+)
+
+SUMMARY = (
+    "{name} designs and sells products worldwide. The company was "
+    "founded in {year} and is headquartered in Wilmington, Delaware."
+)
+
+
+class SyntheticTicker:
+    """
+    Stand-in for yfinance.Ticker with randomly generated, but \
+            realistically shaped, statements and info.
+    """
+
+    def __init__(self, ticker, rng):
+        self.ticker = ticker
+        dates = pd.to_datetime(
+            ["2022-12-31", "2021-12-31", "2020-12-31", "2019-12-31"],
+        )
+        scale = 10 ** rng.uniform(6, 11)
+
+        frames = {}
+        for statement, items in LINE_ITEMS.items():
+            if statement == "earnings":
+                continue
+            # most tickers miss a line item or two
+            labels = [label for label in items.values()
+                      if rng.random() > 0.05]
+            labels += list(FILLER_ITEMS[:rng.integers(4, len(FILLER_ITEMS))])
+            values = rng.normal(scale, scale / 2, (len(labels), len(dates)))
+            values[rng.random(values.shape) < 0.02] = np.nan
+            frames[statement] = pd.DataFrame(
+                values, index=labels, columns=dates,
+            )
+
+        self.cashflow = frames["cashflow"]
+        self.balance_sheet = frames["balance_sheet"]
+        self.financials = frames["financials"]
+        self.earnings = pd.DataFrame(
+            {
+                "Revenue": rng.normal(scale * 5, scale, len(dates)),
+                "Earnings": rng.normal(scale, scale / 2, len(dates)),
+            },
+            index=pd.Index([2019, 2020, 2021, 2022], name="Year"),
+        )
+        self.info = {
+            "marketCap": int(scale * rng.uniform(1, 20)),
+            "currentPrice": round(rng.uniform(1, 500), 2),
+            "sharesOutstanding": int(scale / rng.uniform(1, 100)),
+            "longBusinessSummary": SUMMARY.format(
+                name=ticker, year=rng.integers(1850, 2015),
+            ),
+        }
+
+
+    def get_balance_sheet(self):
+        return self.balance_sheet
+
+
+class SyntheticUniverse:
+    """ A reproducible set of synthetic tickers."""
+
+    def __init__(self, size, seed=0):
+        rng = np.random.default_rng(seed)
+        self.tickers = [f"SYN{i:05d}" for i in range(size)]
+        self.symbols = {
+            ticker: SyntheticTicker(ticker, rng) for ticker in self.tickers
+        }
+
+
+    def ticker(self, ticker):
+        """ Ticker factory, for a FundamentalsCache."""
+        return self.symbols[ticker]
+
+
+    def cache(self):
+        """ An in-memory cache, warmed with every statement and WACC."""
+        cache = FundamentalsCache(":memory:", ttl=None, max_bytes=None,
+                                  ticker_factory=self.ticker)
+        for ticker, symbol in self.symbols.items():
+            for statement in ("cashflow", "balance_sheet", "financials",
+                              "earnings", "info"):
+                cache.put(ticker, statement, getattr(symbol, statement))
+            cache.put(ticker, "wacc", 0.08)
+        return cache
+
+
+def timed(function, repeat):
+    """ Best wall time of a call, over several runs."""
+    best = None
+    for _ in range(repeat):
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(devnull), \
+                warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def metric_methods():
+    """ The per-ticker Metrics methods, which only take a symbol."""
+    methods = {}
+    for name, method in inspect.getmembers(Metrics, inspect.isfunction):
+        if name.startswith("_"):
+            continue
+        params = list(inspect.signature(method).parameters)
+        if params == ["self", "symbol"]:
+            methods[name] = method
+    return methods
+
+
+def benchmarks(universe, workdir):
+    """
+    Yield (name, function) pairs for every benchmark of a \
+            universe; each function runs over all its tickers.
+    """
+    attrs = Metrics()
+    symbols = list(universe.symbols.values())
+
+    for name, method in metric_methods().items():
+        yield f"metrics.{name}", lambda method=method: [
+            method(attrs, symbol) for symbol in symbols
+        ]
+    yield "metrics.wacc", lambda: [
+        attrs.wacc(symbol, 0.1) for symbol in symbols
+    ]
+
+    bundles = [FundamentalsBundle.from_ticker(symbol) for symbol in symbols]
+    yield "bundle.from_ticker", lambda: [
+        FundamentalsBundle.from_ticker(symbol) for symbol in symbols
+    ]
+    yield "metrics.compute_all", lambda: [
+        attrs.compute_all(bundle) for bundle in bundles
+    ]
+
+    panel = Panel.from_bundles(bundles)
+    yield "panel.from_bundles", lambda: Panel.from_bundles(bundles)
+    yield "panel.score", panel.score
+
+    # keep the run profiles of entrypoint and intrinsic_value out of data/
+    profiler.PROFILE_DIR = workdir
+
+    cache = universe.cache()
+    infile = os.path.join(workdir, "universe.csv")
+    frame = pd.DataFrame({"symbol": universe.tickers})
+
+    def score():
+        frame.to_csv(infile, index=False)
+        scoring.run(infile, cache=cache)
+
+    def value():
+        frame.to_csv(infile, index=False)
+        intrinsic_value.main(pd.read_csv(infile), infile, cache=cache)
+
+    yield "entrypoint.run", score
+    yield "intrinsic_value.main", value
+
+    valued = pd.read_csv(infile)
+    yield "intrinsic_value.apply_dcf", lambda: intrinsic_value.apply_dcf(
+        valued.copy(),
+    )
+    yield "intrinsic_value.apply_monte_carlo", lambda: (
+        intrinsic_value.apply_monte_carlo(valued.copy(), 1000, seed=0)
+    )
+
+    scores = [attrs.compute_all(bundle) for bundle in bundles]
+
+    ranked = pd.DataFrame(scores).assign(symbol=universe.tickers)
+    magic = magic_formula(ranked.columns)
+    yield "ranking.build", lambda: Ranking.from_frame(ranked, magic)
+    ranking = Ranking.from_frame(ranked, magic)
+
+    def rerank():
+        for ticker, values in zip(universe.tickers, scores):
+            ranking.update(ticker, [values[column] for column in magic])
+        return ranking.top()
+
+    yield "ranking.update", rerank
+
+    def journal():
+        sink = ResultsJournal(infile)
+        for row, (ticker, values) in enumerate(zip(universe.tickers, scores)):
+            sink.append(row, ticker, values)
+        sink.compact(frame.copy())
+
+    yield "csv.journal", journal
+    yield "csv.write", lambda: write_csv(valued, infile)
+
+
+def run(sizes, repeat, only=None):
+    """ Run the benchmarks for every universe size."""
+    results = []
+    for size in sizes:
+        universe = SyntheticUniverse(size)
+        with tempfile.TemporaryDirectory() as workdir:
+            for name, function in benchmarks(universe, workdir):
+                if only and not any(name.startswith(prefix)
+                                    for prefix in only):
+                    continue
+                seconds = timed(function, repeat)
+                results.append({
+                    "benchmark": name,
+                    "tickers": size,
+                    "seconds": seconds,
+                    "per_ticker_us": seconds / size * 1e6,
+                })
+                print(f"{name:32} {size:>6} {seconds:10.4f}s",
+                      file=sys.stderr)
+    return results
+
+
+def commit():
+    """ Short hash of the checked out commit, if any."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the ratio of each result to its baseline, and return \
+            whether any of them slowed down past the threshold.
+    """
+    before = {
+        (result["benchmark"], result["tickers"]): result["seconds"]
+        for result in baseline["results"]
+    }
+    regressed = False
+    for result in results:
+        key = (result["benchmark"], result["tickers"])
+        if key not in before or not before[key]:
+            continue
+        ratio = result["seconds"] / before[key]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{key[0]:32} {key[1]:>6} {ratio:8.2f}x{flag}", file=sys.stderr)
+    return regressed
+
+
+def main():
+    """
+    Time the Metrics, scoring, DCF and CSV paths over synthetic \
+            universes, and emit the results as JSON.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark value-stocks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES,
+                        help="numbers of synthetic tickers")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per benchmark, the best one is kept")
+    parser.add_argument("--only", nargs="+",
+                        help="benchmark name prefixes to run")
+    parser.add_argument("--output", help="JSON file, instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "results": run(args.sizes, args.repeat, args.only),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            if compare(report["results"], json.load(baseline), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
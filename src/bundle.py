@@ -0,0 +1,143 @@
+# non-standard libraries
+import numpy as np
+
+# custom modules
+from throttle import ThrottledError
+
+# line items the Metrics read from each statement,
+# keyed by the bundle attribute they are extracted into
+LINE_ITEMS = {
+    "cashflow": {
+        "net_income": "Net Income",
+        "operating_cash_flow": "Total Cash From Operating Activities",
+        "capital_expenditures": "Capital Expenditures",
+    },
+    "balance_sheet": {
+        "total_assets": "Total Assets",
+        "stockholder_equity": "Total Stockholder Equity",
+        "current_assets": "Total Current Assets",
+        "current_liabilities": "Total Current Liabilities",
+        "total_liabilities": "Total Liab",
+        "long_term_debt": "Long Term Debt",
+        "cash": "Cash",
+        "receivables": "Net Receivables",
+        "inventory": "Inventory",
+        "fixed_assets": "Property Plant Equipment",
+    },
+    "financials": {
+        "interest_expense": "Interest Expense",
+        "income_tax_expense": "Income Tax Expense",
+        "ebit": "Ebit",
+        "operating_expenses": "Total Operating Expenses",
+        "operating_income": "Operating Income",
+        "minority_interest": "Minority Interest",
+    },
+    # the earnings frame has one row per year, oldest first
+    "earnings": {
+        "revenue": "Revenue",
+        "earnings": "Earnings",
+    },
+}
+
+# fields read from the info payload
+INFO_ITEMS = {
+    "market_cap": "marketCap",
+    "current_price": "currentPrice",
+    "shares_outstanding": "sharesOutstanding",
+    "summary": "longBusinessSummary",
+}
+
+STATEMENTS = tuple(LINE_ITEMS) + ("info",)
+
+
+class FundamentalsBundle:
+    """
+    Every line item the Metrics need for one ticker, extracted \
+            from its statements in a single pass.
+
+    Statement line items are float64 vectors in the statement's \
+            own column order (newest first, except for earnings), \
+            and info fields are plain scalars.
+
+    A line item the statement doesn't carry is None, so metrics \
+            can apply the same zero-on-missing conventions as the \
+            per-ticker Metrics methods without catching exceptions.
+    """
+
+    __slots__ = ("ticker",) \
+        + tuple(name for items in LINE_ITEMS.values() for name in items) \
+        + tuple(INFO_ITEMS)
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+        for name in self.__slots__[1:]:
+            setattr(self, name, None)
+
+
+    @classmethod
+    def from_ticker(cls, symbol, statements=STATEMENTS):
+        """ Extract a bundle from a yfinance-like ticker object."""
+        bundle = cls(symbol.ticker)
+        bundle.extract(symbol, statements)
+        return bundle
+
+
+    def extract(self, symbol, statements=STATEMENTS):
+        """ Fill in the line items of the given statements."""
+        for statement in statements:
+            try:
+                frame = getattr(symbol, statement)
+            except ThrottledError:
+                # retried later, rather than scored as missing
+                raise
+            except Exception:
+                # an unavailable statement leaves its line items missing
+                continue
+
+            if statement == "info":
+                self._extract_info(frame)
+            elif statement == "earnings":
+                self._extract_columns(frame, LINE_ITEMS[statement])
+            else:
+                self._extract_rows(frame, LINE_ITEMS[statement])
+
+
+    def _extract_rows(self, frame, items):
+        """ Pull the line items out of a statement, one row each."""
+        if frame is None or frame.empty:
+            return
+
+        if not frame.index.is_unique:
+            frame = frame[~frame.index.duplicated()]
+
+        present = {name: label for name, label in items.items()
+                   if label in frame.index}
+        if not present:
+            return
+
+        block = frame.loc[list(present.values())].to_numpy(
+            dtype=float, na_value=np.nan,
+        )
+        for row, name in enumerate(present):
+            setattr(self, name, block[row])
+
+
+    def _extract_columns(self, frame, items):
+        """ Pull the line items out of a frame, one column each."""
+        if frame is None or frame.empty:
+            return
+
+        for name, label in items.items():
+            if label in frame.columns:
+                setattr(self, name, frame[label].to_numpy(
+                    dtype=float, na_value=np.nan,
+                ))
+
+
+    def _extract_info(self, info):
+        """ Pull the scalar fields out of the info payload."""
+        if not info:
+            return
+
+        for name, key in INFO_ITEMS.items():
+            setattr(self, name, info.get(key))
@@ -0,0 +1,356 @@
+# standard libraries
+from os import getenv, makedirs, path
+import pickle  # nosec
+import sqlite3
+import threading
+import time
+import zlib
+
+# custom modules
+from throttle import RemoteGuard, shared
+
+# environment variables and defaults
+CACHE_PATH = getenv("CACHE_PATH", "data/.cache/fundamentals.db")
+CACHE_TTL = float(getenv("CACHE_TTL", 7 * 24 * 60 * 60))
+CACHE_MAX_BYTES = int(getenv("CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# live (default), record, replay or local
+FUNDAMENTALS_MODE = getenv("FUNDAMENTALS_MODE", "live")
+RECORD_PATH = getenv("RECORD_PATH", "data/recording.db")
+
+# bumped whenever the layout of stored payloads changes
+SCHEMA_VERSION = 1
+
+
+def yahoo_ticker(ticker):
+    """ Build a live yfinance ticker object."""
+    # imported here, so cache-only callers never pay for yfinance
+    import yfinance
+
+    return yfinance.Ticker(ticker)
+
+
+class FundamentalsCache:
+    """
+    Persistent, TTL-based store of ticker statements.
+
+    Entries are keyed by (ticker, statement) and live in a single \
+            SQLite file, so a rerun over the same universe only \
+            goes back to Yahoo for statements that have gone stale.
+
+    Once the stored payloads grow past max_bytes, the least \
+            recently used entries are evicted.
+
+    An offline cache never goes upstream: a miss comes back as None.
+
+    Upstream statement fetches go through a RemoteGuard, the shared \
+            Yahoo one by default, which rate-limits and retries them.
+
+    A wacc_client, if given, answers the WACC lookups the \
+            statements can't, instead of GuruFocus.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL,
+                 max_bytes=CACHE_MAX_BYTES, ticker_factory=yahoo_ticker,
+                 offline=False, guard=None, wacc_client=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.ticker_factory = ticker_factory
+        self.offline = offline
+        self.guard = guard if guard is not None else shared("yahoo")
+        self.wacc_client = wacc_client
+        self.hits = 0
+        self.misses = 0
+        self.profile = None
+
+        directory = _dirname(path)
+        if directory:
+            makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] \
+                != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS statements")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS statements ("
+            " ticker TEXT NOT NULL,"
+            " statement TEXT NOT NULL,"
+            " fetched REAL NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " PRIMARY KEY (ticker, statement))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS statements_accessed"
+            " ON statements (accessed)"
+        )
+        self._bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM statements"
+        ).fetchone()[0]
+
+
+    def get(self, ticker, statement):
+        """ Get a fresh statement, or None if it is missing or stale."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fetched, payload FROM statements"
+                " WHERE ticker = ? AND statement = ?",
+                (ticker, statement),
+            ).fetchone()
+
+            if row is None or self._expired(row[0], now):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if self.max_bytes is not None:
+                # recency only matters to eviction
+                self._db.execute(
+                    "UPDATE statements SET accessed = ?"
+                    " WHERE ticker = ? AND statement = ?",
+                    (now, ticker, statement),
+                )
+        return pickle.loads(zlib.decompress(row[1]))  # nosec
+
+
+    def put(self, ticker, statement, value):
+        """ Store a statement, evicting old entries past the size bound."""
+        payload = zlib.compress(
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1,
+        )
+        now = time.time()
+        with self._lock:
+            old = self._db.execute(
+                "SELECT size FROM statements"
+                " WHERE ticker = ? AND statement = ?",
+                (ticker, statement),
+            ).fetchone()
+            if old is not None:
+                self._bytes -= old[0]
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO statements"
+                " (ticker, statement, fetched, accessed, size, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (ticker, statement, now, now, len(payload), payload),
+            )
+            self._bytes += len(payload)
+            self._evict()
+
+
+    def fetch(self, ticker, statement, loader):
+        """
+        Read a statement through the cache.
+
+        On a miss, loader(statement) is called to get the \
+                statement from upstream, and the result is stored \
+                for the next reader.
+
+        With a RunProfile attached, the whole read and the \
+                upstream part of it are timed separately.
+        """
+        if self.profile is None:
+            return self._fetch(ticker, statement, loader)
+
+        def timed(statement):
+            with self.profile.timer("upstream", statement, ticker):
+                return loader(statement)
+
+        with self.profile.timer("read", statement, ticker):
+            return self._fetch(ticker, statement, timed)
+
+
+    def _fetch(self, ticker, statement, loader):
+        """ Read a statement through the cache, untimed."""
+        value = self.get(ticker, statement)
+        if value is not None or self.offline:
+            return value
+
+        value = loader(statement)
+        if value is not None:
+            self.put(ticker, statement, value)
+        return value
+
+
+    def close(self):
+        """ Close the underlying database."""
+        with self._lock:
+            self._db.close()
+
+
+    def _expired(self, fetched, now):
+        """ Whether an entry fetched at the given time is stale."""
+        return self.ttl is not None and now - fetched > self.ttl
+
+
+    def _evict(self):
+        """ Drop least recently used entries until under max_bytes."""
+        if self.max_bytes is None:
+            return
+
+        while self._bytes > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT ticker, statement, size FROM statements"
+                " ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._bytes = 0
+                break
+
+            for ticker, statement, size in rows:
+                self._db.execute(
+                    "DELETE FROM statements"
+                    " WHERE ticker = ? AND statement = ?",
+                    (ticker, statement),
+                )
+                self._bytes -= size
+                if self._bytes <= self.max_bytes:
+                    break
+
+
+class CachedTicker:
+    """
+    Stand-in for yfinance.Ticker that reads every statement \
+            through a FundamentalsCache.
+
+    Each statement is loaded at most once per instance, and the \
+            live yfinance ticker is only built when the cache misses.
+
+    An offline ticker never goes upstream: statements that aren't \
+            cached come back as None.
+    """
+
+    def __init__(self, ticker, cache, offline=False):
+        self.ticker = ticker
+        self.offline = offline
+        self._cache = cache
+        self._remote = None
+        self._statements = {}
+
+
+    def _load(self, statement):
+        """ Get a statement from memory, the cache, or upstream."""
+        if statement not in self._statements:
+            self._statements[statement] = self._cache.fetch(
+                self.ticker, statement, self._download,
+            )
+        return self._statements[statement]
+
+
+    def _download(self, statement):
+        """ Get a statement from the live yfinance ticker."""
+        if self.offline or self._cache.offline:
+            return None
+        if self._remote is None:
+            self._remote = self._cache.ticker_factory(self.ticker)
+        return self._cache.guard.call(getattr, self._remote, statement)
+
+
+    def prefetch(self, statements):
+        """
+        Load the given statements now, so a ThrottledError is \
+                raised here rather than inside a metric.
+        """
+        for statement in statements:
+            self._load(statement)
+
+
+    def release(self):
+        """
+        Drop the statements loaded so far, and the live ticker, \
+                once everything needed has been extracted from them.
+        """
+        self._statements = {}
+        self._remote = None
+
+
+    @property
+    def cashflow(self):
+        return self._load("cashflow")
+
+
+    @property
+    def balance_sheet(self):
+        return self._load("balance_sheet")
+
+
+    def get_balance_sheet(self):
+        return self._load("balance_sheet")
+
+
+    @property
+    def financials(self):
+        return self._load("financials")
+
+
+    @property
+    def earnings(self):
+        return self._load("earnings")
+
+
+    @property
+    def info(self):
+        return self._load("info")
+
+
+def open_cache(mode=FUNDAMENTALS_MODE, ticker_factory=yahoo_ticker,
+               offline=False):
+    """
+    Open the fundamentals store for the given mode.
+
+    live: the TTL cache, going upstream for stale statements; \
+            offline, it serves whatever it holds, however old, \
+            and never goes upstream.
+
+    record: every statement, info payload and WACC lookup is \
+            fetched live and kept in RECORD_PATH, without expiry \
+            or eviction; offline, it serves what was recorded, as \
+            replay does.
+
+    replay: everything is served from RECORD_PATH, with no network \
+            at all; anything that wasn't recorded is missing.
+
+    local: statements are read from the wide-format files in \
+            STATEMENTS_DIR, through an in-memory cache, with no \
+            network and no rate limit; a ticker without a file has \
+            no statements.
+    """
+    if mode == "live":
+        if offline:
+            return FundamentalsCache(ttl=None, ticker_factory=ticker_factory,
+                                     offline=True)
+        return FundamentalsCache(ticker_factory=ticker_factory)
+    if mode == "record":
+        if offline:
+            return FundamentalsCache(RECORD_PATH, ttl=None, max_bytes=None,
+                                     ticker_factory=ticker_factory,
+                                     offline=True)
+        return FundamentalsCache(RECORD_PATH, ttl=0, max_bytes=None,
+                                 ticker_factory=ticker_factory)
+    if mode == "replay":
+        return FundamentalsCache(RECORD_PATH, ttl=None, max_bytes=None,
+                                 ticker_factory=ticker_factory, offline=True)
+    if mode == "local":
+        # imported here, so the other modes never pay for pandas
+        from statements import LocalStatements
+
+        statements = LocalStatements()
+        return FundamentalsCache(":memory:", ttl=None, max_bytes=None,
+                                 ticker_factory=statements,
+                                 guard=RemoteGuard("local"),
+                                 wacc_client=statements)
+    raise ValueError(f"unknown FUNDAMENTALS_MODE: {mode}")
+
+
+def _dirname(filename):
+    """ Directory part of a path, empty for in-memory databases."""
+    if filename == ":memory:":
+        return ""
+    return path.dirname(filename)
@@ -0,0 +1,60 @@
+# standard libraries
+from importlib import import_module
+from os import path
+import sys
+
+# subcommands, and the modules implementing them; a module, and the
+# pandas, NumPy or yfinance it needs, is only imported when its
+# subcommand runs
+COMMANDS = {
+    "score": ("scoring", "score CSV files of tickers (the default)"),
+    "dcf": ("intrinsic_single", "value a ticker, or a CSV file of "
+                                "tickers, by discounted cash flow"),
+    "stats": ("stats", "headline ratios of a ticker"),
+    "roc": ("roc", "average return on capital of a ticker"),
+    "serve": ("service", "answer metrics and DCFs of tickers over HTTP"),
+    "rank": ("ranking", "top tickers of a results file, by the magic "
+                        "formula or any other columns"),
+    "db": ("snapshots", "screen the runs recorded with --db, or a "
+                        "ticker's history over them"),
+}
+
+
+def main(argv=None):
+    """
+    Run a subcommand: the first argument names it, and the rest \
+            go to the cli() of its module.
+
+    Without a known subcommand, the arguments are scored, as the \
+            entrypoint always did, e.g. `entrypoint data/sp500.csv`.
+
+    Any subcommand takes --from-cache, to work from cached \
+            statements only, which never imports yfinance.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    prog = path.basename(sys.argv[0])
+
+    if argv[:1] in (["-h"], ["--help"]):
+        print(usage(prog))
+        return
+
+    command = "score"
+    if argv and argv[0] in COMMANDS:
+        command = argv.pop(0)
+
+    module = COMMANDS[command][0]
+    if command == "dcf" and any(arg.endswith(".csv") for arg in argv):
+        # a whole file of tickers
+        module = "intrinsic_value"
+
+    import_module(module).cli(argv, prog=f"{prog} {command}")
+
+
+def usage(prog):
+    """ Help text listing the subcommands."""
+    lines = [f"usage: {prog} [{'|'.join(COMMANDS)}] [options]", ""]
+    for command, (_, description) in COMMANDS.items():
+        lines.append(f"  {command:<6} {description}")
+    lines.append("")
+    lines.append(f"Run `{prog} <command> --help` for its options.")
+    return "\n".join(lines)
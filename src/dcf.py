@@ -0,0 +1,223 @@
+# non-standard libraries
+import numpy as np
+
+CAP_GAINS_TAX_RATE = 0.15
+TIME_HORIZON_YEARS = 10
+EARNINGS_MARKDOWN = .33
+TERMINAL_GROWTH = .05
+
+# Monte Carlo valuation: paths per ticker, the spread of the WACC and
+# terminal growth around their point values, the spread of earnings
+# growth (percentage points) for tickers without a growth history,
+# and the percentiles of the future price reported
+MC_PATHS = 100_000
+MC_WACC_SD = 0.01
+MC_TERM_GROWTH_SD = 0.01
+MC_GROWTH_SD = 5
+MC_PERCENTILES = (5, 50, 95)
+
+# (ticker, path) cells evaluated per batch, bounding the memory used
+MC_CHUNK = 2_000_000
+
+# sampled WACCs are kept above this, so no path divides by zero
+MC_MIN_WACC = 0.001
+
+
+def adjusted_growth(aegr, markdown=EARNINGS_MARKDOWN):
+    """
+    Mark the average earnings growth rate (a percentage) down \
+            by the given fraction, to be conservative.
+    """
+    aegr = np.asarray(aegr, dtype=float)
+    return np.round((aegr / 100) * (1 - markdown), 2)
+
+
+def discounted_cash_flow(earnings, growth, wacc, fcf, liabilities,
+                         min_interest, shares, price,
+                         horizon=TIME_HORIZON_YEARS,
+                         lookahead_rate=CAP_GAINS_TAX_RATE,
+                         term_growth=TERMINAL_GROWTH):
+    """
+    Discounted cash flow valuation of many tickers at once.
+
+    Every input is an array with one value per ticker (or a \
+            scalar), and missing values are NaN.
+
+    The yearly compounding of the lookahead earnings, \
+            cash_flows += cash_flows * growth / (1 + wacc), is \
+            applied in closed form, as \
+            lookahead * (1 + growth / (1 + wacc)) ** (horizon - 1).
+
+    The terminal growth rate is halved against the WACC when the \
+            WACC doesn't exceed it, and a zero spread between the \
+            two falls back to 0.01.
+
+    Returns a dict of per-ticker arrays: 'lookahead', \
+            'cash flows', 'terminal value', 'dcf', 'future price' \
+            and 'growth'.
+    """
+    earnings, growth, wacc, fcf, liabilities, min_interest, shares, price = (
+        np.asarray(values, dtype=float) for values in (
+            earnings, growth, wacc, fcf, liabilities,
+            min_interest, shares, price,
+        )
+    )
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # lookahead earnings, set as initial cash flow value
+        lookahead = earnings * lookahead_rate
+
+        # discount the compounded cash flows
+        years = np.maximum(np.asarray(horizon) - 1, 0)
+        cash_flows = lookahead * (1 + (growth / (1 + wacc))) ** years
+
+        # terminal value
+        term_growth = np.where(
+            wacc <= term_growth, wacc - (wacc * 0.5), term_growth,
+        )
+        growth_ratio_diff = wacc - term_growth
+        growth_ratio_diff = np.where(
+            growth_ratio_diff == 0, 0.01, growth_ratio_diff,
+        )
+        terminal_value = np.round(
+            (fcf * (1 + term_growth)) / growth_ratio_diff, 2,
+        )
+
+        # knock off liabilities and minority interest
+        dcf = cash_flows + terminal_value - liabilities - min_interest
+
+        # divide total by shares outstanding
+        has_shares = ~np.isnan(shares) & (shares != 0)
+        dcf_per_share = np.where(has_shares, np.round(dcf / shares, 2), 0)
+
+        # expected growth over time, against the current price
+        has_price = ~np.isnan(price) & (price != 0)
+        expected = np.where(
+            has_price,
+            np.round((dcf_per_share - price) / price, 2) * 100,
+            0,
+        )
+
+    return {
+        'lookahead': lookahead,
+        'cash flows': cash_flows,
+        'terminal value': terminal_value,
+        'dcf': np.round(dcf, 2),
+        'future price': dcf_per_share,
+        'growth': expected,
+    }
+
+
+def monte_carlo(earnings, aegr, aegr_sd, wacc, fcf, liabilities,
+                min_interest, shares, paths=MC_PATHS,
+                markdown=EARNINGS_MARKDOWN, horizon=TIME_HORIZON_YEARS,
+                term_growth=TERMINAL_GROWTH, wacc_sd=MC_WACC_SD,
+                term_growth_sd=MC_TERM_GROWTH_SD,
+                percentiles=MC_PERCENTILES, chunk=MC_CHUNK, seed=None):
+    """
+    Percentiles of the future price per share of many tickers, \
+            over paths sampled around their point inputs.
+
+    On each path, the earnings growth rate is drawn from a normal \
+            distribution with the mean (aegr) and standard deviation \
+            (aegr_sd) of the ticker's yearly growth rates, both in \
+            percent, then marked down as in the point estimate; \
+            the WACC and the terminal growth are drawn from normal \
+            distributions around their point values.
+
+    Paths are valued by discounted_cash_flow, a batch of tickers at \
+            a time, so that no more than chunk (ticker, path) cells \
+            are held at once.
+
+    Returns an array with a row per ticker, and a column per \
+            percentile; NaN where the inputs are missing.
+    """
+    earnings, aegr, aegr_sd, wacc, fcf, liabilities, min_interest, shares = (
+        np.asarray(values, dtype=float) for values in (
+            earnings, aegr, aegr_sd, wacc, fcf, liabilities,
+            min_interest, shares,
+        )
+    )
+    aegr_sd = np.where(np.isnan(aegr_sd), MC_GROWTH_SD, aegr_sd)
+
+    rng = np.random.default_rng(seed)
+    count = len(earnings)
+    prices = np.full((count, len(percentiles)), np.nan)
+    step = max(1, chunk // max(1, paths))
+
+    for start in range(0, count, step):
+        rows = slice(start, min(start + step, count))
+        size = (rows.stop - rows.start, paths)
+
+        growth = aegr[rows, None] + aegr_sd[rows, None] \
+            * rng.standard_normal(size)
+        growth *= (1 - markdown) / 100
+        waccs = wacc[rows, None] + wacc_sd * rng.standard_normal(size)
+        np.maximum(waccs, MC_MIN_WACC, out=waccs)
+        terminal = term_growth + term_growth_sd * rng.standard_normal(size)
+
+        future = discounted_cash_flow(
+            earnings[rows, None], growth, waccs, fcf[rows, None],
+            liabilities[rows, None], min_interest[rows, None],
+            shares[rows, None], np.nan, horizon=horizon,
+            term_growth=terminal,
+        )['future price']
+        prices[rows] = np.percentile(future, percentiles, axis=1).T
+
+    return prices
+
+
+def dcf_grid(earnings, aegr, fcf, liabilities, min_interest, shares, waccs,
+             markdowns=(EARNINGS_MARKDOWN,), term_growths=(TERMINAL_GROWTH,),
+             horizons=(TIME_HORIZON_YEARS,), chunk=MC_CHUNK, out=None):
+    """
+    Future price per share of many tickers, over every combination \
+            of the given WACCs, growth markdowns, terminal growth \
+            rates and horizons.
+
+    The grid is broadcast through discounted_cash_flow, a batch of \
+            tickers at a time, so that no more than chunk cells are \
+            held at once; out, an array such as a memory-mapped \
+            file, receives the prices, and is allocated otherwise.
+
+    Yields (rows, prices) for every batch, as it is written, with \
+            prices shaped (tickers, waccs, markdowns, term growths, \
+            horizons), so callers can summarize a batch while it is \
+            still in memory.
+    """
+    earnings, aegr, fcf, liabilities, min_interest, shares = (
+        np.asarray(values, dtype=float) for values in (
+            earnings, aegr, fcf, liabilities, min_interest, shares,
+        )
+    )
+    waccs, markdowns, term_growths, horizons = (
+        np.asarray(values, dtype=float) for values in (
+            waccs, markdowns, term_growths, horizons,
+        )
+    )
+    axes = (len(waccs), len(markdowns), len(term_growths), len(horizons))
+
+    count = len(earnings)
+    if out is None:
+        out = np.empty((count,) + axes)
+    step = max(1, chunk // int(np.prod(axes)))
+
+    # every input broadcast along its own axis of the grid
+    wacc = waccs[None, :, None, None, None]
+    markdown = markdowns[None, None, :, None, None]
+    term_growth = term_growths[None, None, None, :, None]
+    horizon = horizons[None, None, None, None, :]
+
+    for start in range(0, count, step):
+        rows = slice(start, min(start + step, count))
+        ticker = (slice(rows.start, rows.stop),) + (None,) * 4
+
+        prices = discounted_cash_flow(
+            earnings[ticker], adjusted_growth(aegr[ticker], markdown), wacc,
+            fcf[ticker], liabilities[ticker], min_interest[ticker],
+            shares[ticker], np.nan, horizon=horizon,
+            term_growth=term_growth,
+        )['future price']
+        prices = np.broadcast_to(prices, (rows.stop - rows.start,) + axes)
+        out[rows] = prices
+        yield rows, prices
@@ -1,193 +1,457 @@
 #!/usr/bin/python3
 
 # standard libraries
-import logging
-import re
-import requests
-import sys
+import argparse
+import contextlib
+import numpy as np
 import pandas as pd
 
 # non-standard libraries
+from bundle import STATEMENTS
+from cache import CachedTicker, open_cache
+from dcf import adjusted_growth, discounted_cash_flow, monte_carlo
+from dcf import CAP_GAINS_TAX_RATE, EARNINGS_MARKDOWN, MC_PATHS
+from dcf import TERMINAL_GROWTH, TIME_HORIZON_YEARS
+from journal import RESUME_MAX_AGE, ResultsJournal, write_csv
 from metrics import Metrics
-import yfinance
+from profiler import RunProfile, run_name
+from screen import Screener
+from snapshots import RESULTS_DB, SnapshotStore
+from store import ColumnStore, store_path
+from throttle import RETRY_ROUNDS, ThrottledError
+from wacc import WaccProvider
 
-CAP_GAINS_TAX_RATE = 0.15
-TIME_HORIZON_YEARS = 10
-EARNINGS_MARKDOWN = .33
+# per-ticker inputs of the DCF, as stored in the output file
+DCF_INPUTS = ('earnings', 'aegr', 'wacc', 'fcf', 'liabilities',
+              'min interest', 'shares', 'current price')
 
+# columns apply_dcf fills in
+DCF_OUTPUTS = ('adj growth', 'dcf', 'future price', 'growth')
 
-def get_wacc(ticker):
-    """ Get WACC from GuruFocus."""
-    # plug in the ticker to the url
-    url = f'https://www.gurufocus.com/term/wacc/{ticker}/WACC-Percentage/{ticker}'
-    # grab the page content
-    page = requests.get(url).text
+# columns apply_monte_carlo fills in, next to 'future price'
+MC_OUTPUTS = ('future price p5', 'future price p50', 'future price p95')
 
-    # search for the percentage
-    try:
-        match = re.findall(r'[0-9]+\.[0-9]+%', page)[0].replace('%', '')
-        wacc = float(match) / 100
-    except:
-        wacc = 0.07
-
-    return wacc
-
-
-def main(dataframe, infile):
-    """ Perform Intrinsic value calculation."""
-
-    # methodology of valuation
-    metrics = Metrics()
-
-    # get list of ticker symbols
-    tickers = list(dataframe.to_dict()['symbol'].values())
-
-    for i in range(0, len(tickers)):
-        # get yfinance ticker object
-        symbol = yfinance.Ticker(tickers[i]) 
-        
-        # net income
-        niev = round(metrics.net_income_to_ev(symbol), 2)
-
-        # add data to csv
-        dataframe.loc[i, 'niev'] = niev
-
-
-        # get net margin
-        net_margin = metrics.net_margin(symbol)
-
-        # add data to csv
-        dataframe.loc[i, 'net_margin'] = net_margin
-
-
-        # cash ratio
-        cash = metrics.cash_ratio(symbol)
-
-        # add data to csv
-        dataframe.loc[i, 'cash'] = cash
 
-        
-        # return on assets
-        roa = round(metrics.avg_return_on_assets(symbol), 2)
+def main(dataframe, infile, markdown=EARNINGS_MARKDOWN,
+         horizon=TIME_HORIZON_YEARS, term_growth=TERMINAL_GROWTH,
+         resume=False, max_age=RESUME_MAX_AGE, cache=None, screen=False,
+         store=False, db=None, paths=0, seed=None):
+    """
+    Perform Intrinsic value calculation.
 
-        # add data to csv
-        dataframe.loc[i, 'roa'] = roa
+    Each ticker's DCF inputs are fetched and stored next to its \
+            other columns, then the cash flows of every ticker are \
+            discounted in one vectorized pass.
 
+    When resuming, tickers the journal already has inputs for, \
+            newer than max_age seconds, are not fetched again.
 
-        # get net income (net earnings)
-        try:
-            earnings = metrics.net_income(symbol)
-        except:
-            earnings = 0
-        print(f"Earnings: {earnings}")
-    
-        # get lookahead earnings
-        lookahead = earnings * (CAP_GAINS_TAX_RATE)
-        cash_flows = lookahead 
-        print(f"Lookahead earnings: {lookahead}")
+    Statements are read through the given cache, or open_cache().
 
-        # estimate rate of growth per year
-        aegr = (metrics.avg_earnings_growth_rate(symbol) / 100)
-        print(f"Avg growth rate: {aegr}")
-        # mark down by 1/3rd (to be conservative)%
-        adj_aegr = round(aegr * (1 - EARNINGS_MARKDOWN), 2) 
+    When screening, a ticker that fails the screen thresholds is \
+            marked as such in the 'screen' column, and none of its \
+            other statements, WACC or DCF are fetched or computed.
 
-        # add data to csv
-        dataframe.loc[i, 'adj growth'] = adj_aegr
+    With store, the inputs of each ticker, and then the DCF \
+            columns, are also written to the memory-mapped column \
+            store next to the file.
 
-        # get average returns on capital
-        roc = metrics.avg_return_on_capital(symbol) 
+    With db, the path of a results database, the rows are also \
+            recorded there as a new run.
 
-        # add data to csv
-        dataframe.loc[i, 'avg roc'] = roc
+    With paths, the future price is also simulated over that many \
+            Monte Carlo paths per ticker, and its percentiles are \
+            stored next to it.
 
-        print(f"Adjusted Avg growth rate: {adj_aegr}")
+    Every statement of a ticker is loaded before its metrics are \
+            computed, so a ticker still throttled after its retries \
+            is put back for up to RETRY_ROUNDS more passes, rather \
+            than valued on zeros.
 
-        # get working average costs of capital
-        wacc = get_wacc(symbol.ticker)
+    The time spent in each metric, fetch and write is exported \
+            as a run profile at the end.
+    """
+    profile = RunProfile(run_name("intrinsic_value", infile))
 
-        # add data to csv
-        dataframe.loc[i, 'wacc'] = wacc
-
-        print(f"Weighted Avg Costs of Capital: {wacc}")
-
-        # start discounting cash flows!
-        for year in range(0, TIME_HORIZON_YEARS - 1):
-            # 1) take existing cash flow
-            # 2) take the earnings growth of existing cash flow
-            # 3) discount the earnings growth cash 
-            # 4) add the result into existing cash flows
-            # 5) repeat
-            cash_flows += ((cash_flows * adj_aegr) / (1 + wacc))
-            print(f"Cash flows after {year + 1} year: {cash_flows}")
-
-        # get free cash flow
-        fcf = metrics.free_cash_flow(symbol) 
-        print(f"Free Cash Flow: {fcf}")
-
-        # discount terminal value
-        term_growth = .05
-
-        if wacc < term_growth or wacc == term_growth:
-            term_growth = wacc - (wacc * 0.5)
-
-        # get terminal value
-        growth_ratio_diff = wacc - term_growth
-        
-        if growth_ratio_diff == 0:
-            growth_ratio_diff = 0.01
-
-        terminal_value = round((fcf * (1 + term_growth)) / (growth_ratio_diff), 2)
-
-        # and add it to the total
-        dcf = cash_flows + terminal_value
-
-        # knock off liabilities and minority interest
-        liabilities = metrics.liabilities(symbol) 
-        dcf -= liabilities
+    # methodology of valuation
+    metrics = profile.instrument(Metrics())
+    if cache is None:
+        cache = open_cache()
+    profile.watch(cache)
 
-        min_interest = metrics.minority_interest(symbol)
-        dcf -= min_interest
+    # computed from the statements, or looked up on GuruFocus
+    waccs = WaccProvider(cache)
 
-        # add data to csv
-        dataframe.loc[i, 'dcf'] = round(dcf, 2)
+    # get list of ticker symbols
+    tickers = dataframe['symbol'].tolist()
+
+    screener = Screener() if screen else None
+
+    # rows are journaled, and put into the csv at the end of the run
+    journal = ResultsJournal(infile, resume=resume)
+    results = None
+    if store:
+        results = ColumnStore.create(store_path(infile), tickers, resume)
+    snapshots = None
+    if db:
+        snapshots = SnapshotStore(db)
+        run_id = snapshots.begin_run("intrinsic_value", infile)
+
+    pending = range(0, len(tickers))
+    if resume:
+        done = journal.completed(tickers, max_age)
+        pending = [i for i in pending if i not in done]
+        print(f"Resuming: {len(done)} done, {len(pending)} to go")
+
+    queue = pending
+    for attempt in range(RETRY_ROUNDS + 1):
+        throttled = []
+        for i in queue:
+            # get ticker object, read through the fundamentals cache
+            symbol = CachedTicker(tickers[i], cache)
+            row = {}
+
+            try:
+                if screener is not None:
+                    if screener.screen(symbol, statements=()) is None:
+                        journal.append(i, tickers[i], {'screen': False})
+                        if results is not None:
+                            results.write(i, {'screen': False})
+                        if snapshots is not None:
+                            snapshots.write(run_id, tickers[i],
+                                            {'screen': False})
+                        continue
+                    row['screen'] = True
+
+                # the metrics turn any error into a zero, throttling included
+                symbol.prefetch(STATEMENTS)
+            except ThrottledError:
+                throttled.append(i)
+                print(f"{tickers[i]}: throttled, retrying later")
+                continue
+
+            try:
+                row.update(dcf_inputs(metrics, symbol, waccs, profile))
+            except ThrottledError:
+                throttled.append(i)
+                print(f"{tickers[i]}: WACC throttled, retrying later")
+                continue
+
+            print(f"Earnings: {row['earnings']}")
+            print(f"Avg growth rate: {row['aegr'] / 100}")
+            print(f"Weighted Avg Costs of Capital: {row['wacc']} "
+                  f"({row['wacc source']})")
+            print(f"Free Cash Flow: {row['fcf']}")
+
+            journal.append(i, tickers[i], row)
+            if results is not None:
+                results.write(i, row)
+            if snapshots is not None:
+                snapshots.write(run_id, tickers[i], row)
+
+        if not throttled:
+            break
+        queue = throttled
+    if throttled:
+        print(f"{len(throttled)} tickers still throttled, "
+              "run again with --resume")
+
+    if screener is not None:
+        print(screener.summary())
+    waccs.close()
+
+    journal.merge(dataframe)
+
+    # start discounting cash flows!
+    with profile.timer("dcf", "apply_dcf"):
+        apply_dcf(dataframe, markdown, horizon, term_growth)
+    if paths:
+        with profile.timer("dcf", "apply_monte_carlo"):
+            apply_monte_carlo(dataframe, paths, markdown, horizon,
+                              term_growth, seed)
+
+    # the journal stays while tickers are left for --resume
+    with profile.timer("write", "csv"):
+        journal.commit(dataframe, keep=bool(throttled))
+
+    if results is not None:
+        with profile.timer("write", "store"):
+            for column in DCF_OUTPUTS + MC_OUTPUTS:
+                if column in dataframe:
+                    results.write_column(column, dataframe[column])
+            results.close()
+
+    if snapshots is not None:
+        # the DCF columns of every ticker valued in this run
+        with profile.timer("write", "db"):
+            valued = [i for i in pending if 'dcf' in dataframe
+                      and pd.notna(dataframe.at[i, 'dcf'])]
+            for i in valued:
+                snapshots.write(run_id, tickers[i], {
+                    column: dataframe.at[i, column]
+                    for column in DCF_OUTPUTS + MC_OUTPUTS
+                    if column in dataframe
+                })
+            snapshots.close()
+
+    profile.close()
+
+
+def dcf_inputs(metrics, symbol, waccs, profile=None):
+    """
+    The DCF inputs of a ticker, along with the ratios stored next \
+            to them, as one row.
+
+    Raises ThrottledError when a statement, or the WACC, is still \
+            throttled after its retries.
+    """
+    row = {}
+    timer = profile.timer if profile is not None else _untimed
+
+    # net income
+    niev = round(metrics.net_income_to_ev(symbol), 2)
+
+    # add data to the row
+    row['niev'] = niev
+
+
+    # get net margin
+    net_margin = metrics.net_margin(symbol)
+
+    # add data to the row
+    row['net_margin'] = net_margin
+
+
+    # cash ratio
+    cash = metrics.cash_ratio(symbol)
+
+    # add data to the row
+    row['cash'] = cash
 
-        # divide total by shares outstanding
-        shares_outstanding = metrics.shares_outstanding(symbol)
 
-        try:
-            dcf_per_share = round(dcf / shares_outstanding, 2)
-        except:
-            dcf_per_share = 0
+    # return on assets
+    roa = round(metrics.avg_return_on_assets(symbol), 2)
 
-        # add data to csv
-        dataframe.loc[i, 'future price'] = dcf_per_share
+    # add data to the row
+    row['roa'] = roa
 
-        # dcf price per share with current price per share
-        pps = metrics.price_per_share(symbol)
 
-        # add data to csv
-        dataframe.loc[i, 'current price'] = pps
+    # get net income (net earnings)
+    try:
+        earnings = metrics.net_income(symbol)
+    except:
+        earnings = 0
 
-        # get expected growth over time
-        try:
-            growth = round((dcf_per_share - pps) / pps, 2) * 100
-        except:
-            growth = 0
+    # add data to the row
+    row['earnings'] = earnings
 
-        # add data to csv
-        dataframe.loc[i, 'growth'] = growth
+    # estimate rate of growth per year
+    aegr = metrics.avg_earnings_growth_rate(symbol)
+
+    # add data to the row
+    row['aegr'] = aegr
+
+    # spread of the yearly growth rates, for the Monte Carlo paths
+    row['aegr sd'] = metrics.sd_earnings_growth_rate(symbol)
+
+    # get average returns on capital
+    roc = metrics.avg_return_on_capital(symbol)
+
+    # add data to the row
+    row['avg roc'] = roc
+
+    # get working average costs of capital
+    with timer("wacc", "lookup", symbol.ticker):
+        wacc, source = waccs.lookup(symbol)
+
+    # add data to the row
+    row['wacc'] = wacc
+    row['wacc source'] = source
+
+    # get free cash flow
+    fcf = metrics.free_cash_flow(symbol)
+
+    # liabilities and minority interest, knocked off the dcf
+    liabilities = metrics.liabilities(symbol)
+    min_interest = metrics.minority_interest(symbol)
+
+    # shares outstanding, and current price per share
+    shares_outstanding = metrics.shares_outstanding(symbol)
+    pps = metrics.price_per_share(symbol)
+
+    # add data to the row
+    row['fcf'] = fcf
+    row['liabilities'] = liabilities
+    row['min interest'] = min_interest
+    row['shares'] = shares_outstanding
+    row['current price'] = pps
+
+    return row
+
+
+def _untimed(*args):
+    """ Stand-in for RunProfile.timer, when there is no profile."""
+    return contextlib.nullcontext()
+
+
+def valued_inputs(dataframe):
+    """
+    The DCF inputs of a frame, as numbers, and a mask of the rows \
+            that are to be valued: those with earnings, which the \
+            screen, if any, didn't reject.
+    """
+    missing = [column for column in DCF_INPUTS if column not in dataframe]
+    if missing:
+        raise SystemExit(f"no DCF inputs in file, missing: {missing}")
+
+    inputs = dataframe.loc[:, list(DCF_INPUTS)].apply(
+        pd.to_numeric, errors='coerce',
+    )
+    rows = inputs['earnings'].notna().to_numpy()
+    if 'screen' in dataframe:
+        # tickers rejected by the screen aren't valued
+        rows &= dataframe['screen'].ne(False).to_numpy()
+    return inputs, rows
+
+
+def apply_dcf(dataframe, markdown=EARNINGS_MARKDOWN,
+              horizon=TIME_HORIZON_YEARS, term_growth=TERMINAL_GROWTH):
+    """
+    Discount the cash flows of every row that has its DCF \
+            inputs, and fill in 'adj growth', 'dcf', \
+            'future price' and 'growth'.
+
+    Nothing is fetched, so the valuation of a whole file can \
+            be redone in milliseconds after a parameter change.
+    """
+    inputs, rows = valued_inputs(dataframe)
+
+    # mark down by 1/3rd (to be conservative)%
+    adj_aegr = adjusted_growth(inputs['aegr'], markdown)
+
+    result = discounted_cash_flow(
+        inputs['earnings'], adj_aegr, inputs['wacc'], inputs['fcf'],
+        inputs['liabilities'], inputs['min interest'],
+        inputs['shares'], inputs['current price'],
+        horizon=horizon, lookahead_rate=CAP_GAINS_TAX_RATE,
+        term_growth=term_growth,
+    )
+
+    # add data to csv
+    dataframe.loc[rows, 'adj growth'] = adj_aegr[rows]
+    for column in ('dcf', 'future price', 'growth'):
+        dataframe.loc[rows, column] = result[column][rows]
+
+
+def apply_monte_carlo(dataframe, paths=MC_PATHS, markdown=EARNINGS_MARKDOWN,
+                      horizon=TIME_HORIZON_YEARS,
+                      term_growth=TERMINAL_GROWTH, seed=None):
+    """
+    Simulate the future price of every row that has its DCF \
+            inputs over paths Monte Carlo paths, and fill in its \
+            5th, 50th and 95th percentiles, right after \
+            'future price'.
+
+    Rows without an 'aegr sd', such as those valued before it was \
+            stored, are simulated with the default growth spread.
+    """
+    inputs, rows = valued_inputs(dataframe)
+    inputs = inputs[rows]
+    if len(inputs) == 0:
+        return
+
+    spread = np.full(len(inputs), np.nan)
+    if 'aegr sd' in dataframe:
+        spread = pd.to_numeric(dataframe.loc[rows, 'aegr sd'], errors='coerce')
+
+    prices = monte_carlo(
+        inputs['earnings'], inputs['aegr'], spread, inputs['wacc'],
+        inputs['fcf'], inputs['liabilities'], inputs['min interest'],
+        inputs['shares'], paths=paths, markdown=markdown, horizon=horizon,
+        term_growth=term_growth, seed=seed,
+    )
+
+    # add data to csv, right after the point estimate
+    for offset, column in enumerate(MC_OUTPUTS):
+        if column not in dataframe:
+            position = dataframe.columns.get_loc('future price') + 1 + offset \
+                if 'future price' in dataframe else len(dataframe.columns)
+            dataframe.insert(position, column, float('nan'))
+        dataframe.loc[rows, column] = prices[:, offset]
+
+
+def cli(argv=None, prog=None):
+    """ Value the tickers of a CSV file, from the command line."""
+    # imported here, as it builds on this module
+    from sensitivity import AXES, parse_axis, summary_path, sweep
+
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Value stocks by DCF.")
+    parser.add_argument("infile", help="CSV file with a 'symbol' column")
+    parser.add_argument("--recompute", action="store_true",
+                        help="redo the DCF from stored inputs, no fetching")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="value from cached statements, without fetching")
+    parser.add_argument("--markdown", type=float, default=EARNINGS_MARKDOWN,
+                        help="fraction the earnings growth is marked down by")
+    parser.add_argument("--horizon", type=int, default=TIME_HORIZON_YEARS,
+                        help="years of cash flows to discount")
+    parser.add_argument("--term-growth", type=float, default=TERMINAL_GROWTH,
+                        help="terminal growth rate")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip tickers already valued by a failed run")
+    parser.add_argument("--max-age", type=float, default=RESUME_MAX_AGE,
+                        help="seconds a resumed result stays fresh")
+    parser.add_argument("--screen", action="store_true",
+                        help="only value tickers that pass the thresholds")
+    parser.add_argument("--store", action="store_true",
+                        help="also write results to a column store, "
+                             "<file>.cols")
+    parser.add_argument("--db", nargs="?", const=RESULTS_DB,
+                        help="also record results in a results database, "
+                             f"{RESULTS_DB} by default")
+    parser.add_argument("--monte-carlo", type=int, nargs="?", const=MC_PATHS,
+                        default=0, metavar="PATHS",
+                        help="also simulate the future price over PATHS "
+                             f"paths, {MC_PATHS} by default")
+    parser.add_argument("--seed", type=int,
+                        help="seed of the Monte Carlo paths")
+    parser.add_argument("--sensitivity", action="store_true",
+                        help="also value every ticker over a grid of "
+                             "parameters, to <file>.grid, and summarize "
+                             "it in <file>_sensitivity.csv")
+    for axis in AXES:
+        parser.add_argument(f"--grid-{axis.replace(' ', '-')}",
+                            type=parse_axis, metavar="VALUES",
+                            help=f"{axis} values of the grid, as a,b,c "
+                                 "or start:stop:count")
+    args = parser.parse_args(argv)
 
-        # output the results
-        print(f"\n\n\nCurrent Price per Share of {symbol.ticker}: {pps}")
-        print(f"Future Price per Share of {symbol.ticker}: {dcf_per_share}")
-        print(f"This is a growth of {growth}% over {TIME_HORIZON_YEARS} years")
+    # get ticker object from yahoo finance api
+    infile = args.infile
+    dataframe = pd.read_csv(infile)
 
-        dataframe.to_csv(infile, index=False)
+    if args.recompute:
+        apply_dcf(dataframe, args.markdown, args.horizon, args.term_growth)
+        if args.monte_carlo:
+            apply_monte_carlo(dataframe, args.monte_carlo, args.markdown,
+                              args.horizon, args.term_growth, args.seed)
+        write_csv(dataframe, infile)
+    else:
+        main(dataframe, infile, args.markdown, args.horizon, args.term_growth,
+             args.resume, args.max_age,
+             cache=open_cache(offline=args.from_cache), screen=args.screen,
+             store=args.store, db=args.db, paths=args.monte_carlo,
+             seed=args.seed)
+
+    if args.sensitivity:
+        axes = {
+            axis: getattr(args, f"grid_{axis.replace(' ', '_')}")
+            for axis in AXES
+        }
+        sweep(dataframe, infile, axes)
+        print(f"Sensitivity summary written to {summary_path(infile)}")
 
 
 if __name__ == "__main__":
-    # get ticker object from yahoo finance api
-    infile = sys.argv[1]
-    dataframe = pd.read_csv(infile)
-    main(dataframe, infile)
+    cli()
@@ -0,0 +1,280 @@
+# standard libraries
+import json
+from os import fsync, getenv, path, remove, replace
+import time
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+
+# environment variables and defaults
+JOURNAL_SYNC_EVERY = int(getenv("JOURNAL_SYNC_EVERY", 100))
+RESUME_MAX_AGE = float(getenv("RESUME_MAX_AGE", 24 * 60 * 60))
+
+
+class ResultsJournal:
+    """
+    Append-only sink for per-ticker result rows.
+
+    Each row is appended to <outfile>.journal as one JSON line, \
+            and the journal is fsync'ed every sync_every rows, so \
+            the cost of recording a ticker doesn't grow with the \
+            size of the file.
+
+    At the end of a run, compact() folds the journal into the \
+            output CSV, which is replaced atomically; a crash at \
+            any point leaves either the old file or the new one.
+
+    A resumed journal keeps the rows of the run that died, so \
+            the tickers it already scored can be skipped.
+    """
+
+    def __init__(self, outfile, sync_every=JOURNAL_SYNC_EVERY, resume=False):
+        self.outfile = outfile
+        self.path = f"{outfile}.journal"
+        self.sync_every = max(1, sync_every)
+        self._pending = 0
+
+        if resume:
+            _drop_partial_line(self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+        else:
+            self._file = open(self.path, "w", encoding="utf-8")
+
+
+    def append(self, row, symbol, values):
+        """ Record the result columns of the ticker at a given row."""
+        record = {
+            "row": int(row),
+            "symbol": symbol,
+            "ts": time.time(),
+            "values": values,
+        }
+        # NumPy scalars are converted as the encoder meets them
+        self._file.write(json.dumps(record, default=_plain) + "\n")
+        self._file.flush()
+        self._pending += 1
+        if self._pending >= self.sync_every:
+            self.sync()
+
+
+    def sync(self):
+        """ Flush the journal to disk."""
+        if self._file.closed:
+            return
+        self._file.flush()
+        fsync(self._file.fileno())
+        self._pending = 0
+
+
+    def records(self):
+        """ Read back every complete record in the journal."""
+        self.sync()
+        return read_journal(self.path)
+
+
+    def completed(self, symbols, max_age=RESUME_MAX_AGE):
+        """
+        Rows whose latest result is newer than max_age seconds, \
+                and still belongs to the same symbol.
+        """
+        return {
+            row for row, symbol in self.fresh(max_age).items()
+            if row < len(symbols) and symbol == symbols[row]
+        }
+
+
+    def fresh(self, max_age=RESUME_MAX_AGE):
+        """
+        Symbol of every row whose latest result is newer than \
+                max_age seconds, for runs that don't hold the \
+                whole list of symbols.
+        """
+        cutoff = time.time() - max_age
+        latest = {}
+        for record in self.records():
+            latest[record["row"]] = record
+
+        return {
+            row: record["symbol"] for row, record in latest.items()
+            if record["ts"] >= cutoff
+        }
+
+
+    def merge(self, frame):
+        """
+        Apply the journaled rows to a frame, in one bulk \
+                assignment per column; later rows win.
+        """
+        return _apply(frame, self.latest())
+
+
+    def latest(self):
+        """ Values of the latest record of every row."""
+        latest = {}
+        for record in self.records():
+            latest[record["row"]] = record["values"]
+        return latest
+
+
+    def commit(self, frame, keep=False):
+        """
+        Write the frame over the output file and drop the journal; \
+                with keep, the journal stays for a --resume to pick \
+                up the tickers the run left behind.
+        """
+        self.close()
+        write_csv(frame, self.outfile)
+        if not keep:
+            remove(self.path)
+
+
+    def compact(self, frame, keep=False):
+        """ Fold the journal into the frame, and commit it."""
+        self.merge(frame)
+        self.commit(frame, keep)
+
+
+    def compact_csv(self, chunksize, keep=False):
+        """
+        Fold the journal into the output file itself, chunksize \
+                rows at a time, so neither the file nor the journal \
+                is ever loaded whole: only the offset of each row's \
+                latest record is kept, and the records of a chunk \
+                are read back as it is written.
+
+        Cells the journal doesn't touch are copied over as text, \
+                exactly as they were. As with commit(), keep leaves \
+                the journal in place.
+        """
+        self.close()
+        offsets, added = _index_journal(self.path)
+        columns = list(pd.read_csv(self.outfile, nrows=0).columns)
+        columns.extend(column for column in added if column not in columns)
+
+        tmp = f"{self.outfile}.tmp"
+        chunks = pd.read_csv(self.outfile, dtype=str, keep_default_na=False,
+                             chunksize=chunksize)
+        with open(self.path, "rb") as journal, \
+                open(tmp, "w", encoding="utf-8", newline="") as output:
+            header = True
+            for chunk in chunks:
+                rows = {}
+                for row in chunk.index:
+                    if row in offsets:
+                        journal.seek(offsets[row])
+                        rows[row] = json.loads(journal.readline())["values"]
+                chunk = _apply(chunk, rows).reindex(columns=columns)
+                chunk.to_csv(output, index=False, header=header)
+                header = False
+            if header:
+                pd.DataFrame(columns=columns).to_csv(output, index=False)
+            output.flush()
+            fsync(output.fileno())
+        replace(tmp, self.outfile)
+        if not keep:
+            remove(self.path)
+
+
+    def close(self):
+        """ Sync and close the journal."""
+        self.sync()
+        self._file.close()
+
+
+def read_journal(filename):
+    """
+    Yield the records of a journal file, one line at a time, \
+            skipping any line left half-written by a crash.
+    """
+    if not path.exists(filename):
+        return
+
+    with open(filename, encoding="utf-8") as journal:
+        for line in journal:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _index_journal(filename):
+    """
+    Offset of the latest complete record of every row in a \
+            journal file, and the columns its records set, in the \
+            order they first appear.
+    """
+    offsets = {}
+    columns = {}
+    if not path.exists(filename):
+        return offsets, []
+
+    with open(filename, "rb") as journal:
+        offset = 0
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if record is not None:
+                offsets[record["row"]] = offset
+                columns.update(dict.fromkeys(record["values"]))
+            offset += len(line)
+    return offsets, list(columns)
+
+
+def _drop_partial_line(filename):
+    """ Cut a journal back to its last complete line."""
+    if not path.exists(filename):
+        return
+
+    with open(filename, "rb+") as journal:
+        data = journal.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            journal.truncate(end)
+
+
+def write_csv(frame, outfile):
+    """
+    Write a frame to CSV atomically: it goes to a temporary \
+            file first, which then replaces the output.
+    """
+    tmp = f"{outfile}.tmp"
+    frame.to_csv(tmp, index=False)
+    with open(tmp, "rb") as written:
+        fsync(written.fileno())
+    replace(tmp, outfile)
+
+
+def _apply(frame, latest):
+    """
+    Set the values of each row in latest on the frame.
+
+    The rows are built into one frame of their own, so every \
+            column gets its dtype once, from all of its values. \
+            Columns the frame already has are overwritten in one \
+            assignment each; new ones are added all at once, rather \
+            than grown cell by cell and upcast along the way.
+    """
+    if not latest:
+        return frame
+
+    results = pd.DataFrame.from_records(
+        list(latest.values()), index=list(latest),
+    )
+    added = [column for column in results.columns
+             if column not in frame.columns]
+    for column in results.columns:
+        if column not in added:
+            frame.loc[results.index, column] = results[column]
+    if added:
+        frame[added] = results[added].reindex(frame.index)
+    return frame
+
+
+def _plain(value):
+    """ Convert a NumPy scalar the JSON encoder can't handle."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
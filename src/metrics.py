@@ -1,6 +1,11 @@
+import functools
 from os import getenv
 import re
 
+import numpy as np
+
+from bundle import STATEMENTS
+
 class Metrics:
     def __init__(self):
         """
@@ -217,12 +222,8 @@ class Metrics:
 
     def inc_date(self, symbol):
         try:
-            inc = re.findall(r'[1]+[7-9]+[0-9]+[0-9]+', symbol.info['longBusinessSummary'])
+            inc = incorporation_date(symbol.info['longBusinessSummary'])
             print(f'inc date: {inc}')
-            if not inc:
-                inc = ''
-            elif len(inc) > 1:
-                inc = inc[-1]
             return inc
         except:
             inc = ''
@@ -470,19 +471,39 @@ class Metrics:
 
     def avg_earnings_growth_rate(self, symbol):
         """ Average earnings growth rate """
-        earnings = symbol.earnings.values
-        growth = []
-
-        for i in range(0, len(earnings) - 1):
-            growth.append((earnings[i + 1][1] - earnings[i][1]) / earnings[i][1])
+        growth = self._earnings_growth(symbol)
 
         if len(growth) == 0:
             avg = 0
         else:
-            avg = round((sum(growth) / len(growth)) * 100, 2)
+            avg = round(growth.mean() * 100, 2)
         return avg
 
 
+    def sd_earnings_growth_rate(self, symbol):
+        """
+        Standard deviation of the yearly earnings growth rates, \
+                in percent; NaN with fewer than two of them.
+        """
+        growth = self._earnings_growth(symbol)
+
+        if len(growth) < 2:
+            return np.nan
+        return round(float(growth.std(ddof=1)) * 100, 2)
+
+
+    def _earnings_growth(self, symbol):
+        """
+        Yearly earnings growth rates, oldest first, over every year; \
+                none without an earnings column.
+        """
+        frame = symbol.earnings
+        if frame is None or frame.empty or frame.shape[1] < 2:
+            return np.empty(0)
+        earnings = np.asarray(frame.values[:, 1], dtype=float)
+        return (earnings[1:] - earnings[:-1]) / earnings[:-1]
+
+
     def free_cash_flow(self, symbol):
         """ Get Free Cash Flow."""
         try:
@@ -650,3 +671,367 @@ class Metrics:
             debt_to_assets = 0
 
         return debt_to_assets
+
+
+    def compute_all(self, bundle):
+        """
+        Compute every column scoring.run writes, from a \
+                FundamentalsBundle.
+
+        Each column follows its per-ticker method above, including \
+                the zero it falls back to when a line item is missing, \
+                but works on the pre-extracted vectors instead of \
+                indexing the statements again.
+        """
+        return self.compute_columns(bundle, SCORE_COLUMNS)
+
+
+    def compute_ratios(self, bundle):
+        """
+        Compute the single-year value ratios from a \
+                FundamentalsBundle, keyed by the name of the \
+                per-ticker method each one follows.
+
+        These are the columns of the older screening layout \
+                (data/cheap.csv), which scoring.run doesn't write.
+        """
+        return self.compute_columns(bundle, RATIO_COLUMNS)
+
+
+    def compute_columns(self, bundle, columns):
+        """
+        Compute the given registered columns from a \
+                FundamentalsBundle, along with the columns they are \
+                derived from, and return the requested ones in order.
+        """
+        values = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name in _resolve(tuple(columns)):
+                values[name] = COLUMNS[name].compute(self, bundle, values)
+        return {name: values[name] for name in columns}
+
+
+    def _avg_return_on_capital(self, bundle):
+        """ avg_return_on_capital over a FundamentalsBundle."""
+        total_assets = bundle.total_assets
+        if total_assets is None or len(total_assets) == 0:
+            return 0
+
+        cap_employed = total_assets
+        if bundle.current_liabilities is not None:
+            cap_employed = total_assets - bundle.current_liabilities
+
+        net_income = bundle.net_income
+        if net_income is None:
+            net_income = np.zeros(4)
+        if len(net_income) < len(total_assets):
+            return 0
+
+        return (net_income[:len(total_assets)] / cap_employed).mean()
+
+
+# every column Metrics.compute_columns can produce, in dependency order
+COLUMNS = {}
+
+
+class Column:
+    """
+    A registered result column: the statements it reads, the \
+            columns it is derived from, and its compute function, \
+            called as compute(metrics, bundle, values) with the \
+            values of the columns computed before it.
+    """
+
+    __slots__ = ("name", "statements", "depends", "compute")
+
+    def __init__(self, name, statements, depends, compute):
+        self.name = name
+        self.statements = statements
+        self.depends = depends
+        self.compute = compute
+
+
+def column(name, statements=(), depends=()):
+    """ Register a compute function as a column."""
+    unknown = [dep for dep in depends if dep not in COLUMNS]
+    if unknown:
+        raise ValueError(f"{name} depends on unregistered {unknown}")
+
+    def register(compute):
+        COLUMNS[name] = Column(name, tuple(statements), tuple(depends),
+                               compute)
+        return compute
+    return register
+
+
+def resolve(columns):
+    """
+    The given columns and every column they are derived from, \
+            in the order they have to be computed in.
+    """
+    return list(_resolve(tuple(columns)))
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve(columns):
+    unknown = [name for name in columns if name not in COLUMNS]
+    if unknown:
+        raise ValueError(
+            f"unknown columns {unknown}, pick from {list(COLUMNS)}",
+        )
+
+    needed = set()
+    pending = list(columns)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(COLUMNS[name].depends)
+    return tuple(name for name in COLUMNS if name in needed)
+
+
+def statements_for(columns):
+    """ The statements the given columns are computed from."""
+    needed = {
+        statement for name in _resolve(tuple(columns))
+        for statement in COLUMNS[name].statements
+    }
+    return tuple(statement for statement in STATEMENTS
+                 if statement in needed)
+
+
+@column('roa', ('cashflow', 'balance_sheet'))
+def _roa(metrics, bundle, values):
+    return round(_mean_ratio(bundle.net_income, bundle.total_assets), 2)
+
+
+@column('roe', ('cashflow', 'balance_sheet'))
+def _roe(metrics, bundle, values):
+    return round(_mean_ratio(bundle.net_income, bundle.stockholder_equity), 2)
+
+
+@column('mce', ('balance_sheet', 'info'))
+def _mce(metrics, bundle, values):
+    equity = _first(bundle.stockholder_equity)
+    return round(_ratio(bundle.market_cap, equity), 2)
+
+
+@column('niev', ('cashflow', 'info'))
+def _niev(metrics, bundle, values):
+    # net_income_to_ev never resolves debt or cash, so its
+    # enterprise value is the market cap alone
+    net_income = _first(bundle.net_income)
+    return round(_ratio(_or_zero(net_income), bundle.market_cap), 2)
+
+
+@column('aegr', ('earnings',))
+def _aegr(metrics, bundle, values):
+    return _mean_growth(bundle.earnings)
+
+
+@column('afcf', ('cashflow',))
+def _afcf(metrics, bundle, values):
+    if bundle.operating_cash_flow is None:
+        fcf = None
+    elif bundle.capital_expenditures is None:
+        fcf = bundle.operating_cash_flow
+    else:
+        fcf = bundle.operating_cash_flow + bundle.capital_expenditures
+    return _mean_growth(fcf)
+
+
+@column('inc', ('info',))
+def _inc(metrics, bundle, values):
+    if bundle.summary is None:
+        return ''
+    return incorporation_date(bundle.summary)
+
+
+@column('avrt', depends=('roa', 'roe'))
+def _avrt(metrics, bundle, values):
+    return round(metrics.average_returns(values['roa'], values['roe']), 2)
+
+
+@column('wacc', ('balance_sheet', 'financials'), depends=('avrt',))
+def _wacc(metrics, bundle, values):
+    # weighted average costs of capital
+    mvd = _first(bundle.long_term_debt)
+    mve = _first(bundle.stockholder_equity)
+    if mvd is None and mve is None:
+        return 0
+    tsc = _or_zero(mvd) + _or_zero(mve)
+
+    cost_of_debt = abs(_ratio(
+        _first(bundle.interest_expense), _or_zero(mvd),
+    ))
+    tax_rate = round(abs(_ratio(
+        _first(bundle.income_tax_expense), _first(bundle.ebit),
+    )), 2)
+    debt_capital_value = _ratio(_or_zero(mvd), tsc) \
+        * cost_of_debt * (1 - tax_rate)
+    equity_capital_value = _ratio(_or_zero(mve), tsc) * values['avrt']
+    return round(debt_capital_value + equity_capital_value, 2)
+
+
+@column('ytd', depends=('avrt', 'wacc'))
+def _ytd(metrics, bundle, values):
+    avrt = values['avrt']
+    ytd = 10 if avrt == 0 else 1 / avrt
+    return round((values['wacc'] * 10) + ytd, 2)
+
+
+@column('exp_rat', ('financials', 'earnings'))
+def _exp_rat(metrics, bundle, values):
+    return round(_ratio(
+        _first(bundle.operating_expenses), _last(bundle.revenue),
+    ), 2)
+
+
+@column('debt / assets', ('balance_sheet',))
+def _debt_to_assets(metrics, bundle, values):
+    return round(_ratio(
+        _first(bundle.long_term_debt), _first(bundle.total_assets),
+    ), 2)
+
+
+@column('inc / earn', ('financials',))
+def _interest_to_earnings(metrics, bundle, values):
+    interest = _first(bundle.interest_expense)
+    return round(_ratio(
+        None if interest is None else abs(interest),
+        _first(bundle.operating_income),
+    ), 2)
+
+
+@column('roc', ('cashflow', 'balance_sheet'))
+def _roc(metrics, bundle, values):
+    return round(metrics._avg_return_on_capital(bundle), 2)
+
+
+@column('earnings_yield', ('balance_sheet', 'earnings', 'info'))
+def _earnings_yield(metrics, bundle, values):
+    # enterprise value, as in earnings_yield
+    market_cap = bundle.market_cap
+    if market_cap is None:
+        ev = 0
+    else:
+        ev = market_cap + _or_zero(_first(bundle.long_term_debt)) \
+            - _or_zero(_first(bundle.cash))
+    return round(_divide(_or_zero(_last(bundle.earnings)), ev), 2)
+
+
+@column('return_on_assets', ('cashflow', 'balance_sheet'))
+def _return_on_assets(metrics, bundle, values):
+    return _divide(
+        _or_zero(_first(bundle.net_income)),
+        _or_zero(_first(bundle.total_assets)),
+    )
+
+
+@column('equity_to_debt_ratio', ('balance_sheet',))
+def _equity_to_debt_ratio(metrics, bundle, values):
+    return round(_divide(
+        _or_zero(_first(bundle.stockholder_equity)),
+        _or_zero(_first(bundle.total_liabilities)),
+    ), 2)
+
+
+@column('net_net', ('balance_sheet', 'info'))
+def _net_net(metrics, bundle, values):
+    # liquidation value, as in net_net
+    nnwc = _or_zero(_first(bundle.current_assets)) \
+        + (0.75 * _or_zero(_first(bundle.receivables))) \
+        + (0.5 * _or_zero(_first(bundle.inventory))) \
+        - _or_zero(_first(bundle.total_liabilities))
+    return round(_divide(bundle.market_cap, nnwc), 2)
+
+
+@column('free_cash_flow', ('cashflow',))
+def _free_cash_flow(metrics, bundle, values):
+    cash_flow = _first(bundle.operating_cash_flow)
+    if cash_flow is None:
+        return 0
+    return cash_flow + _or_zero(_first(bundle.capital_expenditures))
+
+
+# columns scoring.run writes, as in Metrics.compute_all
+SCORE_COLUMNS = (
+    'roa', 'roe', 'mce', 'niev', 'aegr', 'afcf', 'inc', 'avrt',
+    'wacc', 'ytd', 'exp_rat', 'debt / assets', 'inc / earn', 'roc',
+)
+
+# columns of the older screening layout, as in Metrics.compute_ratios
+RATIO_COLUMNS = (
+    'earnings_yield', 'return_on_assets', 'equity_to_debt_ratio',
+    'net_net', 'free_cash_flow',
+)
+
+
+def incorporation_date(summary):
+    """ Find the incorporation year in a business summary."""
+    inc = re.findall(r'[1]+[7-9]+[0-9]+[0-9]+', summary)
+    if not inc:
+        inc = ''
+    elif len(inc) > 1:
+        inc = inc[-1]
+    return inc
+
+
+def _first(values):
+    """ Most recent value of a statement line item, if any."""
+    if values is None or len(values) == 0:
+        return None
+    return values[0]
+
+
+def _last(values):
+    """ Last value of a line item, if any."""
+    if values is None or len(values) == 0:
+        return None
+    return values[-1]
+
+
+def _or_zero(value):
+    """ A missing value counts as zero."""
+    return 0 if value is None else value
+
+
+def _ratio(numerator, denominator):
+    """ Divide two values, or 0 when either of them is missing."""
+    if numerator is None or denominator is None:
+        return 0
+    return np.float64(numerator) / denominator
+
+
+def _divide(numerator, denominator):
+    """
+    Divide two values the way the per-ticker methods do: 0 when \
+            either is missing, or where plain Python division by \
+            zero would raise, while NumPy values divide to inf or nan.
+    """
+    if numerator is None or denominator is None:
+        return 0
+    if denominator == 0 and not isinstance(numerator, np.generic) \
+            and not isinstance(denominator, np.generic):
+        return 0
+    return numerator / denominator
+
+
+def _mean_ratio(numerator, denominator):
+    """
+    Mean of the year-by-year ratio of two line items, or 0 when \
+            either is missing or the denominator has fewer years.
+    """
+    if numerator is None or denominator is None:
+        return 0
+    if len(numerator) == 0 or len(denominator) < len(numerator):
+        return 0
+    return (numerator / denominator[:len(numerator)]).mean()
+
+
+def _mean_growth(values):
+    """ Average year-over-year growth of a series, as a percentage."""
+    if values is None or len(values) < 2:
+        return 0
+    growth = (values[1:] - values[:-1]) / values[:-1]
+    return round(growth.mean() * 100, 2)
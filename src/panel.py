@@ -0,0 +1,274 @@
+# non-standard libraries
+import numpy as np
+
+# custom modules
+from bundle import FundamentalsBundle, INFO_ITEMS, LINE_ITEMS, STATEMENTS
+from cache import CachedTicker
+from metrics import incorporation_date
+
+# every statement line item, in panel order
+ITEMS = tuple(name for items in LINE_ITEMS.values() for name in items)
+
+# numeric info fields, in panel order
+FIELDS = tuple(name for name in INFO_ITEMS if name != "summary")
+
+
+class Panel:
+    """
+    Fundamentals for a whole ticker universe, held as dense arrays.
+
+    values is a (ticker x year x line item) float64 array, padded \
+            with NaN past the end of each line item.
+
+    lengths is a (ticker x line item) array with the number of \
+            years each line item has, or -1 where the statement \
+            doesn't carry it at all.
+
+    info is a (ticker x field) array of the numeric info fields, \
+            NaN where missing, and summaries holds the business \
+            summaries.
+
+    score() computes every column scoring.run writes for the \
+            whole universe at once, with the same results as \
+            Metrics.compute_all on each ticker's bundle.
+    """
+
+    def __init__(self, tickers, values, lengths, info, summaries):
+        self.tickers = list(tickers)
+        self.values = values
+        self.lengths = lengths
+        self.info = info
+        self.summaries = list(summaries)
+
+
+    @classmethod
+    def from_bundles(cls, bundles):
+        """ Stack FundamentalsBundles into a panel."""
+        bundles = list(bundles)
+        lengths = np.full((len(bundles), len(ITEMS)), -1, dtype=np.int64)
+        for row, bundle in enumerate(bundles):
+            for col, name in enumerate(ITEMS):
+                vector = getattr(bundle, name)
+                if vector is not None:
+                    lengths[row, col] = len(vector)
+
+        years = max(1, int(lengths.max(initial=0)))
+        values = np.full((len(bundles), years, len(ITEMS)), np.nan)
+        info = np.full((len(bundles), len(FIELDS)), np.nan)
+        for row, bundle in enumerate(bundles):
+            for col, name in enumerate(ITEMS):
+                vector = getattr(bundle, name)
+                if vector is not None:
+                    values[row, :len(vector), col] = vector
+            for col, name in enumerate(FIELDS):
+                value = getattr(bundle, name)
+                if value is not None:
+                    info[row, col] = value
+
+        return cls(
+            [bundle.ticker for bundle in bundles],
+            values, lengths, info,
+            [bundle.summary for bundle in bundles],
+        )
+
+
+    @classmethod
+    def from_cache(cls, cache, tickers, statements=STATEMENTS):
+        """
+        Build a panel from the statements already in a \
+                FundamentalsCache, without going upstream; line \
+                items of the other statements are left missing.
+        """
+        return cls.from_bundles(
+            FundamentalsBundle.from_ticker(
+                CachedTicker(ticker, cache, offline=True), statements,
+            )
+            for ticker in tickers
+        )
+
+
+    def item(self, name):
+        """ The (ticker x year) values and lengths of a line item."""
+        col = ITEMS.index(name)
+        return self.values[:, :, col], self.lengths[:, col]
+
+
+    def first(self, name):
+        """ Most recent value of a line item, and where it is present."""
+        values, lengths = self.item(name)
+        return values[:, 0], lengths > 0
+
+
+    def last(self, name):
+        """ Last value of a line item, and where it is present."""
+        values, lengths = self.item(name)
+        present = lengths > 0
+        index = np.where(present, lengths - 1, 0)
+        return values[np.arange(len(values)), index], present
+
+
+    def field(self, name):
+        """ A numeric info field, and where it is present."""
+        values = self.info[:, FIELDS.index(name)]
+        return values, ~np.isnan(values)
+
+
+    def score(self):
+        """
+        Compute every column scoring.run writes, for every \
+                ticker in the panel.
+
+        Returns a dict of column name to a per-ticker array, in \
+                the same order as Metrics.compute_all.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roa = np.round(self._mean_ratio("net_income", "total_assets"), 2)
+            roe = np.round(
+                self._mean_ratio("net_income", "stockholder_equity"), 2,
+            )
+
+            market_cap, has_market_cap = self.field("market_cap")
+            equity, has_equity = self.first("stockholder_equity")
+            mce = np.round(_ratio(
+                market_cap, has_market_cap, equity, has_equity,
+            ), 2)
+
+            # net_income_to_ev never resolves debt or cash, so its
+            # enterprise value is the market cap alone
+            net_income, has_net_income = self.first("net_income")
+            niev = np.round(_ratio(
+                np.where(has_net_income, net_income, 0), True,
+                market_cap, has_market_cap,
+            ), 2)
+
+            aegr = self._mean_growth(*self.item("earnings"))
+
+            cash_flow, fcf_lengths = self.item("operating_cash_flow")
+            cap_ex, cap_ex_lengths = self.item("capital_expenditures")
+            fcf = cash_flow + np.where(
+                (cap_ex_lengths >= 0)[:, None], cap_ex, 0,
+            )
+            afcf = self._mean_growth(fcf, fcf_lengths)
+
+            inc = [
+                '' if summary is None else incorporation_date(summary)
+                for summary in self.summaries
+            ]
+
+            avrt = np.round(roa + roe / 2, 2)
+
+            # weighted average costs of capital
+            mvd, has_mvd = self.first("long_term_debt")
+            mve, has_mve = self.first("stockholder_equity")
+            mvd = np.where(has_mvd, mvd, 0)
+            mve = np.where(has_mve, mve, 0)
+            has_tsc = has_mvd | has_mve
+            tsc = mvd + mve
+
+            interest, has_interest = self.first("interest_expense")
+            cost_of_debt = np.abs(_ratio(interest, has_interest, mvd, True))
+
+            tax_rate = np.round(np.abs(_ratio(
+                *self.first("income_tax_expense"), *self.first("ebit"),
+            )), 2)
+
+            debt_capital_value = (mvd / tsc) * cost_of_debt * (1 - tax_rate)
+            equity_capital_value = (mve / tsc) * avrt
+            wacc = np.where(
+                has_tsc,
+                np.round(debt_capital_value + equity_capital_value, 2),
+                0,
+            )
+
+            ytd = np.where(avrt == 0, 10, 1 / avrt)
+            fytd = np.round((wacc * 10) + ytd, 2)
+
+            exp_rat = np.round(_ratio(
+                *self.first("operating_expenses"), *self.last("revenue"),
+            ), 2)
+
+            dar = np.round(_ratio(
+                *self.first("long_term_debt"), *self.first("total_assets"),
+            ), 2)
+
+            operating_income, has_operating_income = \
+                self.first("operating_income")
+            incearn = np.round(_ratio(
+                np.abs(interest), has_interest,
+                operating_income, has_operating_income,
+            ), 2)
+
+            roc = np.round(self._avg_return_on_capital(), 2)
+
+        return {
+            'roa': roa,
+            'roe': roe,
+            'mce': mce,
+            'niev': niev,
+            'aegr': aegr,
+            'afcf': afcf,
+            'inc': inc,
+            'avrt': avrt,
+            'wacc': wacc,
+            'ytd': fytd,
+            'exp_rat': exp_rat,
+            'debt / assets': dar,
+            'inc / earn': incearn,
+            'roc': roc,
+        }
+
+
+    def _mean_ratio(self, numerator, denominator):
+        """
+        Mean of the year-by-year ratio of two line items, or 0 \
+                when either is missing or the denominator has \
+                fewer years.
+        """
+        num, num_lengths = self.item(numerator)
+        den, den_lengths = self.item(denominator)
+
+        valid = (num_lengths > 0) & (den_lengths >= num_lengths)
+        return _masked_mean(num / den, num_lengths, valid)
+
+
+    def _mean_growth(self, values, lengths):
+        """ Average year-over-year growth of a line item, as a percentage."""
+        growth = (values[:, 1:] - values[:, :-1]) / values[:, :-1]
+        avg = _masked_mean(growth, lengths - 1, lengths >= 2)
+        return np.round(avg * 100, 2)
+
+
+    def _avg_return_on_capital(self):
+        """ Metrics.avg_return_on_capital over the whole panel."""
+        total_assets, lengths = self.item("total_assets")
+        liabilities, liability_lengths = self.item("current_liabilities")
+        cap_employed = total_assets - np.where(
+            (liability_lengths >= 0)[:, None], liabilities, 0,
+        )
+
+        # a missing net income counts as four years of zeros
+        net_income, income_lengths = self.item("net_income")
+        missing = income_lengths < 0
+        net_income = np.where(missing[:, None], 0, net_income)
+        income_lengths = np.where(missing, 4, income_lengths)
+
+        valid = (lengths > 0) & (income_lengths >= lengths)
+        return _masked_mean(net_income / cap_employed, lengths, valid)
+
+
+def _masked_mean(values, lengths, valid):
+    """
+    Mean of the first lengths[i] values of each row, or 0 for \
+            rows that aren't valid.
+    """
+    count = np.where(valid, lengths, 1)
+    mask = np.arange(values.shape[1]) < count[:, None]
+    total = np.where(mask, values, 0).sum(axis=1)
+    return np.where(valid, total / count, 0)
+
+
+def _ratio(numerator, has_numerator, denominator, has_denominator):
+    """ Divide two arrays, or 0 where either of them is missing."""
+    return np.where(
+        has_numerator & has_denominator, numerator / denominator, 0,
+    )
@@ -0,0 +1,81 @@
+# standard libraries
+from os import getenv
+import queue
+import threading
+
+# non-standard libraries
+import pandas as pd
+
+# custom modules
+from universe import symbol_column
+
+# environment variables and defaults
+INGEST_CHUNK = int(getenv("INGEST_CHUNK", 1000))
+STAGE_QUEUE = int(getenv("STAGE_QUEUE", 64))
+
+# marks the end of a stage's output
+_DONE = object()
+
+
+def read_symbols(infile, chunksize=INGEST_CHUNK):
+    """
+    Yield the (row, symbol) of every ticker in a file, reading \
+            only its symbol column, chunksize rows at a time.
+    """
+    column = symbol_column(pd.read_csv(infile, nrows=0))
+    row = 0
+    for chunk in pd.read_csv(infile, usecols=[column], chunksize=chunksize):
+        for symbol in chunk[column].tolist():
+            yield row, symbol
+            row += 1
+
+
+def stage(items, size=STAGE_QUEUE):
+    """
+    Run a generator in a thread of its own, handing its items \
+            over through a queue of at most size items.
+
+    A full queue blocks the stage, so a slow consumer holds back \
+            every stage before it, instead of letting them run \
+            ahead and pile up results. An error raised in the \
+            stage is raised again in the consumer.
+    """
+    channel = queue.Queue(maxsize=max(1, size))
+    stop = threading.Event()
+
+    def put(item):
+        """ Queue an item, unless the consumer went away."""
+        while not stop.is_set():
+            try:
+                channel.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as error:
+            put((_DONE, error))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = channel.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,75 @@
+# standard libraries
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+
+# environment variables and defaults
+WORKERS = int(getenv("WORKERS", 1))
+
+
+class FetchPool:
+    """
+    Bounded pool of threads running a fetch for every item.
+
+    Fetches run concurrently, but results are handed back in \
+            input order, so whatever consumes them stays \
+            deterministic.
+
+    At most workers * backlog fetches are in flight at once, \
+            which keeps memory bounded on large universes.
+    """
+
+    def __init__(self, fetch, workers=WORKERS, backlog=2):
+        self.fetch = fetch
+        self.workers = max(1, int(workers))
+        self.window = self.workers * backlog
+
+
+    def map(self, items):
+        """
+        Fetch every item, yielding (item, result, error) in \
+                input order.
+
+        A failed fetch yields its exception as the error, and \
+                None as the result, instead of aborting the batch.
+        """
+        if self.workers == 1:
+            for item in items:
+                yield self._resolve(item, None)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        pending = deque()
+        try:
+            for item in items:
+                pending.append((item, executor.submit(self._call, item)))
+                if len(pending) >= self.window:
+                    yield self._resolve(*pending.popleft())
+
+            while pending:
+                yield self._resolve(*pending.popleft())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+    def _call(self, item):
+        """ Run the fetch for one item, capturing its failure."""
+        try:
+            return self.fetch(item), None
+        except Exception as exc:
+            return None, exc
+
+
+    def _resolve(self, item, future):
+        """ Wait for the fetch of one item, or run it inline."""
+        try:
+            if future is None:
+                result, error = self._call(item)
+            else:
+                result, error = future.result()
+        except KeyboardInterrupt as exc:
+            # an interrupt skips the ticker at hand, not the whole run
+            if future is not None:
+                future.cancel()
+            result, error = None, exc
+        return item, result, error
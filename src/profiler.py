@@ -0,0 +1,227 @@
+# standard libraries
+from contextlib import contextmanager
+import functools
+import json
+from os import getenv, makedirs, path, replace
+import threading
+import time
+
+# environment variables and defaults; an empty PROFILE_DIR turns
+# the export off
+PROFILE_DIR = getenv("PROFILE_DIR", "data/profiles")
+
+# prefix of every exported Prometheus metric
+METRIC_PREFIX = "value_stocks"
+
+
+class RunProfile:
+    """
+    Wall time of the work done during a run, per ticker and in total.
+
+    Timings are keyed by a kind and a name, such as \
+            ('metric', 'net_margin'), ('read', 'cashflow') for a \
+            statement read through the cache, ('upstream', 'info') \
+            for the part of it that went to Yahoo or GuruFocus, or \
+            ('write', 'csv').
+
+    Timers can run on several threads at once, so fetches made by \
+            a pool of workers are counted too.
+
+    At the end of a run, export() writes the profile as \
+            <name>.json, and as <name>.prom in the Prometheus text \
+            format, for a node exporter's textfile collector.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.cache = None
+        self._cache_counts = (0, 0)
+        self.totals = {}
+        self.tickers = {}
+        self._clock = time.perf_counter()
+        self._lock = threading.Lock()
+
+
+    @contextmanager
+    def timer(self, kind, name, ticker=None):
+        """ Time the body of a with statement."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, time.perf_counter() - start, ticker)
+
+
+    def record(self, kind, name, seconds, ticker=None):
+        """ Add one timed call to the totals, and to its ticker's."""
+        key = f"{kind}.{name}"
+        with self._lock:
+            total = self.totals.setdefault(
+                key, {"calls": 0, "seconds": 0.0, "max": 0.0},
+            )
+            total["calls"] += 1
+            total["seconds"] += seconds
+            total["max"] = max(total["max"], seconds)
+
+            if ticker is not None:
+                timings = self.tickers.setdefault(ticker, {})
+                timings[key] = timings.get(key, 0.0) + seconds
+
+
+    def instrument(self, metrics):
+        """
+        Time every public method of a Metrics instance, charged \
+                to the ticker of the symbol or bundle it is given.
+        """
+        for name in dir(metrics):
+            method = getattr(metrics, name)
+            if name.startswith("_") or not callable(method):
+                continue
+            setattr(metrics, name, self._timed("metric", name, method))
+        return metrics
+
+
+    def watch(self, cache):
+        """
+        Time the statement reads of a FundamentalsCache, and \
+                report its hits and misses during the run.
+        """
+        self.cache = cache
+        self._cache_counts = (cache.hits, cache.misses)
+        cache.profile = self
+        return cache
+
+
+    def close(self, directory=None):
+        """ Stop watching the cache, and export the profile."""
+        if self.cache is not None:
+            self.cache.profile = None
+        return self.export(directory)
+
+
+    def _timed(self, kind, name, method):
+        """ Wrap a method so each call is timed."""
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            ticker = getattr(args[0], "ticker", None) if args else None
+            with self.timer(kind, name, ticker):
+                return method(*args, **kwargs)
+        return timed
+
+
+    def to_dict(self):
+        """ The profile, as JSON-friendly values."""
+        with self._lock:
+            profile = {
+                "run": self.name,
+                "started": self.started,
+                "seconds": time.perf_counter() - self._clock,
+                "tickers": len(self.tickers),
+                "cache": None,
+                "totals": {key: dict(total)
+                           for key, total in sorted(self.totals.items())},
+                "per_ticker": {ticker: dict(timings)
+                               for ticker, timings in self.tickers.items()},
+            }
+        if self.cache is not None:
+            hits, misses = self._cache_counts
+            profile["cache"] = {
+                "hits": self.cache.hits - hits,
+                "misses": self.cache.misses - misses,
+            }
+        return profile
+
+
+    def to_prometheus(self, profile=None):
+        """ The run totals, in the Prometheus text exposition format."""
+        if profile is None:
+            profile = self.to_dict()
+        run = _label(profile["run"])
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                labels = ",".join(
+                    [f'run="{run}"']
+                    + [f'{key}="{_label(val)}"' for key, val in labels]
+                )
+                lines.append(f"{METRIC_PREFIX}_{name}{{{labels}}} {value!r}")
+
+        totals = [
+            (key.split(".", 1), total)
+            for key, total in profile["totals"].items()
+        ]
+        metric("calls_total", "counter", "Timed calls, by kind and name.",
+               [((("kind", kind), ("name", name)), total["calls"])
+                for (kind, name), total in totals])
+        metric("seconds_total", "counter",
+               "Wall time spent, by kind and name.",
+               [((("kind", kind), ("name", name)), total["seconds"])
+                for (kind, name), total in totals])
+        metric("max_seconds", "gauge",
+               "Slowest single call, by kind and name.",
+               [((("kind", kind), ("name", name)), total["max"])
+                for (kind, name), total in totals])
+
+        if profile["cache"] is not None:
+            metric("cache_hits_total", "counter",
+                   "Statements served by the fundamentals cache.",
+                   [((), profile["cache"]["hits"])])
+            metric("cache_misses_total", "counter",
+                   "Statements missing or stale in the fundamentals cache.",
+                   [((), profile["cache"]["misses"])])
+
+        metric("run_seconds", "gauge", "Wall time of the whole run.",
+               [((), profile["seconds"])])
+        metric("run_tickers", "gauge", "Tickers with timed work in the run.",
+               [((), profile["tickers"])])
+        metric("run_started_seconds", "gauge",
+               "Unix time the run started at.",
+               [((), profile["started"])])
+
+        return "\n".join(lines) + "\n"
+
+
+    def export(self, directory=None):
+        """
+        Write <name>.json and <name>.prom to a directory, \
+                PROFILE_DIR by default, and return their paths.
+        """
+        if directory is None:
+            directory = PROFILE_DIR
+        if not directory:
+            return None
+
+        makedirs(directory, exist_ok=True)
+        profile = self.to_dict()
+        base = path.join(directory, self.name)
+
+        _write(f"{base}.json", json.dumps(profile, indent=2) + "\n")
+        _write(f"{base}.prom", self.to_prometheus(profile))
+        return f"{base}.json", f"{base}.prom"
+
+
+def run_name(script, infile):
+    """ Profile name of a script's run over an input file."""
+    return f"{script}-{path.splitext(path.basename(infile))[0]}"
+
+
+def _label(value):
+    """ Escape a Prometheus label value."""
+    return (str(value).replace("\\", "\\\\")
+            .replace("\n", "\\n").replace('"', '\\"'))
+
+
+def _write(filename, text):
+    """
+    Write a file atomically, so a collector never reads it \
+            half-written.
+    """
+    tmp = f"{filename}.tmp"
+    with open(tmp, "w", encoding="utf-8") as output:
+        output.write(text)
+    replace(tmp, filename)
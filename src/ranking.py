@@ -0,0 +1,258 @@
+# standard libraries
+import argparse
+from os import path
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+
+# custom modules
+from store import ColumnStore, store_path
+from universe import symbol_column
+
+# the two legs of Greenblatt's magic formula; 'niev' stands in for
+# the earnings yield in files that don't have it
+MAGIC_FORMULA = ('earnings_yield', 'roc')
+EARNINGS_YIELD_COLUMNS = ('earnings_yield', 'niev')
+
+# tickers kept ready to be listed, and updates absorbed before the
+# candidates of the top are picked again
+TOP_SIZE = 100
+REFRESH_UPDATES = 32
+
+
+class Ranking:
+    """
+    Combined ranks of every ticker of a universe, over several \
+            metrics, as in the magic formula: each metric ranks the \
+            tickers from best (1) to worst, and the ticker with the \
+            lowest sum of ranks comes first.
+
+    A metric is higher-is-better, or lower-is-better when named as \
+            'column:asc'. Tied values share the better rank, and a \
+            ticker missing any metric isn't ranked.
+
+    The ranks are built once, with a sort per metric; refreshing \
+            the metrics of one ticker then only moves the ranks it \
+            crosses, in one vectorized pass, without sorting the \
+            universe again.
+
+    The top is served from a pool of candidates, picked so that \
+            the best size tickers stay among them for the next \
+            REFRESH_UPDATES updates, whatever those are; listing it \
+            only sorts the pool.
+    """
+
+    def __init__(self, symbols, values, metrics, size=TOP_SIZE):
+        self.symbols = np.asarray(symbols, dtype=str)
+        self.metrics = list(metrics)
+        self.size = max(1, size)
+        self._rows = {symbol: row for row, symbol
+                      in enumerate(self.symbols.tolist())}
+        self._signs = np.array(
+            [-1.0 if metric.endswith(":asc") else 1.0 for metric in metrics],
+        )
+
+        # higher is better along every column
+        self.values = np.asarray(values, dtype=float) * self._signs
+        self.ranks = np.column_stack([
+            _ranks(column) for column in self.values.T
+        ])
+        self.combined = self.ranks.sum(axis=1)
+        self._pick()
+
+
+    @classmethod
+    def from_frame(cls, frame, metrics, size=TOP_SIZE):
+        """ Rank the tickers of a results frame."""
+        columns = [column_of(metric) for metric in metrics]
+        values = np.column_stack([
+            pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=float)
+            for column in columns
+        ])
+        return cls(frame[symbol_column(frame)], values, metrics, size)
+
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+    def update(self, symbol, values):
+        """
+        Refresh the metrics of one ticker, given in the order of \
+                self.metrics, and move every rank that changes.
+        """
+        row = self._rows[symbol]
+        old = self.values[row].copy()
+        new = np.asarray(values, dtype=float) * self._signs
+
+        # a rank counts the better values, so a ticker gains one for
+        # a value moving above its own, and loses one moving below
+        with np.errstate(invalid='ignore'):
+            delta = (new > self.values).astype(float) \
+                - (old > self.values)
+        self.ranks += delta
+        self.combined += delta.sum(axis=1)
+
+        self.values[row] = new
+        for metric, value in enumerate(new):
+            self.ranks[row, metric] = np.nan if np.isnan(value) \
+                else 1 + np.count_nonzero(self.values[:, metric] > value)
+        self.combined[row] = self.ranks[row].sum()
+
+        self._updates += 1
+        if self._updates > REFRESH_UPDATES:
+            self._pick()
+        elif self.combined[row] <= self._bound:
+            self._pool[row] = True
+
+
+    def top(self, count=None):
+        """
+        The best count tickers, size by default, as a frame of their \
+                combined rank, rank per metric and values, best first.
+        """
+        count = self.size if count is None else count
+        if count > self.size:
+            rows = _best(self.combined, count)
+        else:
+            rows = np.flatnonzero(self._pool)
+            rows = rows[np.lexsort((rows, self.combined[rows]))][:count]
+        rows = rows[np.isfinite(self.combined[rows])]
+
+        frame = pd.DataFrame({
+            'symbol': self.symbols[rows],
+            'rank': self.combined[rows].astype(int),
+        })
+        for metric, name in enumerate(self.metrics):
+            column = column_of(name)
+            frame[f"{column} rank"] = self.ranks[rows, metric].astype(int)
+            frame[column] = self.values[rows, metric] * self._signs[metric]
+        return frame
+
+
+    def _pick(self):
+        """
+        Pick the candidates of the top again: every ticker whose \
+                combined rank could still reach the best size over \
+                the next REFRESH_UPDATES updates.
+
+        An update moves each combined rank by at most one per \
+                metric; tickers other than the updated ones can only \
+                pass those that are updated, so with size + \
+                REFRESH_UPDATES candidates, and a margin of two \
+                moves per update, the top can't leave the pool.
+        """
+        self._updates = 0
+        combined = np.where(np.isnan(self.combined), np.inf, self.combined)
+        depth = min(len(combined), self.size + REFRESH_UPDATES)
+        if depth == 0:
+            self._bound = -np.inf
+            self._pool = np.zeros(0, dtype=bool)
+            return
+        edge = np.partition(combined, depth - 1)[depth - 1]
+        self._bound = edge + 2 * REFRESH_UPDATES * len(self.metrics)
+        self._pool = combined <= self._bound
+
+
+def column_of(metric):
+    """ The result column of a metric, without its direction."""
+    return metric[:-len(":asc")] if metric.endswith(":asc") else metric
+
+
+def magic_formula(columns):
+    """
+    The metrics of the magic formula, with whichever earnings \
+            yield column the results have.
+    """
+    earnings_yield = next(
+        (column for column in EARNINGS_YIELD_COLUMNS if column in columns),
+        MAGIC_FORMULA[0],
+    )
+    return [earnings_yield] + list(MAGIC_FORMULA[1:])
+
+
+def result_columns(infile):
+    """ Names of the columns of a results file, or of its store."""
+    directory = store_path(infile)
+    if path.exists(directory):
+        return ColumnStore(directory).columns
+    return list(pd.read_csv(infile, nrows=0).columns)
+
+
+def load_results(infile, metrics):
+    """
+    The symbols and metric columns of a results file, mapped from \
+            the column store next to it when there is one, or else \
+            read from the file itself; only those columns are read.
+    """
+    directory = store_path(infile)
+    if path.exists(directory):
+        store = ColumnStore(directory)
+        return store.to_frame([column_of(metric) for metric in metrics
+                               if column_of(metric) in store])
+
+    symbol = symbol_column(pd.read_csv(infile, nrows=0))
+    return pd.read_csv(infile, usecols=lambda column: column == symbol or any(
+        column == column_of(metric) for metric in metrics
+    ))
+
+
+def _ranks(values):
+    """
+    Rank of every value, 1 for the highest, ties sharing the \
+            better rank; NaN for missing values.
+    """
+    present = ~np.isnan(values)
+    ascending = np.sort(values[present])
+    ranks = np.full(len(values), np.nan)
+    ranks[present] = 1 + len(ascending) - np.searchsorted(
+        ascending, values[present], side='right',
+    )
+    return ranks
+
+
+def _best(combined, count):
+    """ Rows of the count lowest combined ranks, best first."""
+    combined = np.where(np.isnan(combined), np.inf, combined)
+    count = min(count, len(combined))
+    if count == 0:
+        return np.zeros(0, dtype=int)
+    rows = np.argpartition(combined, count - 1)[:count]
+    return rows[np.lexsort((rows, combined[rows]))]
+
+
+def cli(argv=None, prog=None):
+    """ Print the top tickers of a results file, from the command line."""
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Rank the tickers of a results file.",
+    )
+    parser.add_argument("infile", help="results CSV file")
+    parser.add_argument("--by", nargs="+", metavar="METRIC",
+                        help="result columns to rank by, higher is "
+                             "better, or lower with a ':asc' suffix; "
+                             "the magic formula by default")
+    parser.add_argument("--top", type=int, default=30,
+                        help="number of tickers to list")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="accepted for symmetry; ranking never fetches")
+    args = parser.parse_args(argv)
+
+    metrics = args.by
+    if metrics is None:
+        metrics = magic_formula(result_columns(args.infile))
+    frame = load_results(args.infile, metrics)
+
+    missing = [column_of(metric) for metric in metrics
+               if column_of(metric) not in frame.columns]
+    if missing:
+        raise SystemExit(f"no such columns in {args.infile}: {missing}")
+
+    ranking = Ranking.from_frame(frame, metrics, size=args.top)
+    with pd.option_context("display.max_rows", None,
+                           "display.width", None):
+        print(ranking.top(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    cli()
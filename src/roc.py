@@ -1,8 +1,38 @@
 #!/usr/bin/python3
 
-import yfinance
+# standard libraries
+import argparse
+
+# custom modules
+from cache import CachedTicker, open_cache
 from metrics import Metrics
 
-symbol = yfinance.Ticker('AAPL')
-roc = Metrics().avg_return_on_capital(symbol)
-print(f"Average Return on Capital: {roc}")
+
+def main(ticker, cache=None):
+    """
+    Print the average return on capital of one ticker.
+
+    Statements are read through the given cache, or open_cache().
+    """
+    if cache is None:
+        cache = open_cache()
+    symbol = CachedTicker(ticker, cache)
+    roc = Metrics().avg_return_on_capital(symbol)
+    print(f"Average Return on Capital: {roc}")
+
+
+def cli(argv=None, prog=None):
+    """ Print the return on capital of a ticker, from the command line."""
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Return on capital.")
+    parser.add_argument("ticker", nargs="?", default="AAPL",
+                        help="ticker symbol, AAPL by default")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="read cached statements only, without fetching")
+    args = parser.parse_args(argv)
+
+    main(args.ticker, open_cache(offline=args.from_cache))
+
+
+if __name__ == "__main__":
+    cli()
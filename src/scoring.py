@@ -0,0 +1,387 @@
+# standard libraries
+import argparse
+import pandas as pd
+
+# custom modules
+from bundle import FundamentalsBundle
+from cache import FUNDAMENTALS_MODE, CachedTicker, open_cache
+from journal import RESUME_MAX_AGE, ResultsJournal, write_csv
+from metrics import Metrics, SCORE_COLUMNS, statements_for
+from panel import Panel
+from pipeline import INGEST_CHUNK, read_symbols, stage
+from pool import FetchPool, WORKERS
+from profiler import RunProfile, run_name
+from screen import Screener
+from snapshots import RESULTS_DB, SnapshotStore
+from statements import load_directory
+from store import ColumnStore, store_path
+from throttle import RETRY_ROUNDS, ThrottledError
+from universe import SymbolIndex, Universe, symbol_column
+
+
+def run(infile, workers=WORKERS, resume=False, max_age=RESUME_MAX_AGE,
+        cache=None, screen=False, columns=SCORE_COLUMNS, store=False,
+        db=None):
+    """
+    Does the actual processing of the data
+
+    Tickers are streamed through fetch, score and write stages: \
+            symbols are read from the file a chunk at a time, \
+            statements are fetched by a pool of workers, and \
+            scoring runs on a thread of its own, while writing \
+            stays on this thread, in input order. The stages are \
+            joined by bounded queues, so none runs far ahead of the \
+            next one, and the statements of a ticker are let go of \
+            as soon as its line items are extracted; memory stays \
+            flat however many tickers the file lists.
+
+    When resuming, tickers the journal already has results for, \
+            newer than max_age seconds, are not fetched again.
+
+    Statements are read through the given cache, or open_cache().
+
+    When screening, each ticker is first checked against the \
+            screen thresholds, and one that fails is marked as such \
+            in the 'screen' column, without fetching the rest of \
+            its statements or scoring it.
+
+    Only the given columns are computed, along with the columns \
+            they are derived from, and only the statements those \
+            need are fetched.
+
+    With store, every row is also written, as it is scored, to \
+            the memory-mapped column store next to the file.
+
+    With db, the path of a results database, the rows are also \
+            recorded there as a new run.
+
+    Tickers Yahoo still throttles after their retries are put \
+            back for up to RETRY_ROUNDS more passes, rather than \
+            scored as missing; any left after that are left out, \
+            for a --resume to pick up.
+
+    The time spent fetching, scoring and writing is exported as a \
+            run profile at the end.
+    """
+    profile = RunProfile(run_name("entrypoint", infile))
+    attrs = profile.instrument(Metrics())
+    if cache is None:
+        cache = open_cache()
+    profile.watch(cache)
+
+    screener = Screener() if screen else None
+    statements = statements_for(columns)
+
+    def fetch(item):
+        """ Grab the desired stock attributes."""
+        row, ticker = item
+        symbol = CachedTicker(ticker, cache)
+        with profile.timer("fetch", "bundle", ticker):
+            try:
+                if screener is not None:
+                    return screener.screen(symbol, statements)
+                return FundamentalsBundle.from_ticker(symbol, statements)
+            finally:
+                # only the extracted line items go down the pipeline
+                symbol.release()
+
+    def score(fetched):
+        """ Score the fetched bundles, as they come in."""
+        for (row, ticker), bundle, error in fetched:
+            if error is not None:
+                yield row, ticker, None, error
+            elif bundle is None:
+                # rejected by the screen, so it is never scored
+                yield row, ticker, {'screen': False}, None
+            else:
+                scores = attrs.compute_columns(bundle, columns)
+                if screener is not None:
+                    scores['screen'] = True
+                yield row, ticker, scores, None
+
+    pool = FetchPool(fetch, workers)
+    journal = ResultsJournal(infile, resume=resume)
+    results = None
+    if store:
+        # the store has a row per ticker, so it needs them all up front
+        symbols = [symbol for _, symbol in read_symbols(infile)]
+        results = ColumnStore.create(store_path(infile), symbols, resume)
+    snapshots = None
+    if db:
+        snapshots = SnapshotStore(db)
+        run_id = snapshots.begin_run("entrypoint", infile)
+
+    pending = read_symbols(infile)
+    if resume:
+        done = journal.fresh(max_age)
+        pending = (item for item in pending if done.get(item[0]) != item[1])
+        print(f"Resuming: {len(done)} done")
+
+    for attempt in range(RETRY_ROUNDS + 1):
+        throttled = []
+        for row, ticker, scores, error in stage(score(pool.map(pending))):
+            print(ticker)
+            if isinstance(error, ThrottledError):
+                # fetched again in the next round
+                throttled.append((row, ticker))
+                print(f"{ticker}: throttled, retrying later")
+                continue
+            if error is not None:
+                # leave the row as it was, and move on to the next ticker
+                print(f"{ticker}: {error!r}")
+                continue
+
+            try:
+                # record the scores, to be put into the spreadsheet
+                journal.append(row, ticker, scores)
+                if results is not None:
+                    results.write(row, scores)
+                if snapshots is not None:
+                    snapshots.write(run_id, ticker, scores)
+
+            except KeyboardInterrupt:
+                continue
+
+        if not throttled:
+            break
+        pending = throttled
+    if throttled:
+        print(f"{len(throttled)} tickers still throttled, "
+              "run again with --resume")
+
+    if screener is not None:
+        print(screener.summary())
+
+    # input scores into spreadsheet, a chunk of rows at a time; the
+    # journal stays while tickers are left for --resume
+    with profile.timer("write", "csv"):
+        journal.compact_csv(INGEST_CHUNK, keep=bool(throttled))
+
+    if results is not None:
+        with profile.timer("write", "store"):
+            results.close()
+
+    if snapshots is not None:
+        with profile.timer("write", "db"):
+            snapshots.close()
+
+    profile.close()
+
+
+def run_multi(files, workers=WORKERS, resume=False, max_age=RESUME_MAX_AGE,
+              cache=None, columns=None):
+    """
+    Score several files in one pass
+
+    Every ticker listed in any of the files is fetched and scored \
+            once, then its results are fanned out to each file that \
+            lists it, in that file's own column layout.
+
+    Only the scores the files' layouts need, or the given columns \
+            of those, are computed, and only their statements fetched.
+
+    A file of no known layout, such as a DCF output, is skipped \
+            with an error, and left as it was.
+
+    Results only go to the files themselves: there is no screen, \
+            column store or results database, as with run().
+    """
+    universes = []
+    for infile in dict.fromkeys(files):
+        try:
+            universes.append(Universe(infile))
+        except ValueError as error:
+            print(f"{infile}: skipped, {error}")
+    index = SymbolIndex(universes)
+
+    wanted = tuple(dict.fromkeys(
+        key for universe in index.universes for key in universe.layout.values()
+    ))
+    if columns is not None:
+        wanted = tuple(key for key in wanted if key in columns)
+    statements = statements_for(wanted)
+
+    profile = RunProfile("entrypoint-multi")
+    attrs = profile.instrument(Metrics())
+    if cache is None:
+        cache = open_cache()
+    profile.watch(cache)
+
+    def fetch(ticker):
+        """ Grab the desired stock attributes."""
+        with profile.timer("fetch", "bundle", ticker):
+            return FundamentalsBundle.from_ticker(
+                CachedTicker(ticker, cache), statements,
+            )
+
+    pool = FetchPool(fetch, workers)
+    journals = {
+        universe: ResultsJournal(universe.infile, resume=resume)
+        for universe in index.universes
+    }
+
+    pending = index.tickers
+    if resume:
+        done = {
+            universe: journal.completed(universe.symbols, max_age)
+            for universe, journal in journals.items()
+        }
+        pending = [
+            ticker for ticker in pending
+            if not all(row in done[universe]
+                       for universe, row in index.rows[ticker])
+        ]
+    print(f"{len(pending)} of {len(index)} unique tickers "
+          f"across {len(index.universes)} files to score")
+
+    for ticker, bundle, error in pool.map(pending):
+        print(ticker)
+        if error is not None:
+            # leave the rows as they were, and move on to the next ticker
+            print(f"{ticker}: {error!r}")
+            continue
+
+        try:
+            scores = attrs.compute_columns(bundle, wanted)
+
+            # record the scores in every file that lists the ticker
+            for universe, row in index.rows[ticker]:
+                journals[universe].append(row, ticker, universe.row(scores))
+
+        except KeyboardInterrupt:
+            continue
+
+    # input scores into each spreadsheet
+    with profile.timer("write", "csv"):
+        for universe, journal in journals.items():
+            journal.compact(universe.frame)
+
+    profile.close()
+
+
+def run_from_cache(infile, cache=None, columns=SCORE_COLUMNS):
+    """
+    Score every ticker in the file from cached statements only, \
+            with the vectorized Panel engine, and write the CSV once.
+
+    Only the statements the given columns need are read, and only \
+            those columns are written.
+
+    With FUNDAMENTALS_MODE=local and no cache given, the whole \
+            statements directory is parsed straight into bundles \
+            instead; a ticker without a file has no statements.
+    """
+    unknown = [column for column in columns if column not in SCORE_COLUMNS]
+    if unknown:
+        raise ValueError(f"the panel doesn't compute {unknown}")
+
+    snp = pd.read_csv(infile)
+
+    tickers = snp[symbol_column(snp)].tolist()
+
+    profile = RunProfile(run_name("entrypoint", infile))
+    if cache is None and FUNDAMENTALS_MODE == "local":
+        with profile.timer("panel", "from_directory"):
+            bundles = load_directory()
+            panel = Panel.from_bundles(
+                bundles.get(str(ticker).upper())
+                or FundamentalsBundle(ticker) for ticker in tickers
+            )
+    else:
+        if cache is None:
+            cache = open_cache()
+        profile.watch(cache)
+
+        with profile.timer("panel", "from_cache"):
+            panel = Panel.from_cache(cache, tickers,
+                                     statements_for(columns))
+
+    with profile.timer("panel", "score"):
+        scores = panel.score()
+
+    for column in columns:
+        snp[column] = scores[column]
+
+    with profile.timer("write", "csv"):
+        write_csv(snp, infile)
+
+    profile.close()
+
+
+def cli(argv=None, prog=None):
+    """
+    Get the source CSV file
+    The source file has tickers for all relevant stocks \
+            pre-configured in the 'Symbol' column
+    For each ticker symbol, retrieve all of the desired \
+            business attributes, and push them to the \
+            CSV.
+    """
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Score value stocks.")
+    parser.add_argument("files", nargs="*", default=["data/sp500.csv"],
+                        help="CSV files with a 'symbol' column")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="number of concurrent statement fetches")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="score from cached statements, without fetching")
+    parser.add_argument("--multi", action="store_true",
+                        help="fetch tickers shared by the files only once")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip tickers already scored by a failed run")
+    parser.add_argument("--max-age", type=float, default=RESUME_MAX_AGE,
+                        help="seconds a resumed result stays fresh")
+    parser.add_argument("--screen", action="store_true",
+                        help="only score tickers that pass the thresholds")
+    parser.add_argument("--store", action="store_true",
+                        help="also write results to a column store, "
+                             "<file>.cols")
+    parser.add_argument("--db", nargs="?", const=RESULTS_DB,
+                        help="also record results in a results database, "
+                             f"{RESULTS_DB} by default")
+    parser.add_argument("--columns", type=parse_columns,
+                        help="comma-separated columns to compute, "
+                             "e.g. roa,niev")
+    args = parser.parse_args(argv)
+
+    if args.from_cache:
+        # the cached pass is one vectorized write, with nothing to
+        # resume, screen or record along the way
+        given = options_given(args, ("resume", "screen", "store", "db"))
+        if given:
+            parser.error(f"{given} can't be used with --from-cache")
+
+    if args.multi and not args.from_cache:
+        # a multi-file run only writes each file's own layout
+        given = options_given(args, ("screen", "store", "db"))
+        if given:
+            parser.error(f"{given} can't be used with --multi")
+        run_multi(args.files, args.workers, args.resume, args.max_age,
+                  columns=args.columns)
+        return
+
+    columns = args.columns or SCORE_COLUMNS
+    for infile in args.files:
+        if args.from_cache:
+            run_from_cache(infile, columns=columns)
+        else:
+            run(infile, args.workers, args.resume, args.max_age,
+                screen=args.screen, columns=columns, store=args.store,
+                db=args.db)
+
+
+def options_given(args, names):
+    """ The options among names that were given, as flags."""
+    return ", ".join(f"--{name}" for name in names if getattr(args, name))
+
+
+def parse_columns(value):
+    """ Split and check a --columns list."""
+    columns = tuple(
+        column.strip() for column in value.split(",") if column.strip()
+    )
+    try:
+        statements_for(columns)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+    return columns
@@ -0,0 +1,111 @@
+# standard libraries
+from os import getenv
+import threading
+
+# custom modules
+from bundle import FundamentalsBundle, STATEMENTS
+from metrics import Metrics, statements_for
+
+# environment variables and defaults
+EARNINGS_YIELD_THRESHOLD = float(getenv('EARNINGS_YIELD_THRESHOLD', 0.08))
+RETURN_ON_ASSETS_THRESHOLD = float(getenv('RETURN_ON_ASSETS_THRESHOLD', 0.1))
+EQUITY_TO_DEBT_THRESHOLD = float(getenv('EQUITY_TO_DEBT_THRESHOLD', 1))
+FREE_CASH_FLOW_THRESHOLD = float(getenv('FREE_CASH_FLOW_THRESHOLD', 1))
+
+# minimum value of each Metrics.compute_ratios ratio a ticker must reach
+CHECKS = {
+    'earnings_yield': EARNINGS_YIELD_THRESHOLD,
+    'equity_to_debt_ratio': EQUITY_TO_DEBT_THRESHOLD,
+    'return_on_assets': RETURN_ON_ASSETS_THRESHOLD,
+    'free_cash_flow': FREE_CASH_FLOW_THRESHOLD,
+}
+
+# cost of computing a ratio, against one statement fetch
+COMPUTE_COST = 0.1
+
+
+class Screener:
+    """
+    Threshold screen, applied before a ticker is fully fetched.
+
+    Statements are extracted one at a time, only as the next \
+            check needs them, and the first failed check rejects \
+            the ticker, so the statements after it are never fetched.
+
+    Checks run cheapest first: the one with the fewest statements \
+            still to fetch, per ticker it is expected to reject. \
+            Rejection rates are learned over the run, so the checks \
+            that throw out the most tickers move to the front.
+    """
+
+    def __init__(self, checks=CHECKS):
+        self.checks = dict(checks)
+        self.needs = {name: statements_for((name,)) for name in self.checks}
+        self.metrics = Metrics()
+        self.tried = {name: 0 for name in self.checks}
+        self.rejected = {name: 0 for name in self.checks}
+        self.passed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+
+    def screen(self, symbol, statements=STATEMENTS):
+        """
+        Screen a yfinance-like ticker object.
+
+        Returns its FundamentalsBundle, with the rest of the given \
+                statements extracted, if it passes every check, or \
+                None as soon as one fails.
+        """
+        bundle = FundamentalsBundle(symbol.ticker)
+        extracted = set()
+        remaining = set(self.checks)
+
+        while remaining:
+            name = self._next(remaining, extracted)
+            remaining.discard(name)
+            for statement in self.needs[name]:
+                if statement not in extracted:
+                    bundle.extract(symbol, (statement,))
+                    extracted.add(statement)
+
+            value = self.metrics.compute_columns(bundle, (name,))[name]
+            failed = not value >= self.checks[name]
+            with self._lock:
+                self.tried[name] += 1
+                self.rejected[name] += failed
+                if failed:
+                    self.failed += 1
+            if failed:
+                return None
+
+        with self._lock:
+            self.passed += 1
+        bundle.extract(
+            symbol, [statement for statement in statements
+                     if statement not in extracted],
+        )
+        return bundle
+
+
+    def _next(self, remaining, extracted):
+        """ The remaining check with the lowest cost per rejection."""
+        def cost(name):
+            fetches = sum(statement not in extracted
+                          for statement in self.needs[name])
+            # smoothed, so untried checks start out at even odds
+            rate = (self.rejected[name] + 1) / (self.tried[name] + 2)
+            return (fetches + COMPUTE_COST) / rate
+
+        with self._lock:
+            return min(sorted(remaining), key=cost)
+
+
+    def summary(self):
+        """ One line of pass and reject counts."""
+        rejects = ", ".join(
+            f"{name} {self.rejected[name]}/{self.tried[name]}"
+            for name in self.checks
+        )
+        return (f"Screened: {self.passed} passed, {self.failed} rejected "
+                f"({rejects})")
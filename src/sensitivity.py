@@ -0,0 +1,212 @@
+# standard libraries
+import json
+from os import makedirs, path, replace
+import warnings
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+
+# custom modules
+from dcf import dcf_grid
+from dcf import EARNINGS_MARKDOWN, TERMINAL_GROWTH, TIME_HORIZON_YEARS
+from intrinsic_value import valued_inputs
+from journal import write_csv
+
+# bumped whenever the layout of a grid changes
+GRID_VERSION = 1
+
+SCHEMA_FILE = "grid.json"
+SYMBOLS_FILE = "symbols.npy"
+PRICES_FILE = "prices.npy"
+
+# future prices are stored in single precision, half the size
+PRICES_DTYPE = "<f4"
+
+# axes of the grid, in the order of the price tensor's dimensions
+AXES = ('wacc', 'markdown', 'term growth', 'horizon')
+
+# values swept along each axis, unless given on the command line
+DEFAULT_AXES = {
+    'wacc': tuple(np.round(np.linspace(0.04, 0.14, 11), 4)),
+    'markdown': (0, EARNINGS_MARKDOWN, 0.5),
+    'term growth': (0.02, 0.03, 0.04, TERMINAL_GROWTH),
+    'horizon': (TIME_HORIZON_YEARS,),
+}
+
+# columns of the per-ticker summary
+SUMMARY_COLUMNS = ('price min', 'price median', 'price max') \
+    + tuple(f"elasticity {axis}" for axis in AXES)
+
+
+class SensitivityGrid:
+    """
+    Future prices of every ticker of a file, over a grid of WACC, \
+            growth markdown, terminal growth and horizon.
+
+    A grid is a directory holding the price tensor as one .npy \
+            array, shaped (tickers, waccs, markdowns, term growths, \
+            horizons), a symbols.npy index of the ticker in each \
+            row, and a grid.json header with the values of every axis.
+
+    The tensor is memory-mapped, so looking up one ticker, or one \
+            slice of the grid, reads only that part of the file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(path.join(directory, SCHEMA_FILE),
+                  encoding="utf-8") as schema:
+            self.schema = json.load(schema)
+        if self.schema["version"] != GRID_VERSION:
+            raise ValueError(
+                f"{directory}: grid version {self.schema['version']}, "
+                f"expected {GRID_VERSION}"
+            )
+        self.axes = {
+            axis: np.asarray(values) for axis, values
+            in self.schema["axes"].items()
+        }
+        self.symbols = np.load(path.join(directory, SYMBOLS_FILE))
+        self.prices = np.load(path.join(directory, PRICES_FILE),
+                              mmap_mode="r")
+
+
+    def __getitem__(self, symbol):
+        """ The grid of future prices of one ticker."""
+        rows = np.flatnonzero(self.symbols == symbol)
+        if len(rows) == 0:
+            raise KeyError(symbol)
+        return self.prices[rows[0]]
+
+
+def sweep(dataframe, outfile, axes=None, symbol_column="symbol"):
+    """
+    Value every ticker of a frame over the whole grid, from the \
+            DCF inputs already in it; nothing is fetched.
+
+    The prices go to the grid next to the output file, and a \
+            summary of each ticker, the spread of its prices and \
+            their elasticity to every axis, to \
+            <file>_sensitivity.csv, which is also returned.
+
+    An axis not given is swept over its DEFAULT_AXES values.
+    """
+    axes = {axis: (axes or {}).get(axis) or DEFAULT_AXES[axis]
+            for axis in AXES}
+    inputs, rows = valued_inputs(dataframe)
+    # rows that aren't valued come out NaN throughout
+    earnings = inputs['earnings'].where(rows)
+
+    directory = grid_path(outfile)
+    makedirs(directory, exist_ok=True)
+    np.save(path.join(directory, SYMBOLS_FILE),
+            np.asarray(dataframe[symbol_column].astype(str), dtype=str))
+    shape = (len(dataframe),) + tuple(len(axes[axis]) for axis in AXES)
+    prices = np.lib.format.open_memmap(
+        path.join(directory, PRICES_FILE), mode="w+",
+        dtype=PRICES_DTYPE, shape=shape,
+    )
+
+    summary = np.full((len(dataframe), len(SUMMARY_COLUMNS)), np.nan)
+    batches = dcf_grid(
+        earnings, inputs['aegr'], inputs['fcf'], inputs['liabilities'],
+        inputs['min interest'], inputs['shares'],
+        *(axes[axis] for axis in AXES), out=prices,
+    )
+    for batch, grid in batches:
+        summary[batch] = summarize(grid, [axes[axis] for axis in AXES])
+    prices.flush()
+    del prices
+
+    _write_schema(directory, {
+        "version": GRID_VERSION,
+        "rows": len(dataframe),
+        "axes": {axis: [float(value) for value in axes[axis]]
+                 for axis in AXES},
+        "prices": {"file": PRICES_FILE, "dtype": PRICES_DTYPE},
+    })
+
+    frame = pd.DataFrame(summary, columns=list(SUMMARY_COLUMNS))
+    frame.insert(0, symbol_column, dataframe[symbol_column].to_numpy())
+    write_csv(frame, summary_path(outfile))
+    return frame
+
+
+def summarize(prices, axes):
+    """
+    Per-ticker summary of a batch of price grids: the lowest, \
+            median and highest future price, and the median \
+            elasticity of the price to each axis.
+
+    The elasticity at every point of the grid, \
+            (dprice / price) / (dvalue / value), comes from the \
+            finite differences along the axis, and points where the \
+            price isn't positive are left out; an axis with a \
+            single value has none.
+    """
+    count = len(prices)
+    flat = prices.reshape(count, -1)
+    columns = []
+
+    with warnings.catch_warnings(), np.errstate(divide='ignore',
+                                                invalid='ignore'):
+        # tickers without any price, or without any elasticity
+        warnings.simplefilter("ignore", RuntimeWarning)
+        columns += [np.nanmin(flat, axis=1), np.nanmedian(flat, axis=1),
+                    np.nanmax(flat, axis=1)]
+
+        for dimension, values in enumerate(axes, start=1):
+            values = np.asarray(values, dtype=float)
+            if len(values) < 2:
+                columns.append(np.full(count, np.nan))
+                continue
+            slope = np.gradient(prices, values, axis=dimension)
+            shape = [1] * prices.ndim
+            shape[dimension] = len(values)
+            elasticity = slope * values.reshape(shape) / prices
+            elasticity[~(prices > 0) | ~np.isfinite(elasticity)] = np.nan
+            columns.append(
+                np.nanmedian(elasticity.reshape(count, -1), axis=1),
+            )
+
+    return np.round(np.column_stack(columns), 4)
+
+
+def parse_axis(text):
+    """
+    Values of an axis from the command line: a comma-separated \
+            list, e.g. 0.05,0.07,0.09, or start:stop:count for \
+            count evenly spaced values, e.g. 0.04:0.14:20.
+
+    Raises ValueError for anything else, or no values at all.
+    """
+    if ":" in text:
+        start, stop, count = text.split(":")
+        values = tuple(np.round(
+            np.linspace(float(start), float(stop), int(count)), 6,
+        ))
+    else:
+        values = tuple(float(value) for value in text.split(","))
+    if not values:
+        raise ValueError(f"no values in {text!r}")
+    return values
+
+
+def grid_path(outfile):
+    """ Directory of the sensitivity grid kept next to an output file."""
+    return f"{outfile}.grid"
+
+
+def summary_path(outfile):
+    """ Per-ticker sensitivity summary of an output file."""
+    stem, extension = path.splitext(outfile)
+    return f"{stem}_sensitivity{extension or '.csv'}"
+
+
+def _write_schema(directory, schema):
+    """ Replace the grid header atomically."""
+    filename = path.join(directory, SCHEMA_FILE)
+    with open(f"{filename}.tmp", "w", encoding="utf-8") as output:
+        json.dump(schema, output, indent=2)
+    replace(f"{filename}.tmp", filename)
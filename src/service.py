@@ -0,0 +1,324 @@
+# standard libraries
+import argparse
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+from os import getenv
+import re
+import threading
+import time
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+
+# custom modules
+from bundle import FundamentalsBundle, STATEMENTS
+from cache import CACHE_TTL, CachedTicker, open_cache
+from intrinsic_value import DCF_OUTPUTS, apply_dcf, dcf_inputs
+from metrics import Metrics, SCORE_COLUMNS
+from throttle import BACKOFF_MAX, ThrottledError
+from wacc import WaccProvider
+
+# environment variables and defaults
+SERVICE_HOST = getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(getenv("SERVICE_PORT", 8321))
+# tickers whose statements are held in memory
+SERVICE_TICKERS = int(getenv("SERVICE_TICKERS", 256))
+# computed answers held in memory, and for how many seconds
+SERVICE_RESULTS = int(getenv("SERVICE_RESULTS", 4096))
+SERVICE_TTL = float(getenv("SERVICE_TTL", 15 * 60))
+
+# what a ticker symbol may look like, e.g. BRK-B, ^GSPC or 7203.T
+TICKER = re.compile(r"[A-Za-z0-9.\-^=]{1,16}")
+
+
+class LruCache:
+    """
+    Thread-safe map holding at most size entries, dropping the \
+            least recently used one first.
+
+    With a ttl, entries older than ttl seconds are dropped when \
+            they are next asked for.
+    """
+
+    def __init__(self, size, ttl=None, clock=time.monotonic):
+        self.size = max(1, size)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def get(self, key):
+        """ The value of a key, or None if it is missing or stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None \
+                    and self._clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+
+    def put(self, key, value):
+        """ Store a value, evicting the oldest entries over size."""
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+class Coalescer:
+    """
+    Runs a single call per key at a time: callers asking for a key \
+            that is already being computed wait for that call's \
+            result, instead of starting one of their own.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+
+    def run(self, key, function):
+        """ The result of function(), shared by concurrent callers."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = function()
+        except BaseException as error:
+            call.set_exception(error)
+            raise
+        else:
+            call.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result
+
+
+class ScoringService:
+    """
+    Metrics and DCF valuations of single tickers, for a long-running \
+            process.
+
+    Statements are read through the fundamentals cache, and the \
+            loaded statements of the last SERVICE_TICKERS tickers \
+            are kept in memory, so a ticker is only fetched again \
+            once it falls out of both. Answers are kept, already \
+            encoded, for SERVICE_TTL seconds, so a repeated question \
+            costs a dictionary lookup. Held statements are dropped \
+            once they are CACHE_TTL seconds old, when they would \
+            have gone stale in the cache too.
+
+    Concurrent requests for the same ticker are coalesced: one \
+            thread fetches and computes, and the others wait for \
+            its answer.
+    """
+
+    def __init__(self, cache=None, tickers=SERVICE_TICKERS,
+                 results=SERVICE_RESULTS, ttl=SERVICE_TTL,
+                 statements_ttl=CACHE_TTL):
+        self.cache = cache if cache is not None else open_cache()
+        self.metrics = Metrics()
+        self.waccs = WaccProvider(self.cache)
+        self.symbols = LruCache(tickers, statements_ttl)
+        self.results = LruCache(results, ttl)
+        self.coalescer = Coalescer()
+
+
+    def answer(self, kind, ticker):
+        """ The JSON-encoded 'metrics' or 'dcf' answer for a ticker."""
+        key = (kind, ticker)
+        body = self.results.get(key)
+        if body is not None:
+            return body
+
+        compute = self.score if kind == "metrics" else self.value
+        return self.coalescer.run(key, lambda: self._answer(key, compute))
+
+
+    def _answer(self, key, compute):
+        """ Compute and encode an answer, unless a racer just did."""
+        body = self.results.get(key)
+        if body is None:
+            body = encode({"ticker": key[1], **compute(key[1])})
+            self.results.put(key, body)
+        return body
+
+
+    def symbol(self, ticker):
+        """
+        The ticker object of a ticker, with every statement loaded; \
+                its metrics and DCF share one fetch.
+        """
+        symbol = self.symbols.get(ticker)
+        if symbol is None:
+            symbol = self.coalescer.run(
+                ("symbol", ticker), lambda: self._load(ticker),
+            )
+        return symbol
+
+
+    def _load(self, ticker):
+        """ Load a ticker's statements, unless a racer just did."""
+        symbol = self.symbols.get(ticker)
+        if symbol is None:
+            symbol = CachedTicker(ticker, self.cache)
+            symbol.prefetch(STATEMENTS)
+            self.symbols.put(ticker, symbol)
+        return symbol
+
+
+    def score(self, ticker):
+        """ Every column scoring.run writes, for one ticker."""
+        bundle = FundamentalsBundle.from_ticker(self.symbol(ticker))
+        return self.metrics.compute_columns(bundle, SCORE_COLUMNS)
+
+
+    def value(self, ticker):
+        """ DCF inputs and valuation of one ticker."""
+        row = dcf_inputs(self.metrics, self.symbol(ticker), self.waccs)
+        frame = pd.DataFrame([row])
+        apply_dcf(frame)
+        for column in DCF_OUTPUTS:
+            if column in frame:
+                row[column] = frame.at[0, column]
+        return row
+
+
+    def status(self):
+        """ Sizes and hit counts of the in-memory caches."""
+        return {
+            "tickers": len(self.symbols),
+            "results": len(self.results),
+            "hits": self.results.hits,
+            "misses": self.results.misses,
+            "coalesced": self.coalescer.coalesced,
+        }
+
+
+    def close(self):
+        """ Close the GuruFocus session, and the fundamentals cache."""
+        self.waccs.close()
+        self.cache.close()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    GET /metrics/{ticker}, /dcf/{ticker} and /status, as JSON.
+
+    A ticker that upstream is still throttling is answered with a 503 \
+            and a Retry-After, rather than with missing values.
+    """
+
+    service = None
+
+    def do_GET(self):
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if parts == ["status"]:
+            self._send(200, encode(self.service.status()))
+            return
+        if len(parts) != 2 or parts[0] not in ("metrics", "dcf"):
+            self._send(404, encode({"error": "not found"}))
+            return
+        if not TICKER.fullmatch(parts[1]):
+            self._send(400, encode({"error": "bad ticker"}))
+            return
+
+        try:
+            body = self.service.answer(parts[0], parts[1].upper())
+        except ThrottledError as error:
+            self._send(503, encode({"error": str(error)}),
+                       {"Retry-After": str(int(BACKOFF_MAX))})
+            return
+        except Exception as error:
+            self._send(500, encode({"error": repr(error)}))
+            return
+        self._send(200, body)
+
+
+    def _send(self, status, body, headers=None):
+        """ Send a JSON response."""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    """ HTTP server answering with the given service; not started."""
+    handler = type("Handler", (ServiceHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def encode(values):
+    """ A dict as JSON bytes, with NaN and infinities as null."""
+    return json.dumps(
+        {key: _plain(value) for key, value in values.items()},
+    ).encode()
+
+
+def _plain(value):
+    """ Convert a result value to one JSON has."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def cli(argv=None, prog=None):
+    """ Run the service until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Serve ticker metrics and DCFs over HTTP.",
+    )
+    parser.add_argument("--host", default=SERVICE_HOST,
+                        help="address to listen on")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT,
+                        help="port to listen on")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="answer from cached statements, without fetching")
+    args = parser.parse_args(argv)
+
+    service = ScoringService(open_cache(offline=args.from_cache))
+    server = serve(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    cli()
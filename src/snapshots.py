@@ -0,0 +1,382 @@
+#!/usr/bin/python3
+
+# standard libraries
+import argparse
+import math
+from os import getenv, makedirs, path
+import re
+import sqlite3
+import threading
+import time
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+
+# environment variables and defaults
+RESULTS_DB = getenv("RESULTS_DB", "data/results.db")
+SNAPSHOT_BATCH = int(getenv("SNAPSHOT_BATCH", 100))
+
+# metric columns screens filter on; each gets a (run, value) index
+KEY_COLUMNS = (
+    'roa', 'roe', 'mce', 'niev', 'wacc', 'debt / assets', 'roc',
+    'earnings_yield', 'equity_to_debt_ratio', 'net_net',
+    'dcf', 'future price', 'growth',
+)
+
+# comparison operators a screen can use
+OPERATORS = ('<', '<=', '>', '>=', '=', '!=')
+
+# columns every result row has, ahead of its metric columns
+BASE_COLUMNS = ('run', 'ticker', 'ts')
+
+
+class SnapshotStore:
+    """
+    SQLite history of per-ticker results, one row per (ticker, run).
+
+    Every scoring run gets a run id, and the rows it writes are \
+            kept next to those of earlier runs, so screens can be \
+            asked of the latest run, or of any run before it.
+
+    Metric columns are added to the results table as runs first \
+            write them; the KEY_COLUMNS among them are indexed \
+            together with the run, so a screen only reads the rows \
+            of the run it asks about, however long the history is.
+
+    The database is in WAL mode, each thread gets its own \
+            connection, and rows are written in batches, so several \
+            runs or workers can write to it at the same time.
+    """
+
+    def __init__(self, filename=RESULTS_DB, batch=SNAPSHOT_BATCH):
+        self.filename = filename
+        self.batch = max(1, batch)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = []
+
+        directory = path.dirname(filename)
+        if directory:
+            makedirs(directory, exist_ok=True)
+
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " script TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " started REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " run INTEGER NOT NULL REFERENCES runs (run),"
+            " ticker TEXT NOT NULL,"
+            " ts REAL NOT NULL,"
+            " PRIMARY KEY (ticker, run))"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS results_run ON results (run)")
+        self._columns = self._table_columns()
+
+
+    def _db(self):
+        """ This thread's connection."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.filename, timeout=30,
+                                 isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+
+    def begin_run(self, script, source):
+        """ Register a run of a script over a source file."""
+        name = path.splitext(path.basename(source))[0]
+        cursor = self._db().execute(
+            "INSERT INTO runs (script, source, started) VALUES (?, ?, ?)",
+            (script, name, time.time()),
+        )
+        return cursor.lastrowid
+
+
+    def write(self, run, ticker, values):
+        """
+        Record result columns of a ticker in a run; later writes \
+                to the same ticker and run update its row.
+        """
+        row = {column: _plain(value) for column, value in values.items()}
+        with self._lock:
+            self._pending.append((run, ticker, time.time(), row))
+            if len(self._pending) < self.batch:
+                return
+            pending, self._pending = self._pending, []
+        self._write(pending)
+
+
+    def flush(self):
+        """ Write out every buffered row."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            self._write(pending)
+
+
+    def close(self):
+        """ Flush, and close this thread's connection."""
+        self.flush()
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+    def runs(self, source=None):
+        """ Every run, or the runs over one source, newest first."""
+        query = "SELECT run, script, source, started FROM runs"
+        params = ()
+        if source is not None:
+            query += " WHERE source = ?"
+            params = (source,)
+        return pd.read_sql_query(
+            query + " ORDER BY run DESC", self._db(), params=params,
+        )
+
+
+    def latest_run(self, source=None, script=None):
+        """ Id of the newest run, optionally of a source and script."""
+        query = "SELECT MAX(run) FROM runs WHERE 1"
+        params = []
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        if script is not None:
+            query += " AND script = ?"
+            params.append(script)
+        return self._db().execute(query, params).fetchone()[0]
+
+
+    def screen(self, conditions, run=None, source=None, script=None,
+               columns=None, order_by=None, descending=False, limit=None):
+        """
+        Tickers of a run meeting every (column, operator, value) \
+                condition, as a DataFrame.
+
+        The run defaults to the latest one, of the given source \
+                and script if any. Column names and operators are \
+                checked against the table and OPERATORS, and values \
+                are bound as parameters, so no input reaches the SQL \
+                as text.
+        """
+        self.flush()
+        self._columns = self._table_columns()
+        if run is None:
+            run = self.latest_run(source, script)
+        if run is None:
+            return pd.DataFrame(columns=["ticker"])
+
+        where = ["run = ?"]
+        params = [run]
+        for column, operator, value in conditions:
+            self._check_column(column)
+            if operator not in OPERATORS:
+                raise ValueError(
+                    f"unknown operator {operator!r}, pick from {OPERATORS}",
+                )
+            where.append(f"{_quote(column)} {operator} ?")
+            params.append(value)
+
+        if columns is None:
+            selected = [column for column in self._columns
+                        if column not in ('run', 'ts')]
+        else:
+            selected = ['ticker'] + [column for column in columns
+                                     if column != 'ticker']
+        for column in selected:
+            self._check_column(column)
+
+        query = (f"SELECT {', '.join(_quote(column) for column in selected)}"
+                 f" FROM results WHERE {' AND '.join(where)}")
+        if order_by is not None:
+            self._check_column(order_by)
+            query += f" ORDER BY {_quote(order_by)}"
+            query += " DESC" if descending else " ASC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        return pd.read_sql_query(query, self._db(), params=params)
+
+
+    def history(self, ticker, columns=None):
+        """ Every run's row of a ticker, oldest first."""
+        self.flush()
+        self._columns = self._table_columns()
+        selected = list(columns or self._columns)
+        for column in selected:
+            self._check_column(column)
+        return pd.read_sql_query(
+            f"SELECT {', '.join(_quote(column) for column in selected)}"
+            " FROM results WHERE ticker = ? ORDER BY run",
+            self._db(), params=(ticker,),
+        )
+
+
+    def _write(self, pending):
+        """ Upsert rows, in one transaction per batch."""
+        db = self._db()
+        for column in {column for *_, row in pending for column in row}:
+            self._add_column(column)
+
+        # rows with the same columns share one statement
+        groups = {}
+        for run, ticker, ts, row in pending:
+            groups.setdefault(tuple(row), []).append(
+                (run, ticker, ts, *row.values()),
+            )
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for columns, rows in groups.items():
+                names = BASE_COLUMNS + columns
+                updates = ", ".join(
+                    f"{_quote(column)} = excluded.{_quote(column)}"
+                    for column in ('ts',) + columns
+                )
+                db.executemany(
+                    f"INSERT INTO results"
+                    f" ({', '.join(_quote(name) for name in names)})"
+                    f" VALUES ({', '.join('?' for _ in names)})"
+                    f" ON CONFLICT (ticker, run) DO UPDATE SET {updates}",
+                    rows,
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+
+    def _add_column(self, column):
+        """ Add a metric column to the results table, if it is new."""
+        if column in self._columns:
+            return
+        db = self._db()
+        try:
+            db.execute(f"ALTER TABLE results ADD COLUMN {_quote(column)}")
+        except sqlite3.OperationalError as error:
+            # another writer may have added it first
+            if "duplicate column" not in str(error):
+                raise
+        if column in KEY_COLUMNS:
+            db.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote('results_' + column)}"
+                f" ON results (run, {_quote(column)})"
+            )
+        self._columns = self._table_columns()
+
+
+    def _table_columns(self):
+        """ Names of the results table's columns."""
+        return [row[1] for row in
+                self._db().execute("PRAGMA table_info(results)")]
+
+
+    def _check_column(self, column):
+        """ Refuse column names the results table doesn't have."""
+        if column not in self._columns:
+            raise ValueError(
+                f"unknown column {column!r}, pick from {self._columns}",
+            )
+
+
+def parse_condition(text):
+    """ Split a condition such as 'debt / assets < 0.3'."""
+    match = re.fullmatch(r"\s*(.+?)\s*(<=|>=|!=|=|<|>)\s*(.+?)\s*", text)
+    if match is None:
+        raise ValueError(f"not a condition: {text!r}")
+    column, operator, value = match.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    return column, operator, value
+
+
+def _quote(name):
+    """ Quote an SQL identifier."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _plain(value):
+    """ Convert a result value to one SQLite stores; NaN is NULL."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is not None and not isinstance(value, (int, float, str)):
+        return str(value)
+    return value
+
+
+def cli(argv=None, prog=None):
+    """ Query the results database, from the command line."""
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Screen the results history.",
+    )
+    # every subcommand takes these, after its name
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=RESULTS_DB, help="results database")
+    common.add_argument("--from-cache", action="store_true",
+                        help="accepted for symmetry; queries never fetch")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", parents=[common],
+                                help="screen a run's results")
+    query.add_argument("conditions", nargs="*",
+                       help="conditions such as 'roa > 0.1'")
+    query.add_argument("--source", help="input file name, such as nyse")
+    query.add_argument("--script", help="entrypoint or intrinsic_value")
+    query.add_argument("--run", type=int, help="run id, latest by default")
+    query.add_argument("--columns", help="comma-separated columns to show")
+    query.add_argument("--order-by", help="column to sort by")
+    query.add_argument("--desc", action="store_true",
+                       help="sort in descending order")
+    query.add_argument("--limit", type=int, help="number of rows to show")
+
+    runs = commands.add_parser("runs", parents=[common],
+                               help="list the recorded runs")
+    runs.add_argument("--source", help="input file name, such as nyse")
+
+    history = commands.add_parser("history", parents=[common],
+                                  help="a ticker over all runs")
+    history.add_argument("ticker")
+
+    args = parser.parse_args(argv)
+    store = SnapshotStore(args.db)
+
+    try:
+        if args.command == "runs":
+            frame = store.runs(args.source)
+        elif args.command == "history":
+            frame = store.history(args.ticker)
+        else:
+            columns = None
+            if args.columns:
+                columns = [column.strip()
+                           for column in args.columns.split(",")]
+            frame = store.screen(
+                [parse_condition(text) for text in args.conditions],
+                run=args.run, source=args.source, script=args.script,
+                columns=columns,
+                order_by=args.order_by, descending=args.desc,
+                limit=args.limit,
+            )
+    except ValueError as error:
+        parser.error(str(error))
+
+    print(frame.to_string(index=False))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,312 @@
+# standard libraries
+import csv
+from os import getenv, path, scandir
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+
+# custom modules
+from bundle import FundamentalsBundle, INFO_ITEMS, LINE_ITEMS
+
+# environment variables and defaults
+# directory of wide-format statement files, one <ticker>.csv each, such
+# as data/vrsn.csv; other CSV files in it are passed over
+STATEMENTS_DIR = getenv("STATEMENTS_DIR", "data")
+
+# the statement line item of every row label a wide file may use:
+# the bundle attribute spelled with spaces, the yfinance label, or
+# one of the shorthands below, in any case
+ALIASES = {
+    "capex": "capital_expenditures",
+    "expenses": "operating_expenses",
+    "net earnings": "earnings",
+    "revenues": "revenue",
+    "market cap": "market_cap",
+    "price": "current_price",
+    "shares": "shares_outstanding",
+}
+
+# rows read as they are, outside any statement
+EXTRA_ITEMS = ("wacc",)
+
+# the statement each bundle attribute comes from, and its label there
+ITEMS = {
+    name: (statement, label)
+    for statement, items in LINE_ITEMS.items()
+    for name, label in items.items()
+}
+
+LABELS = {
+    **{name.replace("_", " "): name for name in ITEMS},
+    **{label.lower(): name for name, (_, label) in ITEMS.items()},
+    **{name.replace("_", " "): name for name in INFO_ITEMS},
+    **ALIASES,
+    **{name: name for name in EXTRA_ITEMS},
+}
+
+
+class WideStatements:
+    """
+    Annual statements of one ticker, from a wide-format CSV file: \
+            a header of years, and one row per line item, e.g.
+
+        year,2021,2020,2019
+        net income,784801,814753,612489
+        capex,-53033,-43395,-40316
+
+    Rows are matched to the line items of a FundamentalsBundle by \
+            their label (see LABELS), and rows that match none are \
+            ignored. Every row is a float64 vector, newest year \
+            first, however many years the file has; years are \
+            sorted, and missing cells are NaN.
+
+    Net income doubles as the earnings series, when the file has \
+            no earnings row of its own.
+    """
+
+    def __init__(self, ticker, years, items):
+        self.ticker = ticker
+        self.years = years
+        self.items = items
+
+
+    @classmethod
+    def read(cls, filename, ticker=None):
+        """
+        Parse a wide-format file; the ticker defaults to its name, \
+                e.g. VRSN for data/vrsn.csv.
+        """
+        if ticker is None:
+            ticker = path.splitext(path.basename(filename))[0].upper()
+        with open(filename, newline="", encoding="utf-8") as rows:
+            text = rows.read()
+        if '"' in text:
+            rows = list(csv.reader(text.splitlines()))
+        else:
+            # no quoted cells, so plain splits parse it the same
+            rows = [line.split(",") for line in text.splitlines()]
+        return cls.parse(ticker, rows, filename)
+
+
+    @classmethod
+    def parse(cls, ticker, rows, source="<rows>"):
+        """ Build the statements of a ticker from parsed CSV rows."""
+        if not rows or rows[0][:1] not in (["year"], ["Year"], [""]):
+            raise ValueError(f"{source}: not a wide-format statement file")
+
+        years = np.array([int(year) for year in rows[0][1:]])
+        order = np.argsort(-years, kind="stable")
+        names, cells = [], []
+        for row in rows[1:]:
+            name = LABELS.get(row[0].strip().lower()) if row else None
+            if name is None:
+                continue
+            names.append(name)
+            cells.append(row[1:len(years) + 1]
+                         + ["nan"] * (len(years) + 1 - len(row)))
+
+        # every row converted in one call, unless a cell needs cleaning
+        try:
+            block = np.array(cells, dtype=float).reshape(-1, len(years))
+        except ValueError:
+            block = np.array([[_number(cell) for cell in row]
+                              for row in cells]).reshape(-1, len(years))
+        items = dict(zip(names, block[:, order]))
+
+        if "earnings" not in items and "net_income" in items:
+            items["earnings"] = items["net_income"]
+        return cls(ticker, years[order], items)
+
+
+    def bundle(self):
+        """
+        The statements as a FundamentalsBundle, straight from the \
+                parsed vectors; earnings and revenue oldest first, as \
+                in the yfinance earnings frame, and info fields from \
+                the newest year.
+        """
+        bundle = FundamentalsBundle(self.ticker)
+        for name, values in self.items.items():
+            if name in EXTRA_ITEMS:
+                continue
+            if name in INFO_ITEMS:
+                setattr(bundle, name, _newest(values))
+            elif ITEMS[name][0] == "earnings":
+                setattr(bundle, name, values[::-1].copy())
+            else:
+                setattr(bundle, name, values)
+        return bundle
+
+
+class LocalTicker:
+    """
+    Stand-in for yfinance.Ticker over wide-format statements, so the \
+            per-ticker Metrics, the DCF and FundamentalsCache can \
+            read them as they would live ones.
+
+    Statement frames are built on first use, in the yfinance \
+            layout: line items by year-end dates, newest first, and \
+            the earnings frame by year, oldest first. A statement \
+            the file has no rows for is None.
+    """
+
+    def __init__(self, ticker, statements=None):
+        self.ticker = ticker
+        self.statements = statements
+        self._frames = {}
+
+
+    def _frame(self, statement):
+        """ One statement as a frame, built once."""
+        if statement not in self._frames:
+            self._frames[statement] = self._build(statement)
+        return self._frames[statement]
+
+
+    def _build(self, statement):
+        """ Lay out the rows of one statement as yfinance does."""
+        if self.statements is None:
+            return None
+        items = self.statements.items
+        names = [name for name, (source, _) in ITEMS.items()
+                 if source == statement and name in items]
+        if not names:
+            return None
+
+        years = self.statements.years
+        if statement == "earnings":
+            return pd.DataFrame(
+                {ITEMS[name][1]: items.get(name, np.full(len(years), np.nan))
+                 [::-1] for name in LINE_ITEMS["earnings"]},
+                index=pd.Index(years[::-1], name="Year"),
+            )
+        return pd.DataFrame(
+            np.vstack([items[name] for name in names]),
+            index=[ITEMS[name][1] for name in names],
+            columns=pd.to_datetime([f"{year}-12-31" for year in years]),
+        )
+
+
+    @property
+    def cashflow(self):
+        return self._frame("cashflow")
+
+
+    @property
+    def balance_sheet(self):
+        return self._frame("balance_sheet")
+
+
+    def get_balance_sheet(self):
+        return self._frame("balance_sheet")
+
+
+    @property
+    def financials(self):
+        return self._frame("financials")
+
+
+    @property
+    def earnings(self):
+        return self._frame("earnings")
+
+
+    @property
+    def info(self):
+        if self.statements is None:
+            return None
+        return {
+            key: _newest(self.statements.items[name])
+            for name, key in INFO_ITEMS.items()
+            if name in self.statements.items
+        }
+
+
+class LocalStatements:
+    """
+    Ticker factory over a directory of wide-format statement files, \
+            for FundamentalsCache: a ticker is read from \
+            <directory>/<ticker>.csv, in lower or upper case, and a \
+            ticker without a file has no statements.
+
+    It also stands in for the GuruFocus client, so nothing goes to \
+            the network: the WACC of a ticker is the newest value of \
+            its file's 'wacc' row, if it has one, reported with the \
+            'file' source.
+    """
+
+    # the 'wacc source' of the values it gives
+    source = "file"
+
+    def __init__(self, directory=STATEMENTS_DIR):
+        self.directory = directory
+
+
+    def __call__(self, ticker):
+        return LocalTicker(ticker, self.read(ticker))
+
+
+    def read(self, ticker):
+        """
+        The statements of a ticker, or None without a file, or when \
+                its file isn't a statement file, e.g. data/ndaq.csv.
+        """
+        for name in (ticker.lower(), ticker, ticker.upper()):
+            filename = path.join(self.directory, f"{name}.csv")
+            if path.exists(filename):
+                try:
+                    return WideStatements.read(filename, ticker)
+                except ValueError:
+                    return None
+        return None
+
+
+    def wacc(self, ticker):
+        """ WACC of a ticker, as a fraction, or None."""
+        statements = self.read(ticker)
+        if statements is None or "wacc" not in statements.items:
+            return None
+        return _newest(statements.items["wacc"])
+
+
+    def close(self):
+        """ Nothing to close; there is no session."""
+
+
+def load_directory(directory=STATEMENTS_DIR):
+    """
+    Every wide-format statement file of a directory, as \
+            FundamentalsBundles keyed by ticker.
+
+    Files are split into rows with plain string splits, or the \
+            csv module when they have quoted cells, and each one is \
+            converted to NumPy in a single call, without a DataFrame \
+            per ticker; other CSV files, such as lists of tickers, \
+            are skipped.
+    """
+    bundles = {}
+    with scandir(directory) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if not entry.is_file() or not entry.name.endswith(".csv"):
+                continue
+            try:
+                statements = WideStatements.read(entry.path)
+            except ValueError:
+                continue
+            bundles[statements.ticker] = statements.bundle()
+    return bundles
+
+
+def _number(cell):
+    """ A cell as a float, NaN when it is empty or not a number."""
+    try:
+        return float(cell.replace(",", ""))
+    except ValueError:
+        return np.nan
+
+
+def _newest(values):
+    """ Most recent value of a vector that isn't missing, if any."""
+    present = values[~np.isnan(values)]
+    return float(present[0]) if len(present) else None
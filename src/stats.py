@@ -1,21 +1,50 @@
-import sys
-import yfinance
+#!/usr/bin/python3
+
+# standard libraries
+import argparse
+
+# custom modules
+from cache import CachedTicker, open_cache
 from metrics import Metrics
 
-ticker = sys.argv[1]
-symbol = yfinance.Ticker(ticker)
 
-metric = Metrics()
+def main(ticker, cache=None):
+    """
+    Print the headline ratios of one ticker.
+
+    Statements are read through the given cache, or open_cache().
+    """
+    if cache is None:
+        cache = open_cache()
+    symbol = CachedTicker(ticker, cache)
+
+    metric = Metrics()
+
+    roa = metric.return_on_assets(symbol)
+    print(f'ROA: {roa}')
+    roe = metric.return_on_equity(symbol)
+    print(f'ROE: {roe}')
+
+    print(f"MCE: {metric.market_cap_to_equity(symbol)}")
+    print(f"NC/E: {metric.net_income_to_ev(symbol)}")
+    metric.avg_earnings_growth_rate(symbol)
+    metric.avg_fcf_growth_rate(symbol)
+    print(f"Inc date: {metric.inc_date(symbol)}")
+    exp_rat = metric.expense_ratio(symbol)
+    print(f"Expense ratio: {exp_rat}")
+
+
+def cli(argv=None, prog=None):
+    """ Print the ratios of a ticker, from the command line."""
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Headline ratios of a stock.")
+    parser.add_argument("ticker", help="ticker symbol, e.g. AAPL")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="read cached statements only, without fetching")
+    args = parser.parse_args(argv)
+
+    main(args.ticker, open_cache(offline=args.from_cache))
 
-roa = metric.return_on_assets(symbol)
-print(f'ROA: {metric.return_on_assets(symbol)}')
-roe = metric.return_on_equity(symbol)
-print(f'ROE: {metric.return_on_equity(symbol)}')
 
-print(f"MCE: {metric.market_cap_to_equity(symbol)}")
-print(f"NC/E: {metric.net_income_to_ev(symbol)}")
-metric.avg_earnings_growth_rate(symbol)
-metric.avg_fcf_growth_rate(symbol)
-print(f"Inc date: {metric.inc_date(symbol)}")
-exp_rat = metric.expense_ratio(symbol)
-print(f"Expense ratio: {exp_rat}")
+if __name__ == "__main__":
+    cli()
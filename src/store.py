@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+
+# standard libraries
+import argparse
+import json
+from os import makedirs, path, replace
+import re
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+
+# custom modules
+from universe import symbol_column
+
+# bumped whenever the layout of a store changes
+STORE_VERSION = 1
+
+SCHEMA_FILE = "schema.json"
+SYMBOLS_FILE = "symbols.npy"
+
+# text columns, such as 'inc', are stored as fixed-width strings
+TEXT_DTYPE = "<U32"
+
+
+class ColumnStore:
+    """
+    Binary, columnar store of per-ticker results.
+
+    A store is a directory holding one .npy array per result \
+            column, a symbols.npy index of the ticker in each row, \
+            and a schema.json header naming the file and dtype of \
+            every column.
+
+    Columns are memory-mapped: a writer fills in cells as tickers \
+            are scored, and a reader maps only the columns it asks \
+            for, without parsing or copying them, so opening a \
+            full-market result set is cheap whatever its size.
+
+    Numeric and boolean values are stored as float64, NaN where \
+            missing, and strings as fixed-width text.
+    """
+
+    def __init__(self, directory, mode="r"):
+        self.directory = directory
+        self.mode = mode
+        with open(path.join(directory, SCHEMA_FILE),
+                  encoding="utf-8") as schema:
+            self.schema = json.load(schema)
+        if self.schema["version"] != STORE_VERSION:
+            raise ValueError(
+                f"{directory}: store version {self.schema['version']}, "
+                f"expected {STORE_VERSION}"
+            )
+        self.symbols = _load(path.join(directory, SYMBOLS_FILE), "r")
+        self._columns = {}
+        self._rows = None
+
+
+    @classmethod
+    def create(cls, directory, symbols, resume=False):
+        """
+        Create an empty store for the given symbols, one row each.
+
+        When resuming, a store already in the directory, over the \
+                same symbols, is opened for writing instead, keeping \
+                the results it has.
+        """
+        symbols = np.asarray([str(symbol) for symbol in symbols], dtype=str)
+        schema_file = path.join(directory, SCHEMA_FILE)
+        if resume and path.exists(schema_file):
+            store = cls(directory, "r+")
+            if np.array_equal(store.symbols, symbols):
+                return store
+            store.close()
+
+        makedirs(directory, exist_ok=True)
+        np.save(path.join(directory, SYMBOLS_FILE), symbols)
+        _write_schema(directory, {
+            "version": STORE_VERSION,
+            "rows": len(symbols),
+            "columns": {},
+        })
+        return cls(directory, "r+")
+
+
+    @classmethod
+    def from_frame(cls, directory, frame, symbol_column="symbol"):
+        """ Write a whole results frame out as a store."""
+        store = cls.create(directory, frame[symbol_column])
+        store.write_frame(frame.drop(columns=[symbol_column]))
+        store.close()
+        return cls(directory)
+
+
+    def __len__(self):
+        return self.schema["rows"]
+
+
+    def __contains__(self, column):
+        return column in self.schema["columns"]
+
+
+    def __getitem__(self, column):
+        """ The memory-mapped array of a column."""
+        if column not in self._columns:
+            if column not in self.schema["columns"]:
+                raise KeyError(column)
+            info = self.schema["columns"][column]
+            self._columns[column] = _load(
+                path.join(self.directory, info["file"]), self.mode,
+            )
+        return self._columns[column]
+
+
+    @property
+    def columns(self):
+        """ Names of the stored columns, in the order they were added."""
+        return list(self.schema["columns"])
+
+
+    def row_of(self, symbol):
+        """ Row number of a ticker."""
+        if self._rows is None:
+            self._rows = {
+                symbol: row for row, symbol in enumerate(self.symbols.tolist())
+            }
+        return self._rows[symbol]
+
+
+    def write(self, row, values):
+        """ Set the cells of one row, adding any column not seen yet."""
+        for column, value in values.items():
+            if column not in self.schema["columns"]:
+                self._add_column(column, _dtype_of([value]))
+            self[column][row] = _cell(value, self[column].dtype)
+
+
+    def write_column(self, column, values, rows=None):
+        """ Set a whole column at once, or just the given rows of it."""
+        values = np.asarray(values)
+        if column not in self.schema["columns"]:
+            self._add_column(column, _dtype_of(values))
+        target = self[column]
+        if target.dtype.kind == "U":
+            values = np.where(pd.isna(values), "", values.astype(str))
+        else:
+            values = pd.to_numeric(
+                pd.Series(values), errors="coerce",
+            ).to_numpy(dtype=float)
+        if rows is None:
+            target[:] = values
+        else:
+            target[rows] = values
+
+
+    def write_frame(self, frame):
+        """ Set every column of a frame, row for row."""
+        for column in frame.columns:
+            self.write_column(column, frame[column].to_numpy())
+
+
+    def to_frame(self, columns=None, symbol_column="symbol"):
+        """ Copy the given columns, or all of them, into a DataFrame."""
+        if columns is None:
+            columns = self.columns
+        frame = pd.DataFrame({symbol_column: self.symbols})
+        for column in columns:
+            frame[column] = np.asarray(self[column])
+        return frame
+
+
+    def flush(self):
+        """ Write the mapped columns back to disk."""
+        if self.mode == "r":
+            return
+        for array in self._columns.values():
+            if isinstance(array, np.memmap):
+                array.flush()
+
+
+    def close(self):
+        """ Flush, and drop the mapped columns."""
+        self.flush()
+        self._columns = {}
+
+
+    def _add_column(self, column, dtype):
+        """ Allocate a new column, filled with missing values."""
+        files = {info["file"] for info in self.schema["columns"].values()}
+        stem = re.sub(r"[^0-9a-zA-Z]+", "_", column).strip("_") or "column"
+        filename = f"{stem}.npy"
+        suffix = 1
+        while filename in files or filename == SYMBOLS_FILE:
+            suffix += 1
+            filename = f"{stem}_{suffix}.npy"
+
+        filled = np.full(len(self), "" if dtype == TEXT_DTYPE else np.nan,
+                         dtype=dtype)
+        np.save(path.join(self.directory, filename), filled)
+
+        self.schema["columns"][column] = {
+            "file": filename, "dtype": np.dtype(dtype).str,
+        }
+        _write_schema(self.directory, self.schema)
+
+
+def store_path(outfile):
+    """ Directory of the column store kept next to an output file."""
+    return f"{outfile}.cols"
+
+
+def _load(filename, mode):
+    """ Memory-map a .npy file; empty arrays can't be mapped."""
+    array = np.load(filename, mmap_mode=mode, allow_pickle=False)
+    if array.size == 0:
+        return np.load(filename, allow_pickle=False)
+    return array
+
+
+def _write_schema(directory, schema):
+    """ Replace the schema header atomically."""
+    filename = path.join(directory, SCHEMA_FILE)
+    with open(f"{filename}.tmp", "w", encoding="utf-8") as output:
+        json.dump(schema, output, indent=2)
+    replace(f"{filename}.tmp", filename)
+
+
+def _dtype_of(values):
+    """ Text for columns of strings, float64 for everything else."""
+    values = np.asarray(values)
+    if values.dtype.kind in "US":
+        return TEXT_DTYPE
+    if values.dtype.kind == "O" and any(
+            isinstance(value, str) for value in values.tolist()):
+        return TEXT_DTYPE
+    return "<f8"
+
+
+def _cell(value, dtype):
+    """ Convert one value to the dtype of its column."""
+    if dtype.kind == "U":
+        return "" if value is None else str(value)
+    if value is None or isinstance(value, str):
+        return np.nan
+    return float(value)
+
+
+def main():
+    """ Convert result CSV files to column stores, next to each file."""
+    parser = argparse.ArgumentParser(
+        description="Convert result CSVs to memory-mapped column stores.",
+    )
+    parser.add_argument("files", nargs="+", help="result CSV files")
+    args = parser.parse_args()
+
+    for infile in args.files:
+        frame = pd.read_csv(infile)
+        store = ColumnStore.from_frame(
+            store_path(infile), frame, symbol_column(frame),
+        )
+        print(f"{infile}: {len(store)} rows, {len(store.columns)} columns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# standard libraries
+from os import path
+import sys
+
+# the modules live flat in src, and are run from there
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
@@ -0,0 +1,43 @@
+# non-standard libraries
+import pytest
+
+# custom modules
+from cache import CachedTicker, open_cache
+from throttle import RemoteGuard
+
+
+class CountingTicker:
+    """ Ticker that counts the statements asked of it."""
+
+    calls = 0
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+
+    @property
+    def info(self):
+        CountingTicker.calls += 1
+        return {"marketCap": 1000}
+
+
+@pytest.mark.parametrize("mode", ["live", "record", "replay"])
+def test_offline_never_goes_upstream(mode, tmp_path, monkeypatch):
+    # the cache and the recording are kept under data/
+    monkeypatch.chdir(tmp_path)
+    CountingTicker.calls = 0
+
+    # what was fetched before is still served
+    online = open_cache("record" if mode == "replay" else mode,
+                        CountingTicker)
+    online.guard = RemoteGuard("test")
+    assert CachedTicker("AAPL", online).info == {"marketCap": 1000}
+    online.close()
+    assert CountingTicker.calls == 1
+
+    offline = open_cache(mode, CountingTicker, offline=True)
+    assert offline.offline
+    assert CachedTicker("AAPL", offline).info == {"marketCap": 1000}
+    assert CachedTicker("MSFT", offline).info is None
+    assert CountingTicker.calls == 1
+    offline.close()
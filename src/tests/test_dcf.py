@@ -0,0 +1,126 @@
+# non-standard libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# custom modules
+from cache import FundamentalsCache
+from dcf import CAP_GAINS_TAX_RATE, TERMINAL_GROWTH, discounted_cash_flow
+import intrinsic_single
+from metrics import Metrics
+from statements import LocalStatements
+
+
+def looped_dcf(earnings, growth, wacc, fcf, liabilities, min_interest,
+               shares, price, horizon, term_growth=TERMINAL_GROWTH):
+    """ The per-ticker, year-by-year valuation the engine replaced."""
+    cash_flows = earnings * CAP_GAINS_TAX_RATE
+    for year in range(0, horizon - 1):
+        cash_flows += ((cash_flows * growth) / (1 + wacc))
+
+    if wacc < term_growth or wacc == term_growth:
+        term_growth = wacc - (wacc * 0.5)
+    growth_ratio_diff = wacc - term_growth
+    if growth_ratio_diff == 0:
+        growth_ratio_diff = 0.01
+    terminal_value = round((fcf * (1 + term_growth)) / growth_ratio_diff, 2)
+
+    dcf = cash_flows + terminal_value - liabilities - min_interest
+    try:
+        dcf_per_share = round(dcf / shares, 2)
+    except ZeroDivisionError:
+        dcf_per_share = 0
+    try:
+        expected = round((dcf_per_share - price) / price, 2) * 100
+    except ZeroDivisionError:
+        expected = 0
+    return cash_flows, terminal_value, round(dcf, 2), dcf_per_share, expected
+
+
+def inputs(count=500, seed=3):
+    """ Random inputs, with the WACC edge cases mixed in."""
+    rng = np.random.default_rng(seed)
+    scale = 10 ** rng.uniform(5, 10, count)
+    values = {
+        'earnings': rng.normal(scale, scale),
+        'growth': np.round(rng.uniform(-0.3, 0.5, count), 2),
+        'wacc': np.round(rng.uniform(0, 0.15, count), 3),
+        'fcf': rng.normal(scale, scale),
+        'liabilities': rng.uniform(0, scale * 5),
+        'min_interest': rng.uniform(0, scale / 10),
+        'shares': np.round(scale / rng.uniform(1, 100, count)),
+        'price': np.round(rng.uniform(1, 500, count), 2),
+    }
+    # at and below the terminal growth, zero, and without shares or price
+    values['wacc'][:4] = (TERMINAL_GROWTH, 0.02, 0, 0.01)
+    values['shares'][4] = 0
+    values['price'][5] = 0
+    return values
+
+
+@pytest.mark.parametrize("horizon", [1, 2, 10, 30])
+def test_closed_form_matches_loop(horizon):
+    values = inputs()
+    result = discounted_cash_flow(**values, horizon=horizon)
+
+    for row in range(len(values['earnings'])):
+        cash_flows, terminal_value, dcf, future_price, expected = \
+            looped_dcf(*(float(column[row]) for column in values.values()),
+                       horizon)
+        assert result['cash flows'][row] == pytest.approx(cash_flows,
+                                                          rel=1e-9)
+        # rounding to the cent may land either side of a half cent,
+        # and NumPy rounds large values a unit in the last place off
+        assert result['terminal value'][row] == pytest.approx(
+            terminal_value, rel=1e-12, abs=0.011,
+        )
+        assert result['dcf'][row] == pytest.approx(dcf, rel=1e-9, abs=0.011)
+        assert result['future price'][row] == pytest.approx(
+            future_price, rel=1e-9, abs=0.011,
+        )
+        assert result['growth'][row] == pytest.approx(expected, abs=1.01)
+
+
+class EarningsOnly:
+    """ Ticker with nothing but an earnings frame."""
+
+    def __init__(self, earnings):
+        self.earnings = earnings
+
+
+@pytest.mark.parametrize("earnings", [
+    None,
+    pd.DataFrame(),
+    pd.DataFrame({"Revenue": [1.0, 2.0]}, index=[2020, 2021]),
+])
+def test_growth_without_earnings_is_zero(earnings):
+    symbol = EarningsOnly(earnings)
+    assert Metrics().avg_earnings_growth_rate(symbol) == 0
+    assert np.isnan(Metrics().sd_earnings_growth_rate(symbol))
+
+
+def test_single_ticker_clamps_the_terminal_growth(tmp_path, capsys):
+    # a WACC right at the single-ticker terminal growth of old
+    (tmp_path / "aaa.csv").write_text(
+        "year,2021,2020\n"
+        "net income,120,100\n"
+        "operating cash flow,150,130\n"
+        "capex,-50,-40\n"
+        "shares,10,10\n"
+        "price,20,18\n"
+        "wacc,0.04,0.04\n"
+    )
+    statements = LocalStatements(str(tmp_path))
+    cache = FundamentalsCache(":memory:", ticker_factory=statements,
+                              wacc_client=statements)
+
+    result = intrinsic_single.main("AAA", cache)
+
+    # the terminal growth is halved against the WACC, as for a file
+    assert float(result['terminal value']) == pytest.approx(
+        100 * (1 + 0.02) / 0.02,
+    )
+    # 20% earnings growth, marked down to 13%
+    assert float(result['future price']) == discounted_cash_flow(
+        120, 0.13, 0.04, 100, 0, 0, 10, 20,
+    )['future price']
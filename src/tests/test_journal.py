@@ -0,0 +1,75 @@
+# standard libraries
+import json
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# custom modules
+from bench import SyntheticUniverse
+from bundle import FundamentalsBundle
+from journal import ResultsJournal, write_csv
+from metrics import Metrics
+
+
+def cell_by_cell(frame, rows):
+    """
+    The journal as it was folded in before rows were built into a \
+            frame: NumPy scalars converted up front, and every \
+            column assigned on its own, new ones included.
+    """
+    latest = {}
+    for row, values in rows:
+        plain = {column: value.item() if isinstance(value, np.generic)
+                 else value for column, value in values.items()}
+        latest[row] = json.loads(json.dumps(plain))
+    if not latest:
+        return frame
+
+    results = pd.DataFrame.from_records(
+        list(latest.values()), index=list(latest),
+    )
+    for column in results.columns:
+        frame.loc[results.index, column] = results[column]
+    return frame
+
+
+def universe_rows(size=400, seed=4):
+    """
+    Symbols of a synthetic universe, and the score and DCF rows of \
+            all but every seventh ticker, some of them twice.
+    """
+    universe = SyntheticUniverse(size, seed)
+    metrics = Metrics()
+    rows = []
+    for row, ticker in enumerate(universe.tickers):
+        if row % 7 == 3:
+            continue
+        bundle = FundamentalsBundle.from_ticker(universe.symbols[ticker])
+        values = metrics.compute_all(bundle)
+        values['wacc source'] = ('local', 'gurufocus', 'default')[row % 3]
+        values['future price'] = np.float64(row) / 3
+        rows.append((row, values))
+        if row % 11 == 0:
+            # a later record of the same row wins
+            rows.append((row, dict(values, roa=np.float64(-row))))
+    return universe.tickers, rows
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_compact_is_byte_identical_to_cell_by_cell(tmp_path):
+    tickers, rows = universe_rows()
+    frame = pd.DataFrame({'symbol': tickers, 'roa': 0.0, 'wacc': 0.07})
+
+    outfile = str(tmp_path / "universe.csv")
+    journal = ResultsJournal(outfile)
+    for row, values in rows:
+        journal.append(row, tickers[row], values)
+    journal.compact(frame.copy())
+
+    expected = str(tmp_path / "expected.csv")
+    write_csv(cell_by_cell(frame.copy(), rows), expected)
+
+    with open(outfile, "rb") as got, open(expected, "rb") as want:
+        assert got.read() == want.read()
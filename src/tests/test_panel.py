@@ -0,0 +1,98 @@
+# non-standard libraries
+import numpy as np
+import pytest
+
+# custom modules
+from bench import SyntheticUniverse
+from bundle import FundamentalsBundle, INFO_ITEMS, LINE_ITEMS
+from metrics import Metrics, SCORE_COLUMNS
+from panel import Panel
+
+
+def synthetic_bundles(size=200, seed=1):
+    """ Bundles of a synthetic universe, as scoring.run extracts them."""
+    universe = SyntheticUniverse(size, seed)
+    return [FundamentalsBundle.from_ticker(universe.symbols[ticker])
+            for ticker in universe.tickers]
+
+
+def copy_bundle(bundle, ticker):
+    """ A copy of a bundle, with vectors of its own."""
+    copy = FundamentalsBundle(ticker)
+    for slot in FundamentalsBundle.__slots__[1:]:
+        value = getattr(bundle, slot)
+        setattr(copy, slot, value.copy()
+                if isinstance(value, np.ndarray) else value)
+    return copy
+
+
+def edge_bundles(seed=2):
+    """
+    Bundles that each miss, zero out or blank a line item or info \
+            field, or have a single year of a statement, on top of \
+            a complete synthetic one.
+    """
+    base = synthetic_bundles(1, seed)[0]
+    names = [name for items in LINE_ITEMS.values() for name in items]
+    names += [name for name in INFO_ITEMS if name != "summary"]
+    # every line item of the base has four years
+    for name in names:
+        if getattr(base, name) is None:
+            setattr(base, name, 1.0 if name in INFO_ITEMS else np.ones(4))
+
+    bundles = []
+    for name in names:
+        # a missing info field is None, never NaN
+        changes = ("missing", "zero") if name in INFO_ITEMS \
+            else ("missing", "zero", "nan")
+        for change in changes:
+            bundle = copy_bundle(base, f"{name}-{change}")
+            if change == "missing":
+                value = None
+            elif name in INFO_ITEMS:
+                value = 0.0
+            else:
+                value = np.zeros(4) if change == "zero" \
+                    else np.full(4, np.nan)
+            setattr(bundle, name, value)
+            bundles.append(bundle)
+
+    # rows of one statement always have the same years
+    for statement, items in LINE_ITEMS.items():
+        bundle = copy_bundle(base, f"{statement}-short")
+        for name in items:
+            setattr(bundle, name, getattr(bundle, name)[:1])
+        bundles.append(bundle)
+
+    # nothing at all, and nothing but zeros
+    bundles.append(FundamentalsBundle("EMPTY"))
+    zeros = FundamentalsBundle("ZEROS")
+    for name in names:
+        setattr(zeros, name, 0.0 if name in INFO_ITEMS else np.zeros(4))
+    bundles.append(zeros)
+    return bundles
+
+
+def assert_same_scores(bundles):
+    scores = Panel.from_bundles(bundles).score()
+    metrics = Metrics()
+    for row, bundle in enumerate(bundles):
+        expected = metrics.compute_all(bundle)
+        for column in SCORE_COLUMNS:
+            got = scores[column][row]
+            want = expected[column]
+            if isinstance(want, str):
+                assert got == want, (bundle.ticker, column)
+            else:
+                assert got == pytest.approx(want, nan_ok=True), \
+                    (bundle.ticker, column)
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_panel_matches_metrics_on_synthetic_bundles():
+    assert_same_scores(synthetic_bundles())
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_panel_matches_metrics_on_missing_and_zero_items():
+    assert_same_scores(edge_bundles())
@@ -0,0 +1,69 @@
+# standard libraries
+import time
+
+# non-standard libraries
+import pandas as pd
+import pytest
+
+# custom modules
+import pipeline
+from pipeline import read_symbols, stage
+
+
+def test_read_symbols_in_chunks(tmp_path, monkeypatch):
+    infile = str(tmp_path / "universe.csv")
+    pd.DataFrame({
+        'Name': ["Apple", "Microsoft", "Verisign", "Nasdaq", "Coca-Cola"],
+        'Symbol': ["AAPL", "MSFT", "VRSN", "NDAQ", "KO"],
+        'roa': [0.1, 0.2, 0.3, 0.4, 0.5],
+    }).to_csv(infile, index=False)
+
+    chunks = []
+    read_csv = pd.read_csv
+
+    def spy(*args, **kwargs):
+        reader = read_csv(*args, **kwargs)
+        if kwargs.get("chunksize") is None:
+            return reader
+        return (chunks.append(chunk) or chunk for chunk in reader)
+
+    monkeypatch.setattr(pipeline.pd, "read_csv", spy)
+
+    symbols = read_symbols(infile, chunksize=2)
+    # nothing past the first chunk is read until it is asked for
+    assert next(symbols) == (0, "AAPL")
+    assert len(chunks) == 1
+
+    assert list(symbols) == [(1, "MSFT"), (2, "VRSN"), (3, "NDAQ"),
+                             (4, "KO")]
+    # rows are numbered across chunks, and only the symbols are read
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert all(list(chunk.columns) == ["Symbol"] for chunk in chunks)
+
+
+def test_stage_keeps_order_and_raises_errors():
+    def items():
+        yield from range(5)
+        raise ValueError("bad row")
+
+    seen = []
+    with pytest.raises(ValueError, match="bad row"):
+        for item in stage(items(), size=2):
+            seen.append(item)
+    assert seen == [0, 1, 2, 3, 4]
+
+
+def test_stage_runs_at_most_size_items_ahead():
+    produced = []
+
+    def items():
+        for item in range(100):
+            produced.append(item)
+            yield item
+
+    consumer = stage(items(), size=3)
+    assert next(consumer) == 0
+    time.sleep(0.3)
+    # the one handed over, a full queue, and the one waiting to go in
+    assert len(produced) <= 5
+    consumer.close()
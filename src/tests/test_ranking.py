@@ -0,0 +1,55 @@
+# non-standard libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# custom modules
+from ranking import REFRESH_UPDATES, Ranking
+
+METRICS = ['earnings_yield', 'roc', 'debt / assets:asc']
+
+
+def universe(count, rng):
+    """ Metric values with plenty of ties, and some missing."""
+    values = rng.integers(0, 20, (count, len(METRICS))).astype(float)
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return values
+
+
+def assert_same_ranks(ranking, values, count):
+    rebuilt = Ranking(ranking.symbols, values, METRICS, ranking.size)
+    np.testing.assert_array_equal(ranking.ranks, rebuilt.ranks)
+    np.testing.assert_array_equal(ranking.combined, rebuilt.combined)
+    pd.testing.assert_frame_equal(ranking.top(count), rebuilt.top(count))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_updates_match_a_rebuild(seed):
+    rng = np.random.default_rng(seed)
+    values = universe(300, rng)
+    symbols = [f"T{row:03d}" for row in range(len(values))]
+    ranking = Ranking(symbols, values, METRICS, size=10)
+
+    # enough updates to go through several refreshes of the top
+    for update in range(4 * REFRESH_UPDATES):
+        row = rng.integers(len(values))
+        if rng.random() < 0.3:
+            # push a ticker to the top, the way an update can
+            new = np.array([19.0, 19.0, 0.0])
+        else:
+            new = universe(1, rng)[0]
+        values[row] = new
+        ranking.update(symbols[row], new)
+        assert_same_ranks(ranking, values, 10)
+
+    assert_same_ranks(ranking, values, 50)
+
+
+def test_ties_share_the_better_rank():
+    ranking = Ranking(["A", "B", "C", "D"],
+                      [[3, 1, 1], [3, 2, 2], [1, 2, 0], [np.nan, 3, 0]],
+                      METRICS)
+    np.testing.assert_array_equal(ranking.ranks[:, 0], [1, 1, 3, np.nan])
+    np.testing.assert_array_equal(ranking.ranks[:, 2], [3, 4, 1, 1])
+    # C: 3 + 2 + 1, B: 1 + 2 + 4, A: 1 + 4 + 3, and D is missing a value
+    assert ranking.top()['symbol'].tolist() == ["C", "B", "A"]
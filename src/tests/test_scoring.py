@@ -0,0 +1,45 @@
+# non-standard libraries
+import pandas as pd
+import pytest
+
+# custom modules
+from bench import SyntheticUniverse
+from bundle import FundamentalsBundle
+from metrics import Metrics
+import scoring
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_from_cache_reads_a_symbol_header(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    universe = SyntheticUniverse(20, seed=5)
+    infile = str(tmp_path / "cheap.csv")
+    pd.DataFrame({'Symbol': universe.tickers}).to_csv(infile, index=False)
+
+    scoring.run_from_cache(infile, cache=universe.cache(),
+                           columns=('roa', 'niev'))
+
+    frame = pd.read_csv(infile)
+    metrics = Metrics()
+    for row, ticker in enumerate(universe.tickers):
+        bundle = FundamentalsBundle.from_ticker(universe.symbols[ticker])
+        scores = metrics.compute_columns(bundle, ('roa', 'niev'))
+        for column in ('roa', 'niev'):
+            assert frame.loc[row, column] == pytest.approx(
+                scores[column], nan_ok=True,
+            )
+
+
+@pytest.mark.parametrize("option", [["--resume"], ["--screen"],
+                                    ["--store"], ["--db"]])
+def test_from_cache_rejects_per_ticker_options(option, capsys):
+    with pytest.raises(SystemExit):
+        scoring.cli(["--from-cache", *option, "data/sp500.csv"])
+    assert "can't be used with --from-cache" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("option", [["--screen"], ["--store"], ["--db"]])
+def test_multi_rejects_per_file_options(option, capsys):
+    with pytest.raises(SystemExit):
+        scoring.cli(["--multi", *option, "data/sp500.csv", "data/ndaq.csv"])
+    assert "can't be used with --multi" in capsys.readouterr().err
@@ -0,0 +1,84 @@
+# standard libraries
+from itertools import product
+from os import path
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# custom modules
+from dcf import adjusted_growth, discounted_cash_flow
+from sensitivity import (AXES, PRICES_DTYPE, SensitivityGrid, grid_path,
+                         parse_axis, summary_path, sweep)
+
+GRID = {
+    'wacc': (0.06, 0.09, 0.12),
+    'markdown': (0, 0.33),
+    'term growth': (0.02, 0.03),
+    'horizon': (5, 10),
+}
+
+
+@pytest.fixture
+def inputs():
+    """ DCF inputs of two valued tickers, and one without earnings."""
+    return pd.DataFrame({
+        'Symbol': ["AAPL", "MSFT", "NONE"],
+        'earnings': [100e9, 70e9, np.nan],
+        'aegr': [12.0, 20.0, 5.0],
+        'wacc': [0.08, 0.08, 0.08],
+        'fcf': [90e9, 60e9, 1e9],
+        'liabilities': [250e9, 190e9, 1e9],
+        'min interest': [0, 0, 0],
+        'shares': [15e9, 7.4e9, 1e6],
+        'current price': [180.0, 400.0, 10.0],
+    })
+
+
+def test_sweep_matches_discounted_cash_flow(inputs, tmp_path):
+    outfile = str(tmp_path / "sp500_dcf.csv")
+    summary = sweep(inputs, outfile, GRID, symbol_column="Symbol")
+    grid = SensitivityGrid(grid_path(outfile))
+
+    assert list(grid.axes) == list(AXES)
+    np.testing.assert_array_equal(grid.axes['wacc'], GRID['wacc'])
+
+    prices = grid["MSFT"]
+    assert prices.shape == (3, 2, 2, 2)
+    assert prices.dtype == np.dtype(PRICES_DTYPE)
+    row = inputs.iloc[1]
+    for point in product(*(enumerate(GRID[axis]) for axis in AXES)):
+        (i, wacc), (j, markdown), (k, term_growth), (m, horizon) = point
+        expected = discounted_cash_flow(
+            row['earnings'], adjusted_growth(row['aegr'], markdown), wacc,
+            row['fcf'], row['liabilities'], row['min interest'],
+            row['shares'], np.nan, horizon=horizon,
+            term_growth=term_growth,
+        )['future price']
+        assert prices[i, j, k, m] == pytest.approx(float(expected),
+                                                   rel=1e-6)
+
+    # a ticker that isn't valued has no prices, and an unknown one no grid
+    assert np.isnan(grid["NONE"]).all()
+    with pytest.raises(KeyError):
+        grid["KO"]
+
+    assert path.exists(summary_path(outfile))
+    assert summary['Symbol'].tolist() == ["AAPL", "MSFT", "NONE"]
+    assert summary.loc[1, 'price min'] == pytest.approx(
+        float(prices.min()), abs=1e-3,
+    )
+    assert summary.loc[1, 'price max'] == pytest.approx(
+        float(prices.max()), abs=1e-3,
+    )
+    # dearer capital lowers the price
+    assert summary.loc[1, 'elasticity wacc'] < 0
+    assert summary.loc[2, ['price min', 'price max']].isna().all()
+
+
+def test_parse_axis():
+    assert parse_axis("0.05,0.07") == (0.05, 0.07)
+    assert parse_axis("0.04:0.14:3") == (0.04, 0.09, 0.14)
+    with pytest.raises(ValueError):
+        parse_axis("0.04:0.14")
@@ -0,0 +1,180 @@
+# standard libraries
+import json
+from os import path
+import threading
+import time
+
+# non-standard libraries
+import pytest
+import requests
+
+# custom modules
+from cache import FundamentalsCache
+from service import Coalescer, LruCache, ScoringService, serve
+from statements import LocalTicker, WideStatements
+from throttle import BACKOFF_MAX, RemoteGuard, ThrottledError
+
+VRSN = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                 "data", "vrsn.csv")
+
+
+class FakeClock:
+    """ Clock that only moves when it is told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+
+    def __call__(self):
+        return self.now
+
+
+class Upstream:
+    """
+    Ticker factory over data/vrsn.csv, counting the tickers it \
+            builds; it blocks until released, and throttles the \
+            tickers it is told to, once.
+    """
+
+    def __init__(self, throttled=()):
+        self.built = []
+        self.throttled = set(throttled)
+        self.released = threading.Event()
+        self.released.set()
+        self._statements = WideStatements.read(VRSN)
+
+
+    def __call__(self, ticker):
+        self.released.wait(5)
+        self.built.append(ticker)
+        if ticker in self.throttled:
+            self.throttled.discard(ticker)
+            raise ThrottledError(f"{ticker}: slow down")
+        return LocalTicker(ticker, self._statements)
+
+
+def service_over(upstream, **kwargs):
+    """ A service over an in-memory cache, without retries."""
+    cache = FundamentalsCache(":memory:", ticker_factory=upstream,
+                              guard=RemoteGuard("test", retries=0))
+    return ScoringService(cache, **kwargs)
+
+
+def wait_for(condition, timeout=5):
+    """ Poll until condition() holds, or fail after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_lru_cache_drops_stale_entries():
+    clock = FakeClock()
+    cache = LruCache(4, ttl=10, clock=clock)
+    cache.put("AAPL", 1)
+
+    clock.now = 10
+    assert cache.get("AAPL") == 1
+    clock.now = 10.5
+    assert cache.get("AAPL") is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LruCache(2)
+    cache.put("AAPL", 1)
+    cache.put("MSFT", 2)
+    # a read makes AAPL the most recently used
+    assert cache.get("AAPL") == 1
+    cache.put("VRSN", 3)
+
+    assert cache.get("MSFT") is None
+    assert cache.get("AAPL") == 1
+    assert cache.get("VRSN") == 3
+    assert len(cache) == 2
+
+
+def test_coalescer_runs_one_call_per_key():
+    coalescer = Coalescer()
+    released = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        released.wait(5)
+        return len(calls)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            coalescer.run("AAPL", compute),
+        ))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: coalescer.coalesced == 3)
+    released.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [1] * 4
+    # the key is free again once its call is done
+    assert coalescer.run("AAPL", compute) == 2
+
+
+def test_concurrent_requests_fetch_a_ticker_once():
+    upstream = Upstream()
+    upstream.released.clear()
+    service = service_over(upstream)
+
+    bodies = []
+    threads = [
+        threading.Thread(target=lambda: bodies.append(
+            service.answer("metrics", "VRSN"),
+        ))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: service.coalescer.coalesced == 3)
+    upstream.released.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert upstream.built == ["VRSN"]
+    assert len(set(bodies)) == 1 and len(bodies) == 4
+    assert json.loads(bodies[0])["ticker"] == "VRSN"
+    assert json.loads(bodies[0])["aegr"] == pytest.approx(17.94)
+
+    # answered from memory from now on
+    assert service.answer("metrics", "VRSN") == bodies[0]
+    assert service.status()["hits"] >= 1
+    assert upstream.built == ["VRSN"]
+    service.close()
+
+
+def test_throttled_ticker_gets_a_503():
+    upstream = Upstream(throttled=["SLOW"])
+    service = service_over(upstream)
+    server = serve(service, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics/SLOW"
+
+    try:
+        response = requests.get(url, timeout=5)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(int(BACKOFF_MAX))
+        assert "slow down" in response.json()["error"]
+
+        # nothing was kept of the throttled attempt
+        response = requests.get(url, timeout=5)
+        assert response.status_code == 200
+        assert response.json()["ticker"] == "SLOW"
+        assert upstream.built == ["SLOW", "SLOW"]
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
@@ -0,0 +1,71 @@
+# non-standard libraries
+import numpy as np
+import pytest
+
+# custom modules
+import cli
+from snapshots import SnapshotStore, parse_condition
+
+
+@pytest.fixture
+def store(tmp_path):
+    """ A results database with two runs over the same file."""
+    store = SnapshotStore(str(tmp_path / "results.db"), batch=2)
+    first = store.begin_run("entrypoint", "data/sp500.csv")
+    store.write(first, "AAPL", {'roa': 0.2, 'niev': 5.0})
+    store.write(first, "MSFT", {'roa': 0.05, 'niev': np.nan})
+    second = store.begin_run("entrypoint", "data/sp500.csv")
+    store.write(second, "AAPL", {'roa': 0.3, 'niev': 6.0})
+    store.write(second, "MSFT", {'roa': 0.15, 'inc': "Yes"})
+    # a later write of the same ticker and run updates its row
+    store.write(second, "VRSN", {'roa': 0.1})
+    store.write(second, "VRSN", {'roa': 0.4, 'dcf': np.float32(80.5)})
+    yield store
+    store.close()
+
+
+def test_columns_are_added_as_runs_write_them(store):
+    history = store.history("MSFT")
+    assert list(history.columns[:3]) == ['run', 'ticker', 'ts']
+    assert set(history.columns[3:]) == {'roa', 'niev', 'inc', 'dcf'}
+    # NaN is stored as NULL, and a column a run never wrote is NULL too
+    assert history['niev'].isna().all()
+    assert history['inc'].tolist() == [None, "Yes"]
+
+
+def test_screen_the_latest_run(store):
+    frame = store.screen([('roa', '>', 0.12)], columns=['roa', 'dcf'],
+                         order_by='roa', descending=True)
+    assert frame['ticker'].tolist() == ["VRSN", "AAPL", "MSFT"]
+    assert frame['roa'].tolist() == [0.4, 0.3, 0.15]
+    assert frame['dcf'].tolist()[0] == pytest.approx(80.5)
+
+    # an earlier run, by id or by source
+    frame = store.screen([parse_condition("roa >= 0.1")], run=1)
+    assert frame['ticker'].tolist() == ["AAPL"]
+    assert store.latest_run(source="sp500") == 2
+    assert store.screen([], source="nyse").empty
+
+    assert store.screen([], order_by='roa', limit=1)['ticker'].tolist() \
+        == ["MSFT"]
+
+
+def test_screen_refuses_unknown_columns_and_operators(store):
+    with pytest.raises(ValueError, match="unknown column"):
+        store.screen([('roa; DROP TABLE results', '>', 0)])
+    with pytest.raises(ValueError, match="unknown operator"):
+        store.screen([('roa', 'LIKE', 0)])
+    with pytest.raises(ValueError, match="not a condition"):
+        parse_condition("roa")
+
+
+def test_db_command(store, capsys):
+    store.close()
+    cli.main(["db", "query", "roa > 0.2", "--columns", "roa",
+              "--db", store.filename])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["ticker", "roa"]
+    assert sorted(line.split()[0] for line in lines[1:]) == ["AAPL", "VRSN"]
+
+    cli.main(["db", "runs", "--db", store.filename])
+    assert len(capsys.readouterr().out.splitlines()) == 3
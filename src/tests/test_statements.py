@@ -0,0 +1,63 @@
+# standard libraries
+from os import makedirs, path
+import shutil
+
+# non-standard libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# custom modules
+from metrics import Metrics
+import scoring
+from statements import LocalStatements, WideStatements, load_directory
+
+DATA_DIR = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                     "data")
+VRSN = path.join(DATA_DIR, "vrsn.csv")
+
+
+def test_load_directory_skips_other_files():
+    # data/ also holds score files, lists of tickers and DCF outputs
+    bundles = load_directory(DATA_DIR)
+    assert list(bundles) == ["VRSN"]
+
+    bundle = bundles["VRSN"]
+    statements = WideStatements.read(VRSN)
+    # earnings oldest first, as in the yfinance earnings frame
+    np.testing.assert_array_equal(bundle.earnings,
+                                  statements.items["net_income"][::-1])
+    assert len(bundle.earnings) == 14
+    assert bundle.net_income[0] == 784801
+    assert bundle.capital_expenditures[0] == -53033
+
+
+def test_bulk_and_per_ticker_reads_agree():
+    bundle = load_directory(DATA_DIR)["VRSN"]
+    symbol = LocalStatements(DATA_DIR)("VRSN")
+    metrics = Metrics()
+    assert metrics.avg_earnings_growth_rate(symbol) == pytest.approx(17.94)
+    assert metrics.compute_columns(bundle, ('aegr',))['aegr'] \
+        == pytest.approx(17.94)
+
+
+def test_score_files_arent_statements():
+    assert LocalStatements(DATA_DIR).read("NDAQ") is None
+    assert LocalStatements(DATA_DIR).read("NONE") is None
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_local_cache_pass_reads_the_directory(tmp_path, monkeypatch):
+    # statements are read from data/, under the working directory
+    makedirs(tmp_path / "data")
+    shutil.copy(VRSN, tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scoring, "FUNDAMENTALS_MODE", "local")
+    infile = str(tmp_path / "universe.csv")
+    pd.DataFrame({'symbol': ["vrsn", "NONE"]}).to_csv(infile, index=False)
+
+    scoring.run_from_cache(infile, columns=('aegr', 'afcf'))
+
+    frame = pd.read_csv(infile)
+    assert frame.loc[0, 'aegr'] == pytest.approx(17.94)
+    assert frame.loc[1, 'aegr'] == 0
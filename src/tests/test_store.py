@@ -0,0 +1,63 @@
+# non-standard libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# custom modules
+from store import ColumnStore, store_path
+
+
+def test_written_rows_read_back_as_a_frame(tmp_path):
+    directory = store_path(str(tmp_path / "universe.csv"))
+    store = ColumnStore.create(directory, ["AAPL", "MSFT", "VRSN"])
+    store.write(2, {'roa': 0.25, 'inc': "Yes", 'screen': True})
+    store.write(0, {'roa': 0.1, 'inc': None, 'niev': -3})
+    store.close()
+
+    store = ColumnStore(directory)
+    assert len(store) == 3
+    assert store.columns == ['roa', 'inc', 'screen', 'niev']
+    assert isinstance(store['roa'], np.memmap)
+    assert store.row_of("VRSN") == 2
+
+    frame = store.to_frame()
+    assert frame['symbol'].tolist() == ["AAPL", "MSFT", "VRSN"]
+    np.testing.assert_array_equal(frame['roa'], [0.1, np.nan, 0.25])
+    # text stays text, and a missing cell of it is empty
+    assert frame['inc'].tolist() == ["", "", "Yes"]
+    np.testing.assert_array_equal(frame['screen'], [np.nan, np.nan, 1.0])
+    np.testing.assert_array_equal(frame['niev'], [-3.0, np.nan, np.nan])
+
+    only = store.to_frame(['niev'], symbol_column="Symbol")
+    assert list(only.columns) == ["Symbol", "niev"]
+
+
+def test_resume_keeps_results_of_the_same_symbols(tmp_path):
+    directory = str(tmp_path / "universe.csv.cols")
+    store = ColumnStore.create(directory, ["AAPL", "MSFT"])
+    store.write(1, {'roa': 0.5})
+    store.close()
+
+    store = ColumnStore.create(directory, ["AAPL", "MSFT"], resume=True)
+    assert store['roa'][1] == 0.5
+    store.close()
+
+    # another set of symbols starts from an empty store
+    store = ColumnStore.create(directory, ["VRSN"], resume=True)
+    assert store.columns == []
+    assert len(store) == 1
+
+
+def test_frame_round_trip(tmp_path):
+    frame = pd.DataFrame({
+        'Symbol': ["AAPL", "MSFT"],
+        'roa': [0.1, np.nan],
+        'inc': ["Yes", "No"],
+    })
+    store = ColumnStore.from_frame(str(tmp_path / "cols"), frame, "Symbol")
+
+    assert store.mode == "r"
+    pd.testing.assert_frame_equal(store.to_frame(symbol_column="Symbol"),
+                                  frame)
+    with pytest.raises(KeyError):
+        store['niev']
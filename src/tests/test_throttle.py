@@ -0,0 +1,216 @@
+# standard libraries
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path
+import threading
+
+# non-standard libraries
+import pandas as pd
+import pytest
+import requests
+
+# custom modules
+from cache import FundamentalsCache
+import scoring
+from statements import LocalTicker, WideStatements
+from throttle import CircuitBreaker, RemoteGuard, ThrottledError, TokenBucket
+from wacc import GuruFocusClient
+
+VRSN = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                 "data", "vrsn.csv")
+
+
+class FakeClock:
+    """ Clock that only moves when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+
+    def __call__(self):
+        return self.now
+
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Upstream(BaseHTTPRequestHandler):
+    """
+    Stand-in for a remote service: each path answers with the \
+            statuses scripted for it, in turn, and 200 once they \
+            run out.
+    """
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits.append(self.path)
+            script = server.script.get(self.path.split("/")[1], [])
+            status = script.pop(0) if script else 200
+        body = b"WACC % 7.50%" if status == 200 else b"slow down"
+
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "2")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    """ A running stand-in, with its script and the paths it served."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    server.lock = threading.Lock()
+    server.script = {}
+    server.hits = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url_of(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def guard(clock, retries=3, breaker=None):
+    """ A guard without a rate limit, sleeping on a fake clock."""
+    return RemoteGuard("test", retries=retries, sleep=clock.sleep,
+                       breaker=breaker or CircuitBreaker(
+                           window=1000, clock=clock, sleep=clock.sleep,
+                       ))
+
+
+def test_guard_retries_throttled_requests(upstream):
+    upstream.script["AAPL"] = [429, 503]
+    clock = FakeClock()
+    client = GuruFocusClient(url_of(upstream) + "/{ticker}",
+                             guard=guard(clock))
+
+    assert client.wacc("AAPL") == pytest.approx(0.075)
+    assert client.guard.calls == 3
+    assert client.guard.retried == 2
+    assert len(upstream.hits) == 3
+    # Retry-After is honoured, the 503 gets a jittered backoff
+    assert clock.sleeps[0] == 2
+    assert 0 <= clock.sleeps[1] <= client.guard.backoff * 2
+
+
+def test_guard_gives_up_with_throttled_error(upstream):
+    upstream.script["AAPL"] = [503] * 10
+    clock = FakeClock()
+    client = GuruFocusClient(url_of(upstream) + "/{ticker}",
+                             guard=guard(clock, retries=2))
+
+    with pytest.raises(ThrottledError):
+        client.wacc("AAPL")
+    assert len(upstream.hits) == 3
+    assert client.guard.throttled == 1
+
+
+def test_guard_doesnt_retry_other_errors(upstream):
+    upstream.script["AAPL"] = [404]
+    clock = FakeClock()
+    client = GuruFocusClient(url_of(upstream) + "/{ticker}",
+                             guard=guard(clock))
+
+    assert client.wacc("AAPL") is None
+    assert len(upstream.hits) == 1
+    assert clock.sleeps == []
+
+
+def test_breaker_opens_on_server_errors(upstream):
+    upstream.script["AAPL"] = [500] * 4
+    clock = FakeClock()
+    breaker = CircuitBreaker(error_rate=0.5, window=4, cooldown=30,
+                             clock=clock, sleep=clock.sleep)
+    client = GuruFocusClient(url_of(upstream) + "/{ticker}",
+                             guard=guard(clock, retries=3, breaker=breaker))
+
+    with pytest.raises(ThrottledError):
+        client.wacc("AAPL")
+    assert breaker.trips == 1
+    assert breaker.is_open
+
+    # the next call waits out the cooldown before going upstream
+    before = len(clock.sleeps)
+    assert client.wacc("AAPL") == pytest.approx(0.075)
+    assert clock.sleeps[before] == pytest.approx(30, abs=1)
+    assert not breaker.is_open
+
+
+def test_token_bucket_spaces_out_calls():
+    clock = FakeClock()
+    bucket = TokenBucket(2, burst=1, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        bucket.acquire()
+    # a token every half second, after the one the bucket starts with
+    assert clock.sleeps == [0.5, 0.5, 0.5]
+
+
+def test_token_bucket_waits_are_reserved_in_order():
+    clock = FakeClock()
+    waits = []
+    bucket = TokenBucket(4, burst=2, clock=clock, sleep=waits.append)
+    for _ in range(5):
+        bucket.acquire()
+    # callers that don't advance the clock queue up behind each other
+    assert waits == [0.25, 0.5, 0.75]
+
+
+class RemoteTicker(LocalTicker):
+    """
+    Ticker whose statements have to get through the stand-in \
+            first, as a live yfinance ticker goes through Yahoo.
+    """
+
+    def __init__(self, ticker, url):
+        super().__init__(ticker, WideStatements.read(VRSN, ticker))
+        self.url = url
+
+
+    def _frame(self, statement):
+        response = requests.get(f"{self.url}/{self.ticker}/{statement}",
+                                timeout=5)
+        response.raise_for_status()
+        return super()._frame(statement)
+
+
+def test_throttled_ticker_is_retried_not_zeroed(upstream, tmp_path,
+                                                monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scoring, "RETRY_ROUNDS", 2)
+    # SLOW is throttled past its retries once, DOWN on every pass
+    upstream.script["SLOW"] = [429] * 2
+    upstream.script["DOWN"] = [503] * 1000
+    clock = FakeClock()
+    cache = FundamentalsCache(
+        ":memory:", ticker_factory=lambda ticker: RemoteTicker(
+            ticker, url_of(upstream),
+        ),
+        guard=guard(clock, retries=1),
+    )
+    infile = str(tmp_path / "universe.csv")
+    pd.DataFrame({'symbol': ["OK", "SLOW", "DOWN"]}).to_csv(
+        infile, index=False,
+    )
+
+    scoring.run(infile, workers=1, cache=cache, columns=('aegr', 'afcf'))
+
+    frame = pd.read_csv(infile)
+    assert frame.loc[0, 'aegr'] == pytest.approx(17.94)
+    assert frame.loc[1, 'aegr'] == frame.loc[0, 'aegr']
+    assert frame.loc[1, 'afcf'] == frame.loc[0, 'afcf']
+    # never written as zeros, and left in the journal for --resume
+    assert frame.loc[2, ['aegr', 'afcf']].isna().all()
+    records = list(pd.read_json(f"{infile}.journal", lines=True)['symbol'])
+    assert "DOWN" not in records
+    assert records.count("SLOW") == 1
@@ -0,0 +1,33 @@
+# standard libraries
+from os import path
+
+# non-standard libraries
+import pandas as pd
+import pytest
+
+# custom modules
+from universe import CHEAP_LAYOUT, SCORE_LAYOUT, Universe, layout_of
+
+DATA_DIR = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                     "data")
+
+
+@pytest.mark.parametrize("name, layout", [
+    ("ndaq.csv", SCORE_LAYOUT),
+    ("nyse.csv", SCORE_LAYOUT),
+    ("sp500.csv", SCORE_LAYOUT),
+    ("cheap.csv", CHEAP_LAYOUT),
+])
+def test_result_files_get_their_layout(name, layout):
+    assert Universe(path.join(DATA_DIR, name)).layout is layout
+
+
+@pytest.mark.parametrize("name", ["ndaq_dcf.csv", "nyse_dcf.csv",
+                                  "sp500_dcf.csv"])
+def test_dcf_files_arent_taken_for_score_files(name):
+    with pytest.raises(ValueError):
+        Universe(path.join(DATA_DIR, name))
+
+
+def test_symbol_lists_get_the_score_layout():
+    assert layout_of(pd.DataFrame(columns=['symbol'])) is SCORE_LAYOUT
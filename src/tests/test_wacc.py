@@ -0,0 +1,55 @@
+# non-standard libraries
+import pytest
+
+# custom modules
+from cache import FundamentalsCache
+from statements import LocalStatements
+from wacc import DEFAULT_WACC, WaccProvider, parse_wacc
+
+
+class PageClient:
+    """ GuruFocus client serving one page for every ticker."""
+
+    def __init__(self, page):
+        self.page = page
+
+
+    def wacc(self, ticker):
+        return parse_wacc(self.page)
+
+
+class Symbol:
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+
+def test_parse_wacc():
+    assert parse_wacc("WACC % : 8.25% as of today") == pytest.approx(0.0825)
+    assert parse_wacc("<html>Not found</html>") is None
+
+
+@pytest.mark.parametrize("page, wacc, source", [
+    ("WACC % : 8.25%", 0.0825, "gurufocus"),
+    ("<html>Not found</html>", DEFAULT_WACC, "default"),
+])
+def test_remote_lookup(page, wacc, source):
+    cache = FundamentalsCache(":memory:")
+    waccs = WaccProvider(cache, source="remote", client=PageClient(page))
+
+    assert waccs.lookup(Symbol("AAPL")) == (pytest.approx(wacc), source)
+    # only what GuruFocus actually answered is cached
+    cached = cache.get("AAPL", "wacc")
+    assert cached == (None if source == "default" else pytest.approx(wacc))
+
+
+def test_statement_files_report_their_own_source(tmp_path):
+    (tmp_path / "aaa.csv").write_text(
+        "year,2021,2020\nnet income,10,8\nwacc,0.09,0.08\n",
+    )
+    statements = LocalStatements(str(tmp_path))
+    cache = FundamentalsCache(":memory:", ticker_factory=statements,
+                              wacc_client=statements)
+    waccs = WaccProvider(cache, source="remote")
+
+    assert waccs.lookup(Symbol("AAA")) == (pytest.approx(0.09), "file")
+    assert waccs.lookup(Symbol("BBB")) == (DEFAULT_WACC, "default")
@@ -0,0 +1,253 @@
+# standard libraries
+from collections import deque
+from os import getenv
+import random
+import threading
+import time
+
+# environment variables and defaults
+FETCH_RETRIES = int(getenv("FETCH_RETRIES", 5))
+BACKOFF_BASE = float(getenv("BACKOFF_BASE", 1))
+BACKOFF_MAX = float(getenv("BACKOFF_MAX", 60))
+BREAKER_ERROR_RATE = float(getenv("BREAKER_ERROR_RATE", 0.5))
+BREAKER_WINDOW = int(getenv("BREAKER_WINDOW", 20))
+BREAKER_COOLDOWN = float(getenv("BREAKER_COOLDOWN", 30))
+
+# passes over the tickers that were still throttled after their retries
+RETRY_ROUNDS = int(getenv("RETRY_ROUNDS", 2))
+
+# requests per second allowed to each remote service, 0 for no limit;
+# read as <NAME>_RATE, e.g. YAHOO_RATE
+DEFAULT_RATES = {"yahoo": 2, "gurufocus": 1}
+
+# HTTP statuses that mean "slow down" or "try again later"
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class ThrottledError(Exception):
+    """
+    A remote fetch that kept failing with throttling or server \
+            errors after all its retries.
+
+    It must never be turned into a missing value: the ticker is \
+            to be fetched again later, not scored as zeros.
+    """
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter, shared by every thread.
+
+    Each call to acquire() takes a token, waiting for one to be \
+            refilled at the given rate when the bucket is empty. \
+            Waiting callers reserve their token up front, so they \
+            are let through at the rate, in order, without spinning.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst if burst is not None else rate)
+        self.tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+
+    def acquire(self):
+        """ Wait for a token, and take it."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            self._sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Pauses every caller when too many recent calls fail.
+
+    Once the share of failures among the last window calls \
+            reaches error_rate, the breaker opens, and wait() holds \
+            every worker until cooldown seconds have passed; the \
+            first calls after that probe whether the service is back.
+    """
+
+    def __init__(self, error_rate=BREAKER_ERROR_RATE, window=BREAKER_WINDOW,
+                 cooldown=BREAKER_COOLDOWN, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.error_rate = error_rate
+        self.window = max(1, window)
+        self.cooldown = cooldown
+        self.trips = 0
+        self._outcomes = deque(maxlen=self.window)
+        self._open_until = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+
+    @property
+    def is_open(self):
+        return self._clock() < self._open_until
+
+
+    def wait(self):
+        """ Block while the breaker is open."""
+        while True:
+            remaining = self._open_until - self._clock()
+            if remaining <= 0:
+                return
+            self._sleep(remaining)
+
+
+    def record(self, ok):
+        """ Count the outcome of a call, tripping the breaker if need be."""
+        with self._lock:
+            self._outcomes.append(ok)
+            if len(self._outcomes) < self.window:
+                return
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.error_rate:
+                self._open_until = self._clock() + self.cooldown
+                self._outcomes.clear()
+                self.trips += 1
+
+
+class RemoteGuard:
+    """
+    Shared front for the calls to one remote service.
+
+    Every call waits for the circuit breaker and a rate-limit \
+            token. A call failing with a throttling or server error \
+            is retried with jittered exponential backoff, honouring \
+            Retry-After, and raises ThrottledError once its retries \
+            run out. Any other error is the caller's to handle.
+    """
+
+    def __init__(self, name, rate=0, burst=None, retries=FETCH_RETRIES,
+                 backoff=BACKOFF_BASE, max_backoff=BACKOFF_MAX,
+                 breaker=None, sleep=time.sleep):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst, sleep=sleep)
+        self.breaker = breaker or CircuitBreaker(sleep=sleep)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.calls = 0
+        self.retried = 0
+        self.throttled = 0
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+
+    def call(self, function, *args, **kwargs):
+        """ Call a remote fetch, under the limits of the service."""
+        for attempt in range(self.retries + 1):
+            self.breaker.wait()
+            self.bucket.acquire()
+            with self._lock:
+                self.calls += 1
+            try:
+                result = function(*args, **kwargs)
+            except Exception as error:
+                if not is_retryable(error):
+                    raise
+                self.breaker.record(False)
+                if attempt == self.retries:
+                    with self._lock:
+                        self.throttled += 1
+                    raise ThrottledError(
+                        f"{self.name}: still failing after "
+                        f"{self.retries} retries: {error!r}"
+                    ) from error
+                with self._lock:
+                    self.retried += 1
+                self._sleep(self.delay(attempt, error))
+                continue
+
+            self.breaker.record(True)
+            return result
+
+
+    def delay(self, attempt, error=None):
+        """
+        Seconds to back off before a retry: the server's \
+                Retry-After if it sent one, or else a random \
+                ("full jitter") share of the exponential backoff.
+        """
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after)
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt),
+        )
+
+
+    def summary(self):
+        """ One line of call, retry and breaker counts."""
+        return (f"{self.name}: {self.calls} calls, {self.retried} retried, "
+                f"{self.throttled} throttled, "
+                f"breaker tripped {self.breaker.trips} times")
+
+
+_GUARDS = {}
+_GUARDS_LOCK = threading.Lock()
+
+
+def shared(name):
+    """
+    The process-wide guard of a remote service, limited to \
+            <NAME>_RATE requests per second.
+    """
+    with _GUARDS_LOCK:
+        if name not in _GUARDS:
+            rate = float(getenv(f"{name.upper()}_RATE",
+                                DEFAULT_RATES.get(name, 0)))
+            _GUARDS[name] = RemoteGuard(name, rate)
+        return _GUARDS[name]
+
+
+def is_retryable(error):
+    """
+    Whether an error means the service is throttling us or \
+            temporarily down: HTTP 429 or 5xx, a dropped connection, \
+            or a timeout.
+    """
+    if isinstance(error, ThrottledError):
+        return False
+    status = _status(error)
+    if status is not None:
+        return status in RETRY_STATUSES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # requests' errors don't derive from the builtin ones
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & {"ConnectionError", "Timeout"}:
+        return True
+    message = str(error)
+    return "429" in message or "Too Many Requests" in message
+
+
+def _status(error):
+    """ HTTP status of the response an error carries, if any."""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error):
+    """ Seconds in the Retry-After header of an error's response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
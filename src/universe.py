@@ -0,0 +1,111 @@
+# non-standard libraries
+import pandas as pd
+
+# custom modules
+from metrics import SCORE_COLUMNS
+
+# columns scoring.run writes, each named after its own score
+SCORE_LAYOUT = {column: column for column in SCORE_COLUMNS}
+
+# columns of the older screening layout, as in data/cheap.csv
+CHEAP_LAYOUT = {
+    'ebit / ev': 'earnings_yield',
+    'roa': 'return_on_assets',
+    'equity / debt': 'equity_to_debt_ratio',
+    'market cap / equity': 'mce',
+    'net-net': 'net_net',
+}
+
+LAYOUTS = (SCORE_LAYOUT, CHEAP_LAYOUT)
+
+# share of a layout's columns a file must carry to be filled in it;
+# a DCF file, e.g. data/sp500_dcf.csv, only shares a few with scores
+LAYOUT_MIN_SHARE = 0.5
+
+SYMBOL_COLUMNS = ('symbol', 'Symbol')
+
+
+class Universe:
+    """
+    One input file of a multi-file run.
+
+    Knows the file's symbol column, and the layout mapping its \
+            result columns to the scores they are filled from.
+    """
+
+    def __init__(self, infile):
+        self.infile = infile
+        self.frame = pd.read_csv(infile)
+        self.symbol_column = symbol_column(self.frame)
+        self.symbols = list(self.frame[self.symbol_column])
+        self.layout = layout_of(self.frame)
+
+
+    def row(self, scores):
+        """
+        The result columns of this file, from a ticker's scores; \
+                columns whose score wasn't computed are left out.
+        """
+        return {column: scores[key] for column, key in self.layout.items()
+                if key in scores}
+
+
+class SymbolIndex:
+    """
+    Master index of the tickers listed across several files.
+
+    Every unique ticker maps to each (universe, row) that lists \
+            it, so it can be fetched and scored once, and its \
+            results fanned out to every file.
+    """
+
+    def __init__(self, universes):
+        self.universes = list(universes)
+        self.rows = {}
+        for universe in self.universes:
+            for row, symbol in enumerate(universe.symbols):
+                if isinstance(symbol, str) and symbol:
+                    self.rows.setdefault(symbol, []).append((universe, row))
+
+
+    @property
+    def tickers(self):
+        """ Unique tickers, in the order they were first listed."""
+        return list(self.rows)
+
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def symbol_column(frame):
+    """ Name of the column that holds the ticker symbols."""
+    for column in SYMBOL_COLUMNS:
+        if column in frame.columns:
+            return column
+    raise KeyError(f"no symbol column in {list(frame.columns)}")
+
+
+def layout_of(frame):
+    """
+    The layout of a file: the one it carries at least \
+            LAYOUT_MIN_SHARE of the columns of, sharing the most with \
+            it. A file with no known result columns gets \
+            scoring.run's.
+
+    Raises ValueError for a file of some other layout, such as \
+            the output of intrinsic_value, rather than writing \
+            scores over its columns.
+    """
+    columns = set(frame.columns)
+    shared = [len(set(layout) & columns) for layout in LAYOUTS]
+    if not any(shared):
+        return SCORE_LAYOUT
+
+    count, best = max(zip(shared, LAYOUTS), key=lambda match: match[0])
+    if count < LAYOUT_MIN_SHARE * len(best):
+        raise ValueError(
+            f"no known result layout: only {count} of "
+            f"{len(best)} columns match"
+        )
+    return best
@@ -0,0 +1,187 @@
+# standard libraries
+import math
+from os import getenv
+import re
+
+# custom modules
+from bundle import FundamentalsBundle
+from metrics import Metrics, statements_for
+from throttle import shared
+
+# environment variables and defaults
+# local: computed from the statements, GuruFocus when that fails
+# remote: always looked up on GuruFocus
+WACC_SOURCE = getenv("WACC_SOURCE", "local")
+WACC_FLOOR = float(getenv("WACC_FLOOR", 0))
+WACC_CEILING = float(getenv("WACC_CEILING", 0.5))
+GURUFOCUS_TIMEOUT = float(getenv("GURUFOCUS_TIMEOUT", 10))
+GURUFOCUS_POOL = int(getenv("GURUFOCUS_POOL", 10))
+
+GURUFOCUS_URL = getenv(
+    "GURUFOCUS_URL",
+    "https://www.gurufocus.com/term/wacc/{ticker}/WACC-Percentage/{ticker}",
+)
+
+# used when neither the statements nor GuruFocus give a WACC
+DEFAULT_WACC = 0.07
+
+PERCENTAGE = re.compile(r"[0-9]+\.[0-9]+%")
+
+
+class GuruFocusClient:
+    """
+    WACC lookups on GuruFocus, over one pooled session.
+
+    Connections are kept alive between tickers, and every request \
+            has a timeout, so a stalled page can't hang the run.
+
+    Requests go through a RemoteGuard, the shared GuruFocus one by \
+            default, which rate-limits them and retries throttled ones.
+    """
+
+    # the 'wacc source' of the values it gives
+    source = "gurufocus"
+
+    def __init__(self, url=GURUFOCUS_URL, timeout=GURUFOCUS_TIMEOUT,
+                 pool=GURUFOCUS_POOL, guard=None):
+        # imported here, so cache-only callers never pay for requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = url
+        self.timeout = timeout
+        self.guard = guard if guard is not None else shared("gurufocus")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+
+    def wacc(self, ticker):
+        """
+        WACC of a ticker, as a fraction, or None when the page \
+                can't be fetched or has no percentage.
+
+        Raises ThrottledError when GuruFocus keeps throttling us.
+        """
+        import requests
+
+        def fetch():
+            response = self.session.get(
+                self.url.format(ticker=ticker), timeout=self.timeout,
+            )
+            response.raise_for_status()
+            return response
+
+        try:
+            response = self.guard.call(fetch)
+        except requests.RequestException:
+            return None
+        return parse_wacc(response.text)
+
+
+    def close(self):
+        """ Close the pooled connections."""
+        self.session.close()
+
+
+class WaccProvider:
+    """
+    Single source of WACC values for the DCF.
+
+    With the local source, the WACC is computed from the balance \
+            sheet and financials the DCF has already fetched, as in \
+            entrypoint's 'wacc' column. GuruFocus is only asked when \
+            that comes out missing, or outside [floor, ceiling].
+
+    GuruFocus values go through the fundamentals cache, so they \
+            are shared across runs until they expire, and are \
+            recorded and replayed with the statements. A lookup \
+            that is still throttled after its retries raises \
+            ThrottledError, rather than falling back to the default.
+    """
+
+    def __init__(self, cache, source=WACC_SOURCE, client=None,
+                 floor=WACC_FLOOR, ceiling=WACC_CEILING):
+        if source not in ("local", "remote"):
+            raise ValueError(f"unknown WACC_SOURCE: {source}")
+        self.cache = cache
+        self.source = source
+        self.floor = floor
+        self.ceiling = ceiling
+        self._client = client
+        self.metrics = Metrics()
+        self.statements = statements_for(("wacc",))
+
+
+    @property
+    def client(self):
+        """
+        The GuruFocus client, created on first use, or the WACC \
+                client of the cache, if it has one.
+        """
+        if self._client is None:
+            self._client = getattr(self.cache, "wacc_client", None) \
+                or GuruFocusClient()
+        return self._client
+
+
+    def lookup(self, symbol):
+        """
+        WACC of a yfinance-like ticker object, and where it came \
+                from: 'local', 'default', or the source of the \
+                client, 'gurufocus' or 'file'.
+        """
+        if self.source == "local":
+            wacc = self.local(symbol)
+            if wacc is not None:
+                return wacc, "local"
+
+        wacc = self.remote(symbol.ticker)
+        if wacc is not None:
+            return wacc, self.remote_source
+        return DEFAULT_WACC, "default"
+
+
+    @property
+    def remote_source(self):
+        """
+        Source of the values remote() gives, without creating a \
+                GuruFocus client just to ask.
+        """
+        client = self._client or getattr(self.cache, "wacc_client", None)
+        return getattr(client, "source", GuruFocusClient.source)
+
+
+    def local(self, symbol):
+        """ WACC computed from the statements, if it is plausible."""
+        bundle = FundamentalsBundle.from_ticker(symbol, self.statements)
+        wacc = self.metrics.compute_columns(bundle, ("wacc",))["wacc"]
+        if not math.isfinite(wacc) or not self.floor < wacc <= self.ceiling:
+            return None
+        return float(wacc)
+
+
+    def remote(self, ticker):
+        """ WACC from GuruFocus, read through the fundamentals cache."""
+        return self.cache.fetch(
+            ticker, "wacc", lambda statement: self.client.wacc(ticker),
+        )
+
+
+    def close(self):
+        """ Close the GuruFocus session, if one was opened."""
+        if self._client is not None:
+            self._client.close()
+
+
+def parse_wacc(page):
+    """
+    First percentage on a GuruFocus WACC page, as a fraction, or \
+            None if it has none; the lookup then falls back to \
+            DEFAULT_WACC, which isn't cached.
+    """
+    match = PERCENTAGE.search(page)
+    if match is None:
+        return None
+    return float(match.group().rstrip("%")) / 100